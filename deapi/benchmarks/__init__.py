@@ -0,0 +1,31 @@
+"""Throughput benchmarks for the client and the pyDEServer.
+
+The suite can be run from the command line with:
+
+.. code-block::
+
+    python -m deapi.benchmarks --output results.json
+"""
+
+from deapi.benchmarks.runner import (
+    BENCHMARKS,
+    BenchmarkSession,
+    ServerProcess,
+    benchmark,
+    check_thresholds,
+    load_thresholds,
+    measure,
+    run_benchmarks,
+)
+from deapi.benchmarks import suite
+
+__all__ = [
+    "BENCHMARKS",
+    "BenchmarkSession",
+    "ServerProcess",
+    "benchmark",
+    "check_thresholds",
+    "load_thresholds",
+    "measure",
+    "run_benchmarks",
+]
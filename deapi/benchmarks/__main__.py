@@ -0,0 +1,78 @@
+import argparse
+import json
+import sys
+
+from deapi.benchmarks import (
+    BENCHMARKS,
+    check_thresholds,
+    load_thresholds,
+    run_benchmarks,
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m deapi.benchmarks",
+        description="Benchmark the client against pydeserver (or a running server)",
+    )
+    parser.add_argument(
+        "--host", default="127.0.0.1", help="Host of a running server to benchmark"
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        help="Port of a running server. By default pydeserver is started for the run",
+    )
+    parser.add_argument(
+        "--time-scale",
+        type=float,
+        default=100,
+        help="The --time-scale of the pydeserver which is started",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=10, help="Timed repeats of each measurement"
+    )
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        choices=list(BENCHMARKS),
+        help="Only run these benchmarks",
+    )
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument(
+        "--thresholds",
+        help="Regression thresholds (JSON). By default the thresholds shipped with deapi",
+    )
+    parser.add_argument(
+        "--no-check", action="store_true", help="Do not check the thresholds"
+    )
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(
+        host=args.host,
+        port=args.port,
+        names=args.only,
+        repeat=args.repeat,
+        server_args=["--time-scale", str(args.time_scale)],
+    )
+    for result in results["results"]:
+        line = f"{result['name']:<45} {result['median'] * 1000:10.3f} ms"
+        line += f" {result['ops_per_second']:12.1f} ops/s"
+        if "bytes_per_second" in result:
+            line += f" {result['bytes_per_second'] / 1e6:10.1f} MB/s"
+        print(line)
+
+    failures = []
+    if not args.no_check:
+        failures = check_thresholds(results, load_thresholds(args.thresholds))
+        results["regressions"] = failures
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    for failure in failures:
+        print(f"REGRESSION {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
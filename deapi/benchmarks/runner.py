@@ -0,0 +1,300 @@
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+from deapi.client import Client
+from deapi.version import version
+
+# name -> function(session, repeat) returning a list of results
+BENCHMARKS = {}
+
+DEFAULT_THRESHOLDS = os.path.join(os.path.dirname(__file__), "thresholds.json")
+
+
+def benchmark(name):
+    """
+    Register a benchmark with the suite.
+
+    The decorated function is called with a :class:`BenchmarkSession` and the number
+    of repeats and returns a list of results from :func:`measure`.
+    """
+
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+
+    return register
+
+
+def measure(name, func, repeat=10, warmup=1, nbytes=None, items=1, **extra):
+    """
+    Time a function.
+
+    Parameters
+    ----------
+    name : str
+        The name of the result.
+    func : callable
+        The function to time. It is called without arguments and may return the
+        number of bytes it transferred.
+    repeat : int, optional
+        The number of timed calls, by default 10.
+    warmup : int, optional
+        The number of untimed calls made first, by default 1.
+    nbytes : int, optional
+        The number of bytes transferred by each call. By default the value returned
+        by ``func`` is used (if it returns an int).
+    items : int, optional
+        The number of operations (e.g. frames) in each call, by default 1.
+    **extra
+        Additional information stored with the result.
+
+    Returns
+    -------
+    dict
+        The result with the min, median, mean and max time per call (in seconds),
+        the operations per second and (if known) the bytes per second.
+    """
+    for _ in range(warmup):
+        func()
+    times = np.empty(repeat)
+    transferred = 0
+    for i in range(repeat):
+        start = time.perf_counter()
+        returned = func()
+        times[i] = time.perf_counter() - start
+        if nbytes is not None:
+            transferred += nbytes
+        elif isinstance(returned, (int, np.integer)) and not isinstance(returned, bool):
+            transferred += int(returned)
+    median = float(np.median(times))
+    result = {
+        "name": name,
+        "repeat": repeat,
+        "min": float(times.min()),
+        "median": median,
+        "mean": float(times.mean()),
+        "max": float(times.max()),
+        "ops_per_second": items / median if median > 0 else float("inf"),
+    }
+    if transferred:
+        result["bytes_per_second"] = transferred / times.sum()
+    result.update(extra)
+    return result
+
+
+def free_port(host="127.0.0.1"):
+    """A port which is not in use."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind((host, 0))
+        return s.getsockname()[1]
+
+
+class ServerProcess:
+    """
+    Run ``pydeserver`` in a subprocess.
+
+    Parameters
+    ----------
+    port : int, optional
+        The port to serve on, by default a free port.
+    args : list of str, optional
+        Extra command line arguments for the server, e.g. ``["--time-scale", "100"]``.
+    timeout : float, optional
+        The time to wait for the server to start, by default 30 seconds.
+
+    Examples
+    --------
+    >>> with ServerProcess(args=["--time-scale", "100"]) as server:
+    ...     client.connect(port=server.port)
+    """
+
+    def __init__(self, port=None, args=(), timeout=30):
+        self.host = "127.0.0.1"
+        self.port = free_port(self.host) if port is None else port
+        self.args = list(args)
+        self.timeout = timeout
+        self.process = None
+
+    def start(self):
+        command = [
+            sys.executable,
+            "-m",
+            "deapi.simulated_server.initialize_server",
+            "--port",
+            str(self.port),
+        ] + self.args
+        self.process = subprocess.Popen(
+            command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+        )
+        deadline = time.monotonic() + self.timeout
+        while True:
+            line = self.process.stderr.readline()
+            if "started" in line:
+                break
+            if line == "" or time.monotonic() > deadline:
+                self.stop()
+                raise RuntimeError(f"pydeserver did not start: {' '.join(command)}")
+        # keep reading the output so that the server never blocks on a full pipe
+        threading.Thread(target=self.process.stderr.read, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait()
+            self.process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+class BenchmarkSession:
+    """
+    The server a benchmark runs against and a connected client.
+
+    Parameters
+    ----------
+    host : str
+        The host of the server.
+    port : int
+        The port of the server.
+    """
+
+    def __init__(self, host="127.0.0.1", port=13240):
+        self.host = host
+        self.port = port
+        self.client = None
+
+    def connect(self):
+        """Connect (or reconnect) the client of the session."""
+        self.client = self.new_client()
+        return self.client
+
+    def new_client(self):
+        """A new client connected to the server."""
+        client = Client()
+        client.usingMmf = False
+        client.connect(host=self.host, port=self.port)
+        return client
+
+    def disconnect(self):
+        if self.client is not None:
+            self.client.disconnect()
+            self.client = None
+
+
+def run_benchmarks(host="127.0.0.1", port=None, names=None, repeat=10, server_args=()):
+    """
+    Run the benchmark suite.
+
+    Parameters
+    ----------
+    host : str, optional
+        The host of the server, by default localhost.
+    port : int, optional
+        The port of a running server. By default ``pydeserver`` is started in a
+        subprocess for the run.
+    names : list of str, optional
+        Only run the benchmarks whose name starts with one of these, by default all.
+    repeat : int, optional
+        The number of timed repeats of each measurement, by default 10.
+    server_args : list of str, optional
+        Extra command line arguments for the ``pydeserver`` which is started.
+
+    Returns
+    -------
+    dict
+        The ``metadata`` of the run and a list of ``results``.
+    """
+    selected = [
+        name
+        for name in BENCHMARKS
+        if names is None or any(name.startswith(n) for n in names)
+    ]
+    server = None
+    launched = port is None
+    if launched:
+        server = ServerProcess(args=server_args).start()
+        host, port = server.host, server.port
+    session = BenchmarkSession(host=host, port=port)
+    results = []
+    try:
+        session.connect()
+        for name in selected:
+            results.extend(BENCHMARKS[name](session, repeat))
+    finally:
+        session.disconnect()
+        if server is not None:
+            server.stop()
+    metadata = {
+        "deapi": version,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "machine": platform.node(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "server": "pydeserver" if launched else f"{host}:{port}",
+        "server_args": list(server_args) if launched else [],
+    }
+    return {"metadata": metadata, "results": results}
+
+
+def load_thresholds(path=None):
+    """Load the regression thresholds from a JSON file (by default the shipped ones)."""
+    with open(DEFAULT_THRESHOLDS if path is None else path) as f:
+        return json.load(f)
+
+
+def check_thresholds(results, thresholds):
+    """
+    Compare benchmark results against regression thresholds.
+
+    Parameters
+    ----------
+    results : dict or list of dict
+        The output of :func:`run_benchmarks` or its list of results.
+    thresholds : dict
+        The thresholds for each result name. Each is a dictionary of ``max_<stat>``
+        or ``min_<stat>`` limits for a statistic of the result, e.g.
+        ``{"get_property": {"max_median": 0.005}}``. Names ending in ``*`` apply to
+        every result which starts with the rest of the name.
+
+    Returns
+    -------
+    list of str
+        A message for each threshold which was exceeded (empty if none were).
+    """
+    if isinstance(results, dict):
+        results = results["results"]
+    failures = []
+    for result in results:
+        for pattern, limits in thresholds.items():
+            if pattern.endswith("*"):
+                if not result["name"].startswith(pattern[:-1]):
+                    continue
+            elif result["name"] != pattern:
+                continue
+            for limit, value in limits.items():
+                bound, stat = limit.split("_", 1)
+                if stat not in result:
+                    continue
+                if bound == "max" and result[stat] > value:
+                    failures.append(
+                        f"{result['name']}: {stat} {result[stat]:.4g} > {value:.4g}"
+                    )
+                elif bound == "min" and result[stat] < value:
+                    failures.append(
+                        f"{result['name']}: {stat} {result[stat]:.4g} < {value:.4g}"
+                    )
+    return failures
@@ -0,0 +1,232 @@
+"""The benchmarks run by ``python -m deapi.benchmarks``."""
+
+import time
+
+import numpy as np
+
+from deapi import masks
+from deapi.data_types import ContrastStretchType, MovieBufferStatus
+from deapi.benchmarks.runner import benchmark, measure
+from deapi.fake_data import NoiseModel
+from deapi.processing import (
+    ContrastStretch,
+    ElectronCounting,
+    FrameBatch,
+    VirtualDetectors,
+)
+
+PIXEL_FORMATS = ["UINT8", "UINT16", "FLOAT32"]
+# frame type -> the pixel formats to request (virtual masks are always 8 bit)
+FRAME_TYPES = {
+    "singleframe_integrated": PIXEL_FORMATS,
+    "singleframe_counted": PIXEL_FORMATS,
+    "virtual_mask0": ["UINT8"],
+    "virtual_image0": PIXEL_FORMATS,
+    "scan_subsamplingmask": PIXEL_FORMATS,
+}
+
+
+def acquire(client, size_x=16, size_y=16, request_movie_buffer=False):
+    """Acquire a scan and wait for it to finish."""
+    client["Frames Per Second"] = 1000
+    client.scan(size_x=size_x, size_y=size_y, enable="On")
+    client.start_acquisition(1, requestMovieBuffer=request_movie_buffer)
+    if not request_movie_buffer:
+        while client.acquiring:
+            time.sleep(0.01)
+
+
+@benchmark("connect")
+def connect(session, repeat):
+    # only one client can be connected to pydeserver at a time
+    session.disconnect()
+    try:
+        return [measure("connect", lambda: session.new_client().disconnect(), repeat)]
+    finally:
+        session.connect()
+
+
+@benchmark("property")
+def properties(session, repeat):
+    client = session.client
+    repeat = repeat * 10  # these are fast so take more samples
+    return [
+        measure(
+            "get_property",
+            lambda: client.get_property("Frames Per Second"),
+            repeat,
+        ),
+        measure(
+            "set_property",
+            lambda: client.set_property("Frames Per Second", 1000),
+            repeat,
+        ),
+    ]
+
+
+@benchmark("get_result")
+def get_result(session, repeat):
+    client = session.client
+    acquire(client)
+    results = []
+    for frame_type, pixel_formats in FRAME_TYPES.items():
+        for pixel_format in pixel_formats:
+
+            def get():
+                return client.get_result(frame_type, pixel_format)[0].nbytes
+
+            results.append(
+                measure(
+                    f"get_result[{frame_type}-{pixel_format}]",
+                    get,
+                    repeat,
+                    frame_type=frame_type,
+                    pixel_format=pixel_format,
+                )
+            )
+    return results
+
+
+@benchmark("virtual_images")
+def virtual_images(session, repeat):
+    client = session.client
+    acquire(client)
+    images = [f"virtual_image{i}" for i in range(len(client.virtual_masks))]
+
+    def get_all():
+        return sum(client.get_result(image, "FLOAT32")[0].nbytes for image in images)
+
+    def update():
+        # changing a mask means the server has to recompute the virtual image
+        client.virtual_masks[1][:] = 1
+        return client.get_result("virtual_image1", "FLOAT32")[0].nbytes
+
+    return [
+        measure("virtual_images[all]", get_all, repeat, items=len(images)),
+        measure("virtual_images[mask_update]", update, repeat),
+    ]
+
+
+@benchmark("movie_buffer")
+def movie_buffer(session, repeat):
+    client = session.client
+    size_x, size_y = 4, 4
+
+    def read():
+        acquire(client, size_x, size_y, request_movie_buffer=True)
+        info = client.get_movie_buffer_info()
+        total = 0
+        status = MovieBufferStatus.OK
+        while status == MovieBufferStatus.OK:
+            status, total_bytes, _, _ = client.get_movie_buffer(
+                info.to_buffer(), info.total_bytes, info.framesInBuffer
+            )
+            if status == MovieBufferStatus.OK:
+                total += total_bytes
+        return total
+
+    return [measure("movie_buffer", read, repeat, items=size_x * size_y)]
+
+
+@benchmark("set_virtual_mask")
+def set_virtual_mask(session, repeat):
+    client = session.client
+    results = []
+    for size in [1024, 4096]:
+        mask = np.ones((size, size), dtype=np.int8)
+        results.append(
+            measure(
+                f"set_virtual_mask[{size}x{size}]",
+                lambda: client.set_virtual_mask(3, size, size, mask),
+                repeat,
+                nbytes=mask.nbytes,
+            )
+        )
+    # back to a mask the size of the image
+    shape = (client["Image Size Y (pixels)"], client["Image Size X (pixels)"])
+    client.set_virtual_mask(3, shape[1], shape[0], np.zeros(shape, dtype=np.int8))
+    return results
+
+
+def synthetic_frames(count=128, shape=(256, 256), seed=0):
+    """Poisson distributed uint16 frames for the processing benchmarks."""
+    rng = np.random.default_rng(seed)
+    return rng.poisson(2, size=(count,) + shape).astype(np.uint16)
+
+
+@benchmark("virtual_detectors")
+def virtual_detectors(session, repeat):
+    frames = synthetic_frames()
+    shape = frames.shape[1:]
+    detectors = [
+        masks.disk(shape, 40),
+        masks.annulus(shape, 60, 120),
+        masks.difference(*masks.segments(shape, 2, outer_radius=40)),
+        masks.difference(
+            *masks.segments(shape, 2, outer_radius=40, rotation=np.pi / 2)
+        ),
+    ]
+    calculations = ["Sum", "Sum", "Difference", "Difference"]
+    batch = FrameBatch(frames, np.arange(len(frames)))
+    results = []
+    for mode in ["dense", "sparse"]:
+        for threads, suffix in [(1, ""), (-1, "-threaded")]:
+            stage = VirtualDetectors.from_masks(
+                detectors, len(frames), calculations, mode=mode, threads=threads
+            )
+            results.append(
+                measure(
+                    f"virtual_detectors[{mode}{suffix}]",
+                    lambda: stage.process(batch),
+                    repeat,
+                    nbytes=frames.nbytes,
+                    items=len(frames),
+                )
+            )
+    return results
+
+
+@benchmark("electron_counting")
+def electron_counting(session, repeat):
+    # integrated frames with about 650 electrons each (0.01 per pixel)
+    noise = NoiseModel(dose=0.01, gain=100, read_noise=2, dark_level=0, seed=0)
+    frames = noise.integrated(np.ones((1, 256, 256)), np.zeros(64, dtype=int))
+    batch = FrameBatch(frames, np.arange(len(frames)))
+    results = []
+    for method in ElectronCounting.METHODS:
+        for threads, suffix in [(1, ""), (-1, "-threaded")]:
+            stage = ElectronCounting(threshold=50, method=method, threads=threads)
+
+            def count():
+                stage.reset()
+                stage.process(batch)
+
+            result = measure(
+                f"electron_counting[{method}{suffix}]",
+                count,
+                repeat,
+                nbytes=frames.nbytes,
+                items=len(frames),
+            )
+            result["compression_ratio"] = stage.compression_ratio
+            results.append(result)
+    return results
+
+
+@benchmark("contrast_stretch")
+def contrast_stretch(session, repeat):
+    # rendering a 1k x 1k frame for a live view
+    rng = np.random.default_rng(0)
+    image = rng.poisson(100, size=(1024, 1024)).astype(np.uint16)
+    results = []
+    for stretch_type in [ContrastStretchType.LINEAR, ContrastStretchType.DIFFRACTION]:
+        stretch = ContrastStretch(stretch_type, time_budget=None)
+        results.append(
+            measure(
+                f"contrast_stretch[{stretch_type.name.lower()}]",
+                lambda: stretch(image),
+                repeat,
+                nbytes=image.nbytes,
+            )
+        )
+    return results
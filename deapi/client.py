@@ -42,6 +42,7 @@ from deapi.data_types import (
 
 from deapi.buffer_protocols import pb
 from deapi.version import version, commandVersion
+from deapi import recording
 
 
 ## the commandInfo contains [VERSION_MAJOR.VERSION_MINOR.VERSION_PATCH.VERSION_REVISION]
@@ -201,6 +202,11 @@ class Client:
         for i in range(4):
             self.virtual_masks.append(VirtualMask(client=self, index=i))
 
+    def _properties_changed(self):
+        # anything cached from the properties (e.g. the virtual masks) is out of date
+        self.refreshProperties = True
+        self.propertyGeneration += 1
+
     def update_scan_size(self):
         self.scan_sizex = self["Scan - Size X"]
         self.scan_sizey = self["Scan - Size Y"]
@@ -218,6 +224,7 @@ class Client:
         """
         if self.mmf != 0:
             self.mmf.close()
+        self.stop_recording()
 
         if self.connected:
             self.socket.close()
@@ -265,7 +272,7 @@ class Client:
         if logLevel == logging.DEBUG:
             log.debug("current camera: %s", camera_name)
 
-        self.refreshProperties = True
+        self._properties_changed()
         return True
 
     def list_properties(self, options=None, search=None):
@@ -431,7 +438,7 @@ class Client:
             response = self._sendCommand(command)
             if response != False:
                 ret = response.acknowledge[0].error != True
-                self.refreshProperties = True
+                self._properties_changed()
 
         if logLevel == logging.DEBUG:
             log.debug(
@@ -468,7 +475,7 @@ class Client:
             response = self._sendCommand(command)
             if response != False:
                 ret = response.acknowledge[0].error != True
-                self.refreshProperties = True
+                self._properties_changed()
 
             if ret:
                 ret = self.ParseChangedProperties(changedProperties, response)
@@ -500,7 +507,7 @@ class Client:
         response = self._sendCommand(command)
         if response != False:
             ret = response.acknowledge[0].error != True
-            self.refreshProperties = True
+            self._properties_changed()
         return ret
 
     def set_hw_roi(self, offsetX: int, offsetY: int, sizeX: int, sizeY: int):
@@ -527,7 +534,7 @@ class Client:
         response = self._sendCommand(command)
         if response != False:
             ret = response.acknowledge[0].error != True
-            self.refreshProperties = True
+            self._properties_changed()
 
         if logLevel == logging.DEBUG:
             log.debug(
@@ -573,7 +580,7 @@ class Client:
         response = self._sendCommand(command)
         if response != False:
             ret = response.acknowledge[0].error != True
-            self.refreshProperties = True
+            self._properties_changed()
 
         if ret:
             ret = self.ParseChangedProperties(changedProperties, response)
@@ -614,7 +621,7 @@ class Client:
         response = self._sendCommand(command)
         if response != False:
             ret = response.acknowledge[0].error != True
-            self.refreshProperties = True
+            self._properties_changed()
 
         if logLevel == logging.DEBUG:
             log.debug(
@@ -660,7 +667,7 @@ class Client:
         response = self._sendCommand(command)
         if response != False:
             ret = response.acknowledge[0].error != True
-            self.refreshProperties = True
+            self._properties_changed()
 
         if ret:
             ret = self.ParseChangedProperties(changedProperties, response)
@@ -821,7 +828,7 @@ class Client:
 
         if attributes == "auto":
             attributes = Attributes()
-            scan_images = [17, 18, 19, 20, 21, 22, 23, 24, 25]
+            scan_images = [17, 18, 19, 20, 21, 22, 23, 24, 25, 50]
             if frameType.value in scan_images:
                 attributes.windowWidth = self.scan_sizex
                 attributes.windowHeight = self.scan_sizey
@@ -1006,6 +1013,11 @@ class Client:
                     received_string = self._recvFromSocket(
                         self.socket, recvbyteSize[0]
                     )  # get the rest
+                    self._record(
+                        recording.RECEIVED,
+                        recording.PACKET,
+                        recvbyteSizeString + received_string,
+                    )
                     data_header = pb.DEPacket()
                     data_header.ParseFromString(received_string)
                     bytesize = data_header.data_header.bytesize
@@ -1021,6 +1033,7 @@ class Client:
                     bytesize = self.width * self.height * 2
                 elif bytesize > 0:
                     packet = self._recvFromSocket(self.socket, bytesize)
+                    self._record(recording.RECEIVED, recording.PAYLOAD, packet)
                     if len(packet) == bytesize:
                         image = numpy.frombuffer(packet, imageDataType)
                         bytesize = self.height * self.width * 2
@@ -1101,24 +1114,109 @@ class Client:
         mask : np.ndarray
             The mask to set
         """
+        ret = False
         if 0 <= id < 4 and w >= 0 and h >= 0:
 
             command = self._addSingleCommand(self.SET_VIRTUAL_MASK, None, [id, w, h])
-            ret = True
-            try:
-                packet = (
-                    struct.pack("I", command.ByteSize()) + command.SerializeToString()
-                )
-                self.socket.send(packet)
-            except socket.error as e:
-                ret = False
+            if len(command.camera_name) == 0:
+                command.camera_name = self.currCamera
+            packet = struct.pack("I", command.ByteSize()) + command.SerializeToString()
+            # send the mask bytes as they are (no copy) straight after the command
+            mask = self._mask_payload(mask)
+            self._record(recording.SENT, recording.PACKET, packet)
+            self._record(recording.SENT, recording.PAYLOAD, mask)
+            sent = self.__sendToSocket(
+                self.socket, [packet, mask], len(packet) + mask.nbytes
+            )
+            if sent:
+                ret = self.__ReceiveResponseForCommand(command) != False
+            for virtual_mask in getattr(self, "virtual_masks", []):
+                if virtual_mask.index == id:
+                    virtual_mask.invalidate()
 
-            if ret:
-                mask_bytes = mask.tobytes()
-                self.__sendToSocket(self.socket, mask_bytes, len(mask_bytes))
+        return ret
 
-            ret = self.__ReceiveResponseForCommand(command) != False
+    @staticmethod
+    def _mask_payload(mask):
+        # The bytes of a mask, without a copy if it is already 8 bit and contiguous
+        mask = numpy.asarray(mask)
+        if mask.dtype not in (numpy.int8, numpy.uint8):
+            mask = mask.astype(numpy.int8)
+        return numpy.ascontiguousarray(mask)
 
+    def set_virtual_masks(self, masks, calculations=None):
+        """
+        Set several virtual masks and their calculation modes in one exchange.
+
+        All of the commands (including setting the shape of each detector to
+        "Arbitrary") are sent before any of the responses are read, so setting
+        every mask costs a single round trip to the server.
+
+        Parameters
+        ----------
+        masks : dict
+            The (height, width) mask for each virtual mask index (0-3), e.g. from
+            :mod:`deapi.masks`.
+        calculations : dict, optional
+            The calculation ("Sum" or "Difference") for each virtual mask index.
+
+        Returns
+        -------
+        bool
+            True if the server accepted every command.
+
+        Examples
+        --------
+        >>> client.set_virtual_masks(
+        ...     {0: masks.disk(client, 50), 1: masks.annulus(client, 80, 200)},
+        ...     calculations={0: "Sum", 1: "Sum"},
+        ... )
+        """
+        if calculations is None:
+            calculations = {}
+        requests = []
+        for index in sorted(set(masks) | set(calculations)):
+            if not 0 <= index < 4:
+                raise ValueError(f"Virtual mask index must be 0-3, not {index}")
+            if index in calculations:
+                name = f"Scan - Virtual Detector {index} Calculation"
+                command = self._addSingleCommand(
+                    self.SET_PROPERTY, name, [calculations[index]]
+                )
+                requests.append((command, []))
+            if index in masks:
+                name = f"Scan - Virtual Detector {index} Shape"
+                command = self._addSingleCommand(self.SET_PROPERTY, name, ["Arbitrary"])
+                requests.append((command, []))
+                mask = self._mask_payload(masks[index])
+                h, w = mask.shape
+                command = self._addSingleCommand(
+                    self.SET_VIRTUAL_MASK, None, [index, w, h]
+                )
+                requests.append((command, [mask]))
+
+        buffers = []
+        for command, payloads in requests:
+            if len(command.camera_name) == 0:
+                command.camera_name = self.currCamera
+            packet = struct.pack("I", command.ByteSize()) + command.SerializeToString()
+            self._record(recording.SENT, recording.PACKET, packet)
+            buffers.append(packet)
+            for payload in payloads:
+                self._record(recording.SENT, recording.PAYLOAD, payload)
+                buffers.append(payload)
+        total = sum(memoryview(b).nbytes for b in buffers)
+        ret = self.__sendToSocket(self.socket, buffers, total)
+        if ret:
+            # read every response, even after an error, to keep the socket in step
+            for command, _ in requests:
+                response = self.__ReceiveResponseForCommand(command)
+                ret = ret and response != False and not response.acknowledge[0].error
+
+        self._properties_changed()
+        for virtual_mask in getattr(self, "virtual_masks", []):
+            if virtual_mask.index in masks:
+                virtual_mask.invalidate()
         return ret
 
     def get_movie_buffer_info(self, movieBufferInfo=None, timeoutMsec=5000):
@@ -1186,6 +1284,7 @@ class Client:
                         log.error("Image received did not have the expected size.")
                     else:
                         movieBuffer = self._recvFromSocket(self.socket, totalBytes)
+                        self._record(recording.RECEIVED, recording.PAYLOAD, movieBuffer)
         else:
             retval = False
 
@@ -1575,6 +1674,28 @@ class Client:
         self.SetProperty("Exposure Mode", prevExposureMode)
         self.SetProperty("Exposure Time (seconds)", prevExposureTime)
 
+    def start_recording(self, path):
+        """
+        Record every packet and data payload sent to or received from DE-Server
+        into a session log. The session can be served back with the
+        :class:`deapi.simulated_server.replay_server.ReplayServer`.
+
+        Parameters
+        ----------
+        path : str or pathlib.Path
+            The file to write the session log to.
+        """
+        self.stop_recording()
+        self.recorder = recording.SessionRecorder(path)
+
+    def stop_recording(self):
+        """
+        Stop recording and close the session log.
+        """
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
     def get_time(self):
         """
         Get the current time from the system clock
@@ -1590,6 +1711,10 @@ class Client:
         if self.connected:
             self.disconnect()
 
+    def _record(self, direction, kind, data):
+        if self.recorder is not None:
+            self.recorder.record(direction, kind, data)
+
     # get multiple parameters from a single acknowledge packet
     def __getParameters(self, single_acknowledge=None):
         output = []
@@ -1671,6 +1796,7 @@ class Client:
 
         try:
             packet = struct.pack("I", command.ByteSize()) + command.SerializeToString()
+            self._record(recording.SENT, recording.PACKET, packet)
             res = self.socket.send(packet)
             # packet.PrintDebugString()
             # log.debug("sent result = %d\n", res)
@@ -1702,6 +1828,11 @@ class Client:
                 log.debug(" Recv Time: %.1f ms, %d bytes", lapsed, recvbyteSize[0])
                 step_time = self.GetTime()
 
+            self._record(
+                recording.RECEIVED,
+                recording.PACKET,
+                recvbyteSizeString + received_string,
+            )
             Acknowledge_return = pb.DEPacket()
             Acknowledge_return.ParseFromString(received_string)  # parse the byte string
             if logLevel == logging.DEBUG:
@@ -1814,34 +1945,38 @@ class Client:
         return buffer
 
     def __sendToSocket(self, sock, buffer, bytes):
+        # Send one or more bytes-like buffers completely. Where possible the buffers
+        # are sent together with scatter-gather I/O rather than joined first.
         timeout = self.exposureTime * 10 + 30
         startTime = self.GetTime()
-        self.socket.settimeout(timeout)
+        sock.settimeout(timeout)
 
-        retval = True
-        chunkSize = 4096
-        for i in range(0, len(buffer), chunkSize):
-            try:
-                sock.send(buffer[i : min(len(buffer), i + chunkSize)])
-            except socket.timeout:
-
-                log.debug(
-                    " __sendToSocket : timeout in trying to send %d bytes in %.1f ms",
-                    bytes,
-                    (self.GetTime() - loopTime) * 1000,
-                )
-                if self.GetTime() - startTime > timeout:
-                    log.error(" __recvFromSocket: max timeout %d seconds", timeout)
-                    retval = False
-                    break
-                else:
-                    pass  # continue further
-            except socket.error as e:
-                log.error(f"Error during send: {e}")
-                # Handle the error as needed, e.g., close the connection
-                retval = False
-                break
-        return buffer
+        if not isinstance(buffer, (list, tuple)):
+            buffer = [buffer]
+        views = [memoryview(b).cast("B") for b in buffer]
+        try:
+            if hasattr(sock, "sendmsg"):
+                while views:
+                    sent = sock.sendmsg(views)
+                    while views and sent >= len(views[0]):
+                        sent -= len(views[0])
+                        views.pop(0)
+                    if views:
+                        views[0] = views[0][sent:]
+            else:
+                for view in views:
+                    sock.sendall(view)
+        except socket.timeout:
+            log.error(
+                " __sendToSocket : timeout in trying to send %d bytes in %.1f ms",
+                bytes,
+                (self.GetTime() - startTime) * 1000,
+            )
+            return False
+        except socket.error as e:
+            log.error(f"Error during send: {e}")
+            return False
+        return True
 
     def __saveText(self, image, fileName, textSize):
         text = open(self.debugImagesFolder + fileName + ".txt", "w+")
@@ -1924,7 +2059,9 @@ class Client:
     cameras = None
     currCamera = ""
     refreshProperties = True
+    propertyGeneration = 0
     exposureTime = 1
+    recorder = None
     host = 0
     port = 0
 
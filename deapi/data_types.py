@@ -5,10 +5,13 @@
 # cfrancis@directelectron.com
 
 
+from contextlib import contextmanager
 from enum import Enum
 from enum import IntEnum
 import warnings
 
+import numpy as np
+
 
 class FrameType(Enum):
     """An Enum of the different frame types that can be returned by the DE API"""
@@ -521,33 +524,129 @@ class VirtualMask:
     -----
     This class is mostly used via the client.virtual_masks property which is a list
     of VirtualMask objects.
+
+    The mask is cached locally so reading it only downloads it from the server the
+    first time (or after a property has been set, as that might change the mask on
+    the server). Each assignment uploads the mask once, and assigning the whole mask
+    doesn't download it at all. Several edits can be combined into a single upload
+    with :meth:`edit`.
+
+    Examples
+    --------
+    >>> with client.virtual_masks[1].edit() as mask:
+    ...     mask[:] = 1
+    ...     mask[200:300, 200:300] = 2
     """
 
     def __init__(self, client, index):
         self.client = client
         self.index = index
+        self._mask = None
+        self._generation = None
+        self._arbitrary_generation = None
+        self._dirty = False
+        self._editing = 0
+
+    def invalidate(self):
+        """Forget the cached mask so that it is downloaded again when next used."""
+        self._mask = None
+        self._dirty = False
+
+    def _is_cached(self):
+        return self._mask is not None and (
+            self._dirty or self._generation == self.client.propertyGeneration
+        )
 
-    def __getitem__(self, item):
-        full_img = self.client.get_virtual_mask(self.index)
-        return full_img[item]
-
-    def __setitem__(self, key, value):
+    def _local_mask(self, download=True):
+        # The cached mask, downloaded from the server if it is out of date. Without
+        # download only the shape is fetched (for when the whole mask is replaced).
+        if not self._is_cached():
+            if download:
+                self._mask = np.array(self.client.get_virtual_mask(self.index))
+            else:
+                # the same (height, width) shape as a downloaded mask
+                shape = (
+                    self.client["Image Size Y (pixels)"],
+                    self.client["Image Size X (pixels)"],
+                )
+                self._mask = np.zeros(shape, dtype=np.int8)
+            self._generation = self.client.propertyGeneration
+            self._dirty = False
+        return self._mask
+
+    def _set_arbitrary(self):
+        if self._arbitrary_generation == self.client.propertyGeneration:
+            return
         string = f"Scan - Virtual Detector {self.index} Shape"
         if not self.client[string] == "Arbitrary":
             warnings.warn(
                 "Virtual mask shape is not set to Arbitrary. Setting to Arbitrary."
             )
             self.client[string] = "Arbitrary"
-        full_img = self.client.get_virtual_mask(self.index)
-        if value > 3 or value < 0:
+        self._arbitrary_generation = self.client.propertyGeneration
+
+    def __getitem__(self, item):
+        return self._local_mask()[item].copy()
+
+    def __setitem__(self, key, value):
+        if np.any(np.asarray(value) > 3) or np.any(np.asarray(value) < 0):
             raise ValueError(
                 "Value must be between 0 and 2. Please use 2 for positive mask,"
                 " 0 for negative mask, and 0 for no mask."
             )
-        full_img[key] = value
+        self._set_arbitrary()
+        whole = key is Ellipsis or (isinstance(key, slice) and key == slice(None))
+        self._local_mask(download=not whole)[key] = value
+        self._dirty = True
+        if not self._editing:
+            self.flush()
+
+    def flush(self):
+        """
+        Upload the mask to the server if it has been edited.
+
+        Returns
+        -------
+        bool
+            True if the mask was uploaded.
+        """
+        if not self._dirty:
+            return False
+        mask = self._mask
+        # the mask is (height, width)
         self.client.set_virtual_mask(
-            self.index, w=full_img.shape[0], h=full_img.shape[1], mask=full_img
+            self.index, w=mask.shape[1], h=mask.shape[0], mask=mask
         )
+        self._mask = mask  # set_virtual_mask invalidates the cache
+        self._generation = self.client.propertyGeneration
+        self._dirty = False
+        return True
+
+    @contextmanager
+    def edit(self):
+        """
+        Combine several edits into a single upload.
+
+        The mask is uploaded once when the block exits. If the block raises an
+        exception the edits are discarded instead.
+
+        Examples
+        --------
+        >>> with client.virtual_masks[1].edit() as mask:
+        ...     mask[:] = 1
+        ...     mask[circle] = 2
+        """
+        self._editing += 1
+        try:
+            yield self
+        except BaseException:
+            self._editing -= 1
+            if not self._editing:
+                self.invalidate()
+            raise
+        self._editing -= 1
+        if not self._editing:
+            self.flush()
 
     def plot(self, ax=None, **kwargs):
         """Plot the virtual mask using matplotlib
@@ -570,7 +669,7 @@ class VirtualMask:
 
         if ax is None:
             fig, ax = plt.subplots()
-        ax.imshow(self.client.get_virtual_mask(self.index), vmax=3, vmin=0, **kwargs)
+        ax.imshow(self[:], vmax=3, vmin=0, **kwargs)
         return ax
 
     @property
@@ -3,5 +3,18 @@
 
 from deapi.fake_data.base_fake_data import BaseFakeData
 from deapi.fake_data.grains import TiltGrains
+from deapi.fake_data.cache import DatasetCache
+from deapi.fake_data.virtual_images import VirtualImageEngine
+from deapi.fake_data.file_data import FileData
+from deapi.fake_data.noise import NoiseModel
+from deapi.fake_data.references import DetectorReferences
 
-__all__ = ["BaseFakeData", "TiltGrains"]
+__all__ = [
+    "BaseFakeData",
+    "TiltGrains",
+    "DatasetCache",
+    "VirtualImageEngine",
+    "FileData",
+    "NoiseModel",
+    "DetectorReferences",
+]
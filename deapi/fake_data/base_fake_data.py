@@ -1,5 +1,32 @@
+import copy
+
 import numpy as np
-from skimage.transform import resize
+
+from deapi.fake_data.virtual_images import VirtualImageEngine
+
+
+def bin_frames(frames, roi_x, roi_y, binning_x, binning_y):
+    """
+    Crop a stack of frames to a hardware ROI and sum the pixels in each bin.
+
+    Parameters
+    ----------
+    frames : np.ndarray
+        The (n, kx, ky) stack of frames.
+    roi_x, roi_y : slice
+        The hardware ROI along each axis of the frames.
+    binning_x, binning_y : int
+        The hardware binning along each axis of the frames.
+    """
+    hw_roi = frames[:, roi_x, roi_y]
+    shape = (
+        hw_roi.shape[0],
+        binning_x,
+        hw_roi.shape[1] // binning_x,
+        binning_y,
+        hw_roi.shape[2] // binning_y,
+    )
+    return hw_roi.reshape(shape).sum(axis=(1, 3))
 
 
 class BaseFakeData:
@@ -20,49 +47,108 @@ class BaseFakeData:
         Virtual Images are then created by only calculating the virtual image from each of the M signals
         and then substituting the result into the navigator array!
         """
-        self.navigator = np.array(navigator).astype(int)
+        navigator = np.asarray(navigator)
+        if not np.issubdtype(navigator.dtype, np.integer):
+            navigator = navigator.astype(int)
+        self.navigator = navigator  # compact integer labels are kept as they are
         self._signal = np.array(signal)
+        self._binned_signal = None
+        self._server = None
+        self.virtual_image_engine = VirtualImageEngine()
         self.server = server
 
+    # Properties which change the slicing/binning of the signal array
+    ROI_PROPERTIES = (
+        "Hardware ROI Offset X",
+        "Hardware ROI Offset Y",
+        "Hardware ROI Size X",
+        "Hardware ROI Size Y",
+        "Hardware Binning X",
+        "Hardware Binning Y",
+    )
+
+    @property
+    def server(self):
+        """
+        The server which the fake data is attached to.
+
+        The binned signal is cached and only recomputed when one of the ``ROI_PROPERTIES``
+        is changed on the server.
+        """
+        return self._server
+
+    @server.setter
+    def server(self, server):
+        if server is self._server:
+            return
+        if self._server is not None:
+            for name in self.ROI_PROPERTIES:
+                self._server.remove_property_callback(name, self._invalidate_signal)
+        self._server = server
+        if server is not None:
+            for name in self.ROI_PROPERTIES:
+                server.add_property_callback(name, self._invalidate_signal)
+        self._invalidate_signal()
+
+    def view(self, server=None):
+        """
+        A new dataset which shares the navigator and signal arrays of this one.
+
+        The arrays are made read only, and the view has its own server, binned
+        signal and virtual image cache. This lets one (cached) dataset be served by
+        several servers with different hardware ROIs and binning.
+        """
+        for array in (self.navigator, self._signal):
+            if isinstance(array, np.ndarray):
+                array.flags.writeable = False
+        view = copy.copy(self)
+        view._server = None
+        view._binned_signal = None
+        view.virtual_image_engine = VirtualImageEngine(
+            self.virtual_image_engine.max_items
+        )
+        view.server = server
+        return view
+
+    def _invalidate_signal(self, name=None):
+        self._binned_signal = None
+
+    @property
+    def nbytes(self):
+        """
+        The number of bytes used by the navigator and signal arrays.
+        """
+        return self.navigator.nbytes + self._signal.nbytes
+
     @property
     def signal(self):
         """
         Slice the signal array given the parameters from the server if initialized.
         """
-        s = self._signal
         if self.server is None:
-            return s
-        else:
-            hw_roi = s[
-                :,
-                int(self.server["Hardware ROI Offset X"]) : int(
-                    self.server["Hardware ROI Offset X"]
-                )
-                + int(self.server["Hardware ROI Size X"]),
-                int(self.server["Hardware ROI Offset Y"]) : int(
-                    self.server["Hardware ROI Offset Y"]
-                )
-                + int(self.server["Hardware ROI Size Y"]),
-            ]
-            shape = (
-                4,
-                int(self.server["Hardware Binning X"]),
-                hw_roi.shape[1] // int(self.server["Hardware Binning X"]),
-                int(self.server["Hardware Binning Y"]),
-                hw_roi.shape[2] // int(self.server["Hardware Binning Y"]),
-            )
-            binned_roi = hw_roi.reshape(shape).sum(axis=(1, 3))
-
-            # handling both is a bit tricky
-            """
-            sw_roi = binned_roi[self.server['Crop Offset X']:self.server['Crop Size X']+self.server['Crop Offset X'],
-                                self.server['Crop Offset Y']:self.server['Crop Size Y']+self.server['Crop Offset Y']]
-            sw_binned_roi = sw_roi.reshape(self.server["Binning X"],
-                                             sw_roi.shape[0] // self.server["Binning X"],
-                                             self.server["Binning Y"],
-                                             sw_roi.shape[1]//self.server["Binning Y"]).sum(axis=(0,2))
-            """
-            return binned_roi
+            return self._signal
+        if self._binned_signal is None:
+            self._binned_signal = self._bin_signal()
+        return self._binned_signal
+
+    def _roi_binning(self):
+        """
+        The hardware ROI (as slices) and binning set on the server.
+        """
+        offset_x = int(self.server["Hardware ROI Offset X"])
+        offset_y = int(self.server["Hardware ROI Offset Y"])
+        roi_x = slice(offset_x, offset_x + int(self.server["Hardware ROI Size X"]))
+        roi_y = slice(offset_y, offset_y + int(self.server["Hardware ROI Size Y"]))
+        return (
+            roi_x,
+            roi_y,
+            int(self.server["Hardware Binning X"]),
+            int(self.server["Hardware Binning Y"]),
+        )
+
+    def _bin_signal(self):
+        # handling the software ROI and binning as well is a bit tricky
+        return bin_frames(self._signal, *self._roi_binning())
 
     def __getitem__(self, item):
         """
@@ -77,25 +163,25 @@ class BaseFakeData:
         """
         Get the virtual image at the given item in the navigator array.
         """
-        if virtual_mask.shape != self.signal.shape[1:]:
-            virtual_mask = resize(
-                virtual_mask,
-                (self.signal.shape[1], self.signal.shape[2]),
-                preserve_range=True,
-            ).astype(np.int8)
-
-        positive = virtual_mask == 2
-        negative = virtual_mask == 0
-        s = self.signal
-
-        if method == "Sum":
-            values = np.sum(s * positive[np.newaxis], axis=(1, 2))
-        elif method == "Difference":
-            values = np.sum(s * positive[np.newaxis], axis=(1, 2)) - np.sum(
-                s * negative[np.newaxis], axis=(1, 2)
-            )
-        else:
-            raise ValueError(
-                f"Method {method} not recognized. Please use 'sum' or 'difference'"
-            )
-        return values[self.navigator]
+        return self.get_virtual_images([virtual_mask], [method])[0]
+
+    def get_virtual_images(self, virtual_masks, methods):
+        """
+        Get the virtual images for several virtual masks at once.
+
+        The response of each label to the masks is computed in a single pass and
+        cached, so repeated requests with unchanged masks are only an indexing
+        operation.
+        """
+        responses = self.get_virtual_responses(virtual_masks, methods)
+        return [r[self.navigator] for r in responses]
+
+    def get_virtual_responses(self, virtual_masks, methods):
+        """
+        Get the virtual detector response of each label for several virtual masks.
+
+        Indexing a response with the navigator gives the virtual image.
+        """
+        return self.virtual_image_engine.get_responses(
+            self.signal, virtual_masks, methods
+        )
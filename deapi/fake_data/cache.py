@@ -0,0 +1,85 @@
+from collections import OrderedDict
+
+
+class DatasetCache:
+    """
+    A least recently used (LRU) cache for generated fake datasets.
+
+    Generating a fake dataset (e.g. :class:`deapi.fake_data.TiltGrains`) can take several
+    seconds for large scans.  The cache keeps the most recently used datasets around so
+    that repeated acquisitions with the same geometry can reuse them.  Datasets are
+    evicted in least recently used order once either ``max_items`` or ``max_bytes`` is
+    exceeded.
+
+    Parameters
+    ----------
+    max_items : int, optional
+        The maximum number of datasets to keep, by default 8
+    max_bytes : int, optional
+        The maximum total size of the cached datasets in bytes, by default 2 GB.
+        Datasets larger than this are never cached.
+    """
+
+    def __init__(self, max_items=8, max_bytes=2 * 1024**3):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._datasets = OrderedDict()
+        self._sizes = {}
+
+    def __len__(self):
+        return len(self._datasets)
+
+    def __contains__(self, key):
+        return key in self._datasets
+
+    @property
+    def nbytes(self):
+        """The total size of the cached datasets in bytes"""
+        return sum(self._sizes.values())
+
+    def get(self, key, default=None):
+        """
+        Get a dataset from the cache and mark it as the most recently used.
+        """
+        if key not in self._datasets:
+            return default
+        self._datasets.move_to_end(key)
+        return self._datasets[key]
+
+    def put(self, key, dataset):
+        """
+        Add a dataset to the cache, evicting the least recently used datasets if needed.
+        """
+        nbytes = getattr(dataset, "nbytes", 0)
+        self.pop(key)
+        if nbytes > self.max_bytes or self.max_items < 1:
+            return dataset
+        self._datasets[key] = dataset
+        self._sizes[key] = nbytes
+        while len(self._datasets) > self.max_items or self.nbytes > self.max_bytes:
+            oldest = next(iter(self._datasets))
+            self.pop(oldest)
+        return dataset
+
+    def pop(self, key, default=None):
+        """
+        Remove a dataset from the cache.
+        """
+        self._sizes.pop(key, None)
+        return self._datasets.pop(key, default)
+
+    def clear(self):
+        """
+        Remove all datasets from the cache.
+        """
+        self._datasets.clear()
+        self._sizes.clear()
+
+    def get_or_create(self, key, factory):
+        """
+        Get a dataset from the cache or create it by calling ``factory()``.
+        """
+        dataset = self.get(key)
+        if dataset is None:
+            dataset = self.put(key, factory())
+        return dataset
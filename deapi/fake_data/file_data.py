@@ -0,0 +1,243 @@
+import os
+
+import numpy as np
+
+from deapi.fake_data.base_fake_data import BaseFakeData, bin_frames
+
+RAW_EXTENSIONS = (".raw", ".bin", ".dat")
+
+
+def open_array(path, dtype=None, shape=None, offset=0, key=None):
+    """
+    Open an on-disk 4D STEM array without loading it into memory.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        The file to open. ``.npy`` files are memory-mapped, raw binary files
+        (``.raw``, ``.bin``, ``.dat``) are memory-mapped with the given ``dtype``
+        and ``shape``. ``.zarr`` and ``.h5``/``.hdf5`` files are opened with zarr and
+        h5py if they are installed.
+    dtype : str or np.dtype, optional
+        The data type of a raw binary file.
+    shape : tuple of int, optional
+        The shape of a raw binary file, either (x, y, kx, ky) or (n, kx, ky).
+    offset : int, optional
+        The number of header bytes to skip in a raw binary file, by default 0.
+    key : str, optional
+        The path of the dataset in a zarr or HDF5 file. By default the first array
+        with 3 or 4 dimensions is used.
+
+    Returns
+    -------
+    array-like
+        An array which is only read from disk when it is sliced.
+    """
+    path = os.fspath(path)
+    extension = os.path.splitext(path.rstrip("/\\"))[1].lower()
+    if extension == ".npy":
+        return np.load(path, mmap_mode="r")
+    elif extension in RAW_EXTENSIONS:
+        if dtype is None or shape is None:
+            raise ValueError("The dtype and shape are needed to open a raw binary file")
+        return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+    elif extension == ".zarr":
+        try:
+            import zarr
+        except ImportError:  # pragma: no cover
+            raise ImportError("zarr is needed to open .zarr datasets")
+        group = zarr.open(path, mode="r")
+        return group if key is None and hasattr(group, "shape") else _find(group, key)
+    elif extension in (".h5", ".hdf5"):
+        try:
+            import h5py
+        except ImportError:  # pragma: no cover
+            raise ImportError("h5py is needed to open HDF5 datasets")
+        return _find(h5py.File(path, mode="r"), key)
+    else:
+        raise ValueError(
+            f"File type {extension} not recognized. Please use .npy, "
+            f"{', '.join(RAW_EXTENSIONS)}, .zarr or .h5"
+        )
+
+
+def _find(group, key=None):
+    # Find the first 3D or 4D array in a zarr or HDF5 group
+    if key is not None:
+        return group[key]
+    found = []
+
+    def visit(name, obj=None):
+        obj = group[name] if obj is None else obj
+        if not found and hasattr(obj, "shape") and len(obj.shape) in (3, 4):
+            found.append(obj)
+
+    if hasattr(group, "visititems"):
+        group.visititems(visit)
+    else:
+        for name, obj in group.arrays(recurse=True):
+            visit(name, obj)
+    if not found:
+        raise ValueError("No 3D or 4D dataset found. Please pass the key")
+    return found[0]
+
+
+class FileFrames:
+    """
+    A lazy (n, kx, ky) stack of frames read from an on-disk array.
+
+    Frames are only read when the stack is indexed, and each frame is cropped and
+    binned to the hardware ROI as it is read.
+
+    Parameters
+    ----------
+    data : array-like
+        The (x, y, kx, ky) or (n, kx, ky) array on disk.
+    roi_binning : tuple, optional
+        The (roi_x, roi_y, binning_x, binning_y) to apply to each frame.
+    chunk_frames : int, optional
+        The number of frames read at once by ``iter_chunks``, by default 256.
+    """
+
+    def __init__(self, data, roi_binning=None, chunk_frames=256):
+        self.data = data
+        self.roi_binning = roi_binning
+        self.chunk_frames = chunk_frames
+        frame_shape = tuple(data.shape[-2:])
+        if roi_binning is not None:
+            roi_x, roi_y, binning_x, binning_y = roi_binning
+            frame_shape = (
+                len(range(frame_shape[0])[roi_x]) // binning_x,
+                len(range(frame_shape[1])[roi_y]) // binning_y,
+            )
+        self.shape = (int(np.prod(data.shape[:-2])),) + frame_shape
+        if roi_binning is None:
+            self.dtype = np.dtype(data.dtype)
+        else:  # binning sums the pixels
+            self.dtype = np.zeros(1, dtype=data.dtype).sum().dtype
+
+    def __len__(self):
+        return self.shape[0]
+
+    @property
+    def ndim(self):
+        return 3
+
+    def _read(self, start, stop):
+        # Read the frames [start, stop) in scan order
+        if len(self.data.shape) == 3:
+            frames = np.asarray(self.data[start:stop])
+        else:
+            row = self.data.shape[1]
+            first, last = start // row, -(-stop // row)
+            frames = np.asarray(self.data[first:last])
+            frames = frames.reshape((-1,) + frames.shape[-2:])
+            frames = frames[start - first * row : stop - first * row]
+        if self.roi_binning is not None:
+            frames = bin_frames(frames, *self.roi_binning)
+        return frames
+
+    def __getitem__(self, item):
+        if isinstance(item, (int, np.integer)):
+            index = range(len(self))[item]
+            return self._read(index, index + 1)[0]
+        elif isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            return self._read(start, stop)[::step]
+        item = np.asarray(item)
+        flat = item.ravel()
+        if flat.size == 0:
+            frames = np.empty((0,) + self.shape[1:], dtype=self.dtype)
+        elif np.all(np.diff(flat) == 1):
+            # contiguous frames (e.g. a movie buffer) are read in one go
+            frames = self._read(int(flat[0]), int(flat[-1]) + 1)
+        else:
+            frames = np.stack([self[int(i)] for i in flat])
+        return frames.reshape(item.shape + frames.shape[1:])
+
+    def iter_chunks(self):
+        """
+        Iterate over all of the frames in chunks of ``chunk_frames``.
+
+        Yields
+        ------
+        start : int
+            The index of the first frame in the chunk.
+        frames : np.ndarray
+            The frames in the chunk.
+        """
+        for start in range(0, len(self), self.chunk_frames):
+            yield start, self._read(start, min(start + self.chunk_frames, len(self)))
+
+    def __array__(self, dtype=None, copy=None):
+        frames = self._read(0, len(self))
+        return frames if dtype is None else frames.astype(dtype)
+
+
+class FileData(BaseFakeData):
+    """
+    Fake data which serves the frames of a real 4D STEM dataset on disk.
+
+    Unlike the synthetic datasets every scan position has its own frame, so the
+    navigator is simply the index of each position. The dataset is never loaded into
+    memory: frames are read (and cropped/binned to the hardware ROI) when they are
+    requested and virtual images are computed by streaming over chunks of frames.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        The dataset to serve. See :func:`open_array` for the supported formats.
+    scan_shape : tuple of int, optional
+        The (x, y) scan shape for datasets stored as a (n, kx, ky) stack of frames.
+        By default the frames are treated as a single row.
+    chunk_frames : int, optional
+        The number of frames read at once when computing virtual images, by default
+        256.
+    server : FakeServer, optional
+        The server which the data is attached to.
+    **kwargs
+        Passed to :func:`open_array` (e.g. ``dtype``, ``shape`` and ``offset`` for
+        raw binary files, or ``key`` for zarr and HDF5 files).
+    """
+
+    def __init__(self, path, scan_shape=None, chunk_frames=256, server=None, **kwargs):
+        self.path = path
+        self.data = open_array(path, **kwargs)
+        if len(self.data.shape) == 4:
+            scan_shape = tuple(self.data.shape[:2])
+        elif len(self.data.shape) == 3:
+            if scan_shape is None:
+                scan_shape = (1, self.data.shape[0])
+            elif int(np.prod(scan_shape)) != self.data.shape[0]:
+                raise ValueError(
+                    f"The scan shape {scan_shape} does not match the "
+                    f"{self.data.shape[0]} frames in {path}"
+                )
+        else:
+            raise ValueError(
+                f"The dataset in {path} should have 3 or 4 dimensions, not "
+                f"{len(self.data.shape)}"
+            )
+        self.chunk_frames = chunk_frames
+        navigator = np.arange(int(np.prod(scan_shape))).reshape(scan_shape)
+        super().__init__(navigator, None, server=server)
+        self._signal = FileFrames(self.data, chunk_frames=chunk_frames)
+
+    @property
+    def frame_shape(self):
+        """
+        The (kx, ky) shape of the frames on disk.
+        """
+        return tuple(self.data.shape[-2:])
+
+    @property
+    def nbytes(self):
+        """
+        The number of bytes held in memory (the dataset itself stays on disk).
+        """
+        return self.navigator.nbytes
+
+    def _bin_signal(self):
+        return FileFrames(
+            self.data, roi_binning=self._roi_binning(), chunk_frames=self.chunk_frames
+        )
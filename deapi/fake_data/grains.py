@@ -1,9 +1,74 @@
-from skimage.segmentation import expand_labels
 import numpy as np
+from scipy.spatial import cKDTree
 from skimage.draw import disk
 
 from deapi.fake_data.base_fake_data import BaseFakeData
 
+# Above this many seeds the nearest seed is found with a KD-tree instead of by
+# comparing the distance to every seed
+KDTREE_SEEDS = 64
+
+
+def voronoi_labels(shape, seeds, block_size=2**22):
+    """
+    Label each position of a grid with the index of the nearest seed.
+
+    The grid is labelled in blocks of rows so the memory used is independent of
+    the size of the grid. For a few seeds the squared distance to each seed is
+    built from separable row and column terms and compared in place, and for many
+    seeds a KD-tree is queried instead.
+
+    Parameters
+    ----------
+    shape : tuple of int
+        The (x, y) shape of the grid.
+    seeds : array-like
+        The (n, 2) (x, y) positions of the seeds.
+    block_size : int, optional
+        The number of positions labelled at once, by default 4M.
+
+    Returns
+    -------
+    np.ndarray
+        The labels, using the smallest unsigned integer type which holds ``n - 1``.
+    """
+    seeds = np.asarray(seeds).reshape(-1, 2)
+    if len(seeds) == 0:
+        raise ValueError("At least one seed is needed")
+    shape = tuple(int(i) for i in shape)
+    labels = np.empty(shape, dtype=np.min_scalar_type(len(seeds) - 1))
+    rows = max(1, min(shape[0], block_size // max(shape[1], 1)))
+
+    if len(seeds) > KDTREE_SEEDS:
+        tree = cKDTree(seeds)
+        for start in range(0, shape[0], rows):
+            stop = min(start + rows, shape[0])
+            xx, yy = np.mgrid[start:stop, 0 : shape[1]]
+            _, nearest = tree.query(np.column_stack([xx.ravel(), yy.ravel()]))
+            labels[start:stop] = nearest.reshape(xx.shape)
+        return labels
+
+    # exact integer distances (int32 is enough for grids up to ~32k x 32k)
+    dtype = np.int32 if 2 * max(shape) ** 2 < 2**31 else np.int64
+    seeds = seeds.astype(dtype)
+    dx2 = (np.arange(shape[0], dtype=dtype)[:, None] - seeds[:, 0]) ** 2
+    dy2 = (np.arange(shape[1], dtype=dtype)[:, None] - seeds[:, 1]) ** 2
+    best = np.empty((rows, shape[1]), dtype=dtype)
+    distance = np.empty_like(best)
+    closer = np.empty(best.shape, dtype=bool)
+    for start in range(0, shape[0], rows):
+        stop = min(start + rows, shape[0])
+        n = stop - start
+        block = labels[start:stop]
+        block[:] = 0
+        np.add(dx2[start:stop, 0, None], dy2[None, :, 0], out=best[:n])
+        for i in range(1, len(seeds)):
+            np.add(dx2[start:stop, i, None], dy2[None, :, i], out=distance[:n])
+            np.less(distance[:n], best[:n], out=closer[:n])
+            np.copyto(block, i, where=closer[:n], casting="unsafe")
+            np.minimum(best[:n], distance[:n], out=best[:n])
+    return labels
+
 
 class TiltGrains(BaseFakeData):
 
@@ -76,12 +141,13 @@ class TiltGrains(BaseFakeData):
         seed=0,
         size=40,
     ):
+        """
+        Split the scan into grains around random seed positions.
+
+        Each scan position is labelled with the index of the nearest seed (a Voronoi
+        tessellation), see :func:`voronoi_labels`.
+        """
         rng = np.random.default_rng(seed)
         x = rng.integers(0, x_pixels, size=num_grains)
         y = rng.integers(0, y_pixels, size=num_grains)
-
-        navigator = np.zeros((x_pixels, y_pixels))
-        for i in range(num_grains):
-            navigator[x[i], y[i]] = i
-        navigator = expand_labels(navigator, distance=x_pixels * 2)
-        return navigator
+        return voronoi_labels((x_pixels, y_pixels), np.column_stack([x, y]))
@@ -0,0 +1,229 @@
+from collections import OrderedDict
+
+import numpy as np
+
+# The guide table has this many entries per pixel (see NoiseModel._tables)
+GUIDE_RESOLUTION = 4
+
+
+class NoiseModel:
+    """
+    Vectorized detector noise and electron counting for fake data.
+
+    The noiseless signal of each label is treated as the probability distribution of
+    where electrons land on the detector. For a batch of frames the number of
+    electrons in each frame is drawn from a Poisson distribution and the electrons are
+    placed by inverse transform sampling of the cumulative distribution of each
+    label, so drawing the events costs time in proportion to the number of electrons
+    rather than the number of pixels. Dense frames still have every pixel written, so
+    for large detectors :meth:`counted` and :meth:`integrated` are limited by the size
+    of the output rather than the dose. This gives:
+
+    * sparse electron events (:meth:`events`),
+    * electron counted frames (:meth:`counted`) and
+    * integrated frames with shot noise, a dark level and Gaussian read noise
+      (:meth:`integrated`). The read noise is taken from random offsets into a
+      precomputed bank of noise rather than drawn for every pixel.
+
+    Parameters
+    ----------
+    dose : float, optional
+        The mean number of electrons per pixel per frame, by default 0.01.
+    gain : float, optional
+        The signal (in ADU) of one electron in an integrated frame, by default 10.
+    read_noise : float, optional
+        The standard deviation of the read noise (in ADU), by default 2.
+    dark_level : float, optional
+        The offset (in ADU) added to integrated frames, by default 20.
+    bank_frames : int, optional
+        The size of the read noise bank in frames, by default 4.
+    seed : int, optional
+        The seed for the random number generator, by default None.
+    max_labels : int, optional
+        The number of labels to keep sampling tables for, by default 16.
+    """
+
+    def __init__(
+        self,
+        dose=0.01,
+        gain=10.0,
+        read_noise=2.0,
+        dark_level=20.0,
+        bank_frames=4,
+        seed=None,
+        max_labels=16,
+    ):
+        if dose < 0:
+            raise ValueError(f"The dose must be positive, not {dose}")
+        self.dose = dose
+        self.gain = gain
+        self.read_noise = read_noise
+        self.dark_level = dark_level
+        self.bank_frames = bank_frames
+        self.max_labels = max_labels
+        self.rng = np.random.default_rng(seed)
+        self._signal = None
+        self._tables = OrderedDict()
+        self._bank = None
+
+    def _set_signal(self, signal):
+        if signal is not self._signal:
+            self._signal = signal
+            self._tables.clear()
+
+    def _sampling_tables(self, label):
+        # The cumulative distribution of electrons over the pixels of one label and a
+        # guide table with the first candidate pixel for each small range of the
+        # distribution, so most samples are found with a single lookup.
+        if label not in self._tables:
+            cdf = np.cumsum(self._signal[label].ravel(), dtype=np.float64)
+            if cdf[-1] <= 0:
+                cdf = np.arange(1, cdf.size + 1, dtype=np.float64)
+            cdf /= cdf[-1]
+            size = GUIDE_RESOLUTION * cdf.size
+            guide = np.searchsorted(cdf, np.arange(size) / size, side="right")
+            self._tables[label] = (cdf, guide.astype(np.int32))
+            while len(self._tables) > self.max_labels:
+                self._tables.popitem(last=False)
+        self._tables.move_to_end(label)
+        return self._tables[label]
+
+    def _sample(self, label, uniform):
+        # Inverse transform sampling: the first pixel with cdf > uniform
+        cdf, guide = self._sampling_tables(label)
+        pixels = guide[(uniform * guide.size).astype(np.int64)].astype(np.int64)
+        wrong = np.flatnonzero(cdf[pixels] <= uniform)
+        for _ in range(2):  # usually the next pixel along
+            if wrong.size == 0:
+                break
+            pixels[wrong] += 1
+            wrong = wrong[cdf[pixels[wrong]] <= uniform[wrong]]
+        pixels[wrong] = np.searchsorted(cdf, uniform[wrong], side="right")
+        return pixels
+
+    def events(self, signal, labels):
+        """
+        Draw the electron events for a batch of frames.
+
+        Parameters
+        ----------
+        signal : np.ndarray
+            The noiseless (labels, kx, ky) signal.
+        labels : array-like of int
+            The label of each frame in the batch.
+
+        Returns
+        -------
+        frames : np.ndarray
+            The index (in the batch) of the frame of each event, sorted.
+        pixels : np.ndarray
+            The flat pixel index of each event.
+        """
+        self._set_signal(signal)
+        labels = np.asarray(labels, dtype=int).ravel()
+        num_pixels = int(np.prod(signal.shape[1:]))
+        counts = self.rng.poisson(self.dose * num_pixels, size=labels.size)
+        frames = np.repeat(np.arange(labels.size), counts)
+        pixels = np.empty(frames.size, dtype=np.int64)
+        unique = np.unique(labels)
+        for label in unique:
+            if unique.size == 1:
+                in_group = slice(None)
+            else:
+                in_group = labels[frames] == label
+            group_frames = frames[in_group]
+            # Sorting the uniform samples within each frame makes the lookups
+            # (mostly) sequential. The order of events in a frame is irrelevant.
+            uniform = self.rng.random(group_frames.size)
+            uniform += group_frames
+            uniform.sort()
+            uniform -= group_frames
+            pixels[in_group] = self._sample(int(label), uniform)
+        return frames, pixels
+
+    @staticmethod
+    def _pixel_counts(frames, pixels, num_pixels):
+        # The events are sorted by frame and (because the uniform samples are sorted
+        # in each frame) by pixel, so repeated pixels are next to each other.
+        linear = frames * num_pixels + pixels
+        starts = np.flatnonzero(np.diff(linear, prepend=-1))
+        counts = np.diff(starts, append=linear.size)
+        return linear[starts], counts
+
+    def counted(self, signal, labels, dtype=np.uint8):
+        """
+        Electron counted frames for a batch of labels.
+
+        Parameters
+        ----------
+        signal : np.ndarray
+            The noiseless (labels, kx, ky) signal.
+        labels : array-like of int
+            The label of each frame in the batch.
+        dtype : np.dtype, optional
+            The data type of the frames, by default uint8. Counts are clipped to the
+            largest value of the data type.
+
+        Returns
+        -------
+        np.ndarray
+            The number of electrons in each pixel with shape ``labels.shape + (kx, ky)``.
+        """
+        shape = np.shape(labels) + tuple(signal.shape[1:])
+        num_pixels = int(np.prod(signal.shape[1:]))
+        frames, pixels = self.events(signal, labels)
+        linear, counts = self._pixel_counts(frames, pixels, num_pixels)
+        if np.issubdtype(dtype, np.integer):
+            np.minimum(counts, np.iinfo(dtype).max, out=counts)
+        output = np.zeros(shape, dtype=dtype)
+        output.ravel()[linear] = counts
+        return output
+
+    def _noise_bank(self, num_pixels, dtype):
+        # The dark level plus read noise for a few frames, already in the output type
+        key = (num_pixels, np.dtype(dtype))
+        if self._bank is None or self._bank[0] != key:
+            size = (self.bank_frames + 1) * num_pixels
+            bank = self.rng.normal(self.dark_level, self.read_noise, size)
+            if np.issubdtype(dtype, np.integer):
+                info = np.iinfo(dtype)
+                bank = np.clip(np.rint(bank), info.min, info.max)
+            self._bank = (key, bank.astype(dtype))
+        return self._bank[1]
+
+    def integrated(self, signal, labels, dtype=np.uint16):
+        """
+        Integrated frames with shot noise, a dark level and read noise.
+
+        Parameters
+        ----------
+        signal : np.ndarray
+            The noiseless (labels, kx, ky) signal.
+        labels : array-like of int
+            The label of each frame in the batch.
+        dtype : np.dtype, optional
+            The data type of the frames, by default uint16. Integer frames are rounded
+            and clipped to the range of the data type.
+
+        Returns
+        -------
+        np.ndarray
+            The frames with shape ``labels.shape + (kx, ky)``.
+        """
+        shape = np.shape(labels) + tuple(signal.shape[1:])
+        num_pixels = int(np.prod(signal.shape[1:]))
+        output = np.empty((int(np.prod(np.shape(labels))), num_pixels), dtype=dtype)
+        bank = self._noise_bank(num_pixels, dtype)
+        offsets = self.rng.integers(0, bank.size - num_pixels + 1, size=len(output))
+        for frame, offset in zip(output, offsets):
+            frame[:] = bank[offset : offset + num_pixels]
+
+        frames, pixels = self.events(signal, labels)
+        linear, counts = self._pixel_counts(frames, pixels, num_pixels)
+        flat = output.ravel()
+        values = flat[linear] + self.gain * counts
+        if np.issubdtype(dtype, np.integer):
+            info = np.iinfo(dtype)
+            values = np.clip(np.rint(values), info.min, info.max)
+        flat[linear] = values
+        return output.reshape(shape)
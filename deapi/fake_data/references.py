@@ -0,0 +1,91 @@
+import numpy as np
+
+
+class DetectorReferences:
+    """
+    Dark, gain and bad pixel references for simulated raw frames.
+
+    The fake datasets are corrected frames. Raw frames are simulated from them with
+    a fixed pattern dark level, a per-pixel gain and some dead pixels so that
+    applying the references (``(raw - dark) * gain`` and replacing the bad pixels)
+    gives the corrected frames back. The references for each frame shape are
+    generated once from the seed.
+
+    Parameters
+    ----------
+    dark_level : float, optional
+        The mean dark level (in ADU), by default 20.
+    dark_variation : float, optional
+        The standard deviation of the fixed pattern of the dark level, by default 2.
+    gain_variation : float, optional
+        The standard deviation of the gain around 1, by default 0.05.
+    bad_pixel_fraction : float, optional
+        The fraction of dead pixels, by default 0.001.
+    seed : int, optional
+        The seed for the references, by default 0.
+    """
+
+    def __init__(
+        self,
+        dark_level=20.0,
+        dark_variation=2.0,
+        gain_variation=0.05,
+        bad_pixel_fraction=0.001,
+        seed=0,
+    ):
+        self.dark_level = dark_level
+        self.dark_variation = dark_variation
+        self.gain_variation = gain_variation
+        self.bad_pixel_fraction = bad_pixel_fraction
+        self.seed = seed
+        self._shape = None
+        self._references = None
+
+    def get(self, shape):
+        """
+        The references for some frame shape.
+
+        Returns
+        -------
+        dark : np.ndarray
+            The float32 dark level of each pixel.
+        gain : np.ndarray
+            The float32 gain correction of each pixel (the factor that the dark
+            subtracted frame is multiplied by).
+        bad_pixels : np.ndarray
+            A uint8 map which is 1 for bad pixels.
+        """
+        shape = tuple(int(i) for i in shape)
+        if shape != self._shape:
+            rng = np.random.default_rng(self.seed)
+            dark = rng.normal(self.dark_level, self.dark_variation, shape)
+            gain = rng.normal(1, self.gain_variation, shape)
+            bad = rng.random(shape) < self.bad_pixel_fraction
+            np.clip(gain, 0.5, 1.5, out=gain)
+            self._references = (
+                dark.astype(np.float32),
+                gain.astype(np.float32),
+                bad.astype(np.uint8),
+            )
+            self._shape = shape
+        return self._references
+
+    def raw(self, frame):
+        """
+        Simulate the raw frame (before the references are applied) of a frame.
+
+        Parameters
+        ----------
+        frame : np.ndarray
+            The corrected frame.
+
+        Returns
+        -------
+        np.ndarray
+            The float32 raw frame. Bad pixels are 0.
+        """
+        dark, gain, bad = self.get(frame.shape)
+        raw = np.divide(frame, gain, dtype=np.float32)
+        raw += dark
+        raw[bad.astype(bool)] = 0
+        return raw
@@ -0,0 +1,133 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+from skimage.transform import resize
+
+
+class VirtualImageEngine:
+    """
+    Compute and cache the virtual detector response of each label in a fake dataset.
+
+    Fake datasets only have a handful of unique diffraction patterns (one per label in
+    the navigator) so a virtual image is fully described by the response of each label
+    to the virtual mask.  The responses are cached by the content of the mask and the
+    calculation type, and all of the missing responses are computed together with a
+    single matrix multiplication of the flattened signal against the stacked masks.
+
+    The cache is cleared whenever a different signal array is passed (e.g. after the
+    hardware ROI or binning changes). Signals which are too large to hold in memory
+    (see :class:`deapi.fake_data.file_data.FileFrames`) are streamed chunk by chunk
+    through ``iter_chunks`` instead.
+
+    Parameters
+    ----------
+    max_items : int, optional
+        The maximum number of (mask, calculation) responses to keep, by default 64
+    """
+
+    METHODS = ("Sum", "Difference")
+
+    def __init__(self, max_items=64):
+        self.max_items = max_items
+        self._responses = OrderedDict()
+        self._signal = None
+        self._flat_signal = None
+
+    def __len__(self):
+        return len(self._responses)
+
+    def clear(self):
+        """
+        Clear all of the cached responses.
+        """
+        self._responses.clear()
+        self._signal = None
+        self._flat_signal = None
+
+    @staticmethod
+    def mask_key(mask):
+        """
+        A hashable key describing the content of a virtual mask.
+        """
+        mask = np.ascontiguousarray(mask, dtype=np.int8)
+        digest = hashlib.blake2b(mask.data, digest_size=16).hexdigest()
+        return digest, mask.shape
+
+    @classmethod
+    def weights(cls, mask, method="Sum"):
+        """
+        Get the weight of each pixel in the mask for some calculation type.
+
+        Pixels equal to 2 are added and, for the "Difference" calculation, pixels equal
+        to 0 are subtracted.
+        """
+        if method not in cls.METHODS:
+            raise ValueError(
+                f"Method {method} not recognized. Please use 'sum' or 'difference'"
+            )
+        weights = (mask == 2).astype(np.float64)
+        if method == "Difference":
+            weights -= mask == 0
+        return weights
+
+    def _set_signal(self, signal):
+        if signal is not self._signal:
+            self.clear()
+            self._signal = signal
+
+    def _compute(self, signal, weights):
+        # (labels, pixels) @ (pixels, masks) either in one go or chunk by chunk
+        if hasattr(signal, "iter_chunks"):
+            responses = np.empty((signal.shape[0], weights.shape[1]))
+            for start, frames in signal.iter_chunks():
+                flat = frames.reshape(frames.shape[0], -1)
+                responses[start : start + flat.shape[0]] = flat @ weights
+            return responses
+        if self._flat_signal is None:
+            self._flat_signal = signal.reshape(signal.shape[0], -1).astype(np.float64)
+        return self._flat_signal @ weights
+
+    def get_responses(self, signal, masks, methods):
+        """
+        Get the response of each label in ``signal`` to each of the virtual masks.
+
+        Parameters
+        ----------
+        signal : np.ndarray
+            The (labels, kx, ky) signal array.
+        masks : list of np.ndarray
+            The virtual masks. Masks with a different shape than the signal are resized.
+        methods : list of str
+            The calculation type for each mask, either "Sum" or "Difference".
+
+        Returns
+        -------
+        list of np.ndarray
+            The response of each label for every mask.
+        """
+        self._set_signal(signal)
+        keys = [self.mask_key(m) + (method,) for m, method in zip(masks, methods)]
+
+        missing = {}
+        for key, mask, method in zip(keys, masks, methods):
+            if key not in self._responses and key not in missing:
+                if mask.shape != signal.shape[1:]:
+                    mask = resize(mask, signal.shape[1:], preserve_range=True).astype(
+                        np.int8
+                    )
+                missing[key] = self.weights(mask, method).ravel()
+
+        if missing:
+            stacked = np.stack(list(missing.values()), axis=1)
+            responses = self._compute(signal, stacked)
+            for i, key in enumerate(missing):
+                self._responses[key] = responses[:, i]
+
+        output = []
+        for key in keys:
+            self._responses.move_to_end(key)
+            output.append(self._responses[key])
+        while len(self._responses) > max(self.max_items, len(set(keys))):
+            self._responses.popitem(last=False)
+        return output
@@ -0,0 +1,290 @@
+"""Virtual detector masks.
+
+Virtual masks are int8 images where pixels equal to 2 are added to the virtual
+image, pixels equal to 0 are subtracted (for the "Difference" calculation) and
+pixels equal to 1 are ignored. The functions in this module build the masks for
+common virtual detectors at the resolution of the detector:
+
+.. code-block::
+
+    from deapi import masks
+
+    vbf = masks.disk(client, radius=50)
+    adf = masks.annulus(client, inner_radius=80, outer_radius=200)
+    client.set_virtual_masks(
+        {0: vbf, 1: adf},
+        calculations={0: "Sum", 1: "Sum"},
+    )
+
+The shape can be given as a (height, width) tuple or as a connected
+:class:`deapi.Client` in which case the current image size is used. Masks are
+computed from a cached polar grid with a single vectorized comparison and are
+themselves cached, so the returned arrays are read-only. Use ``mask.copy()`` to get
+an array that can be edited.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+POSITIVE = 2
+IGNORE = 1
+NEGATIVE = 0
+
+
+def detector_shape(shape):
+    """
+    The (height, width) shape of the masks for a shape or a client.
+
+    Parameters
+    ----------
+    shape : tuple of int or deapi.Client
+        The (height, width) of the masks, or a connected client in which case the
+        current image size of the camera is used.
+    """
+    if hasattr(shape, "update_image_size"):
+        shape.update_image_size()
+        shape = (shape.image_sizey, shape.image_sizex)
+    if len(shape) != 2:
+        raise ValueError(f"The shape should be (height, width), not {shape}")
+    return tuple(int(i) for i in shape)
+
+
+def _center(shape, center):
+    if center is None:
+        return (shape[0] // 2, shape[1] // 2)
+    return tuple(float(c) for c in center)
+
+
+@lru_cache(maxsize=2)
+def _polar(shape, center):
+    # The distance and angle (0 - 2 pi, from the x axis towards +y) of each pixel
+    rows, cols = np.ogrid[0 : shape[0], 0 : shape[1]]
+    dy = (rows - center[0]).astype(np.float32)
+    dx = (cols - center[1]).astype(np.float32)
+    radius = np.hypot(dy, dx)
+    angle = np.arctan2(dy, dx) % np.float32(2 * np.pi)
+    radius.flags.writeable = False
+    angle.flags.writeable = False
+    return radius, angle
+
+
+def _to_mask(inside):
+    mask = np.where(inside, np.int8(POSITIVE), np.int8(IGNORE))
+    mask.flags.writeable = False
+    return mask
+
+
+def _in_sector(angle, start, end):
+    span = (end - start) % (2 * np.pi)
+    if span == 0 and end != start:
+        return np.ones(angle.shape, dtype=bool)
+    return (angle - np.float32(start)) % np.float32(2 * np.pi) < span
+
+
+@lru_cache(maxsize=16)
+def _annulus(shape, center, inner_radius, outer_radius):
+    radius, _ = _polar(shape, center)
+    return _to_mask((radius >= inner_radius) & (radius < outer_radius))
+
+
+@lru_cache(maxsize=16)
+def _sector(shape, center, start, end, inner_radius, outer_radius):
+    radius, angle = _polar(shape, center)
+    inside = (radius >= inner_radius) & (radius < outer_radius)
+    return _to_mask(inside & _in_sector(angle, start, end))
+
+
+@lru_cache(maxsize=4)
+def _segments(shape, center, count, rotation, inner_radius, outer_radius):
+    # label every pixel with its segment so that the segments never overlap
+    radius, angle = _polar(shape, center)
+    step = 2 * np.pi / count
+    labels = ((angle - np.float32(rotation)) % np.float32(2 * np.pi)) // step
+    np.minimum(labels, count - 1, out=labels)
+    labels[(radius < inner_radius) | (radius >= outer_radius)] = -1
+    return tuple(_to_mask(labels == i) for i in range(count))
+
+
+def disk(shape, radius, center=None):
+    """
+    A disk, e.g. a virtual bright field detector.
+
+    Parameters
+    ----------
+    shape : tuple of int or deapi.Client
+        The (height, width) of the mask or a client, see :func:`detector_shape`.
+    radius : float
+        The radius of the disk in pixels.
+    center : tuple of float, optional
+        The (row, column) of the center, by default the center of the detector.
+
+    Returns
+    -------
+    np.ndarray
+        A read-only int8 mask which is 2 inside the disk and 1 elsewhere.
+    """
+    return annulus(shape, 0, radius, center=center)
+
+
+def annulus(shape, inner_radius, outer_radius, center=None):
+    """
+    An annulus, e.g. an annular dark field detector.
+
+    Parameters
+    ----------
+    shape : tuple of int or deapi.Client
+        The (height, width) of the mask or a client, see :func:`detector_shape`.
+    inner_radius : float
+        The inner radius in pixels (included).
+    outer_radius : float
+        The outer radius in pixels (excluded).
+    center : tuple of float, optional
+        The (row, column) of the center, by default the center of the detector.
+
+    Returns
+    -------
+    np.ndarray
+        A read-only int8 mask which is 2 inside the annulus and 1 elsewhere.
+    """
+    if outer_radius < inner_radius:
+        raise ValueError("The outer radius must be larger than the inner radius")
+    shape = detector_shape(shape)
+    center = _center(shape, center)
+    return _annulus(shape, center, float(inner_radius), float(outer_radius))
+
+
+def sector(shape, start, end, inner_radius=0, outer_radius=np.inf, center=None):
+    """
+    A sector of an annulus.
+
+    Parameters
+    ----------
+    shape : tuple of int or deapi.Client
+        The (height, width) of the mask or a client, see :func:`detector_shape`.
+    start, end : float
+        The angles (in radians) where the sector starts and ends, measured from the
+        +x (column) axis towards +y (increasing row), i.e. clockwise when plotted
+        with ``imshow``. Sectors can wrap around zero (e.g. from 3 pi / 2 to pi / 2).
+    inner_radius : float, optional
+        The inner radius in pixels, by default 0.
+    outer_radius : float, optional
+        The outer radius in pixels, by default the whole detector.
+    center : tuple of float, optional
+        The (row, column) of the center, by default the center of the detector.
+
+    Returns
+    -------
+    np.ndarray
+        A read-only int8 mask which is 2 inside the sector and 1 elsewhere.
+    """
+    shape = detector_shape(shape)
+    center = _center(shape, center)
+    return _sector(
+        shape,
+        center,
+        float(start),
+        float(end),
+        float(inner_radius),
+        float(outer_radius),
+    )
+
+
+def segments(
+    shape, count=4, inner_radius=0, outer_radius=np.inf, rotation=0, center=None
+):
+    """
+    The segments of a segmented (e.g. differential phase contrast) detector.
+
+    Parameters
+    ----------
+    shape : tuple of int or deapi.Client
+        The (height, width) of the mask or a client, see :func:`detector_shape`.
+    count : int, optional
+        The number of equal segments, by default 4.
+    inner_radius : float, optional
+        The inner radius in pixels, by default 0.
+    outer_radius : float, optional
+        The outer radius in pixels, by default the whole detector.
+    rotation : float, optional
+        The angle (in radians) where the first segment starts, by default 0.
+    center : tuple of float, optional
+        The (row, column) of the center, by default the center of the detector.
+
+    Returns
+    -------
+    list of np.ndarray
+        One read-only int8 mask for each segment.
+    """
+    if count < 1:
+        raise ValueError(f"A detector needs at least one segment, not {count}")
+    shape = detector_shape(shape)
+    center = _center(shape, center)
+    return list(
+        _segments(
+            shape,
+            center,
+            int(count),
+            float(rotation),
+            float(inner_radius),
+            float(outer_radius),
+        )
+    )
+
+
+def difference(positive, negative):
+    """
+    Combine two masks into a mask for the "Difference" calculation.
+
+    Parameters
+    ----------
+    positive : np.ndarray
+        A mask whose positive (2) pixels are added.
+    negative : np.ndarray
+        A mask whose positive (2) pixels are subtracted.
+
+    Returns
+    -------
+    np.ndarray
+        An int8 mask which is 2 where ``positive`` is, 0 where ``negative`` is (and
+        ``positive`` isn't) and 1 elsewhere.
+
+    Examples
+    --------
+    >>> left, right = masks.segments(client, 2, outer_radius=100, rotation=np.pi / 2)
+    >>> dpc_x = masks.difference(right, left)
+    """
+    mask = np.full(np.shape(positive), IGNORE, dtype=np.int8)
+    mask[np.asarray(negative) == POSITIVE] = NEGATIVE
+    mask[np.asarray(positive) == POSITIVE] = POSITIVE
+    return mask
+
+
+def weights(mask, calculation="Sum", dtype=np.float32):
+    """
+    The weight of each pixel of a mask in a virtual image.
+
+    Parameters
+    ----------
+    mask : np.ndarray
+        An int8 virtual mask.
+    calculation : str, optional
+        The calculation of the virtual image, "Sum" (by default) or "Difference".
+    dtype : np.dtype, optional
+        The type of the weights, by default float32.
+
+    Returns
+    -------
+    np.ndarray
+        The weights: 1 for positive pixels, -1 for negative pixels (only for the
+        "Difference" calculation) and 0 elsewhere.
+    """
+    if calculation not in ("Sum", "Difference"):
+        raise ValueError(
+            f"Calculation {calculation} not recognized, use 'Sum' or 'Difference'"
+        )
+    mask = np.asarray(mask)
+    result = (mask == POSITIVE).astype(dtype)
+    if calculation == "Difference":
+        result -= mask == NEGATIVE
+    return result
@@ -0,0 +1,52 @@
+"""Client side processing of streamed frames.
+
+Frames from the movie buffer (or live results, or a dataset on disk) are streamed in
+batches through a pipeline of stages which each accumulate a result, e.g. virtual
+images, without keeping the frames.
+"""
+
+from deapi.processing.frames import (
+    FrameBatch,
+    Stage,
+    run_pipeline,
+    movie_buffer_frames,
+    result_frames,
+    array_frames,
+)
+from deapi.processing.virtual_detectors import VirtualDetectors
+from deapi.processing.center_of_mass import CenterOfMass, CenterOfMassResult
+from deapi.processing.statistics import RunningStatistics, Statistics
+from deapi.processing.correction import ReferenceCorrection, get_reference
+from deapi.processing.counting import ElectronCounting, EVENT_DTYPE
+from deapi.processing.events import ElectronEvents
+from deapi.processing.contrast import (
+    ContrastStretch,
+    StretchLimits,
+    apply_stretch,
+    histogram,
+    stretch_limits,
+)
+
+__all__ = [
+    "FrameBatch",
+    "Stage",
+    "run_pipeline",
+    "movie_buffer_frames",
+    "result_frames",
+    "array_frames",
+    "VirtualDetectors",
+    "CenterOfMass",
+    "CenterOfMassResult",
+    "RunningStatistics",
+    "Statistics",
+    "ReferenceCorrection",
+    "get_reference",
+    "ElectronCounting",
+    "EVENT_DTYPE",
+    "ElectronEvents",
+    "ContrastStretch",
+    "StretchLimits",
+    "apply_stretch",
+    "histogram",
+    "stretch_limits",
+]
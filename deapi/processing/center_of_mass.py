@@ -0,0 +1,130 @@
+from collections import namedtuple
+
+import numpy as np
+
+from deapi import masks as _masks
+from deapi.processing.frames import Stage
+from deapi.processing.virtual_detectors import VirtualDetectors
+
+CenterOfMassResult = namedtuple(
+    "CenterOfMassResult",
+    ["intensity", "com_y", "com_x", "segments", "dpc_y", "dpc_x"],
+)
+CenterOfMassResult.__doc__ = """\
+The center of mass and differential phase contrast images of a scan.
+
+Parameters
+----------
+intensity : np.ndarray
+    The integrated intensity at each scan position.
+com_y, com_x : np.ndarray
+    The center of mass (in pixels) relative to the center of the detector.
+segments : np.ndarray or None
+    The (segments, rows, columns) intensity of each detector segment.
+dpc_y, dpc_x : np.ndarray or None
+    The segmented DPC signal: the sum of the segment intensities projected onto the
+    direction of each segment, divided by the intensity of all the segments.
+"""
+
+
+class CenterOfMass(Stage):
+    """
+    Compute the center of mass and segmented DPC signals of streamed frames.
+
+    The intensity, the first moments of the frames and the intensity of each
+    segment are virtual images for precomputed weights (1, the y and the x
+    coordinate of each pixel, and the segment masks), so each batch of frames costs
+    a single matrix multiplication and only the (scan size) images are kept.
+
+    Parameters
+    ----------
+    shape : tuple of int or deapi.Client
+        The (height, width) of the frames, or a client to use its image size.
+    scan_shape : tuple of int or int
+        The (rows, columns) of the scan.
+    center : tuple of float, optional
+        The (row, column) which the center of mass is measured from, by default the
+        center of the detector.
+    mask : np.ndarray, optional
+        An int8 virtual mask (see :mod:`deapi.masks`) limiting the pixels used for
+        the center of mass, e.g. a disk around the bright field disk.
+    segments : int, optional
+        The number of segments of a segmented DPC detector, by default 0 (none).
+    inner_radius, outer_radius : float, optional
+        The radii of the segmented detector, by default the whole detector.
+    rotation : float, optional
+        The angle where the first segment starts (see :func:`deapi.masks.segments`).
+    **kwargs
+        Passed to :class:`VirtualDetectors`, e.g. ``threads``.
+
+    Examples
+    --------
+    >>> com = CenterOfMass(client, (256, 256), mask=masks.disk(client, 100), segments=4)
+    >>> result = run_pipeline(movie_buffer_frames(client), [com])[0]
+    >>> plt.imshow(result.com_x)
+    """
+
+    def __init__(
+        self,
+        shape,
+        scan_shape,
+        center=None,
+        mask=None,
+        segments=0,
+        inner_radius=0,
+        outer_radius=np.inf,
+        rotation=0,
+        **kwargs,
+    ):
+        shape = _masks.detector_shape(shape)
+        self.center = _masks._center(shape, center)
+        self.segments = int(segments)
+        support = np.ones(shape, dtype=np.float32)
+        if mask is not None:
+            support = _masks.weights(mask)
+        y = (np.arange(shape[0], dtype=np.float32) - self.center[0])[:, np.newaxis]
+        x = np.arange(shape[1], dtype=np.float32) - self.center[1]
+        weights = [support, support * y, support * x]
+        if self.segments:
+            segment_masks = _masks.segments(
+                shape,
+                self.segments,
+                inner_radius=inner_radius,
+                outer_radius=outer_radius,
+                rotation=rotation,
+                center=center,
+            )
+            weights += [_masks.weights(m) for m in segment_masks]
+            # the direction of the middle of each segment
+            step = 2 * np.pi / self.segments
+            angles = rotation + (np.arange(self.segments) + 0.5) * step
+            self._directions = np.stack([np.sin(angles), np.cos(angles)])
+        self.detectors = VirtualDetectors(np.stack(weights), scan_shape, **kwargs)
+
+    @property
+    def scan_shape(self):
+        return self.detectors.scan_shape
+
+    def reset(self):
+        """Clear the images (e.g. before the next scan)."""
+        self.detectors.reset()
+
+    def process(self, batch):
+        return self.detectors.process(batch)
+
+    def result(self):
+        """The :class:`CenterOfMassResult` for the frames processed so far."""
+        images = self.detectors.result()
+        intensity, moment_y, moment_x = images[:3]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            com_y = np.where(intensity != 0, moment_y / intensity, 0)
+            com_x = np.where(intensity != 0, moment_x / intensity, 0)
+        segments = dpc_y = dpc_x = None
+        if self.segments:
+            segments = images[3:]
+            total = segments.sum(axis=0)
+            dpc_y, dpc_x = np.tensordot(self._directions, segments, axes=1)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                dpc_y = np.where(total != 0, dpc_y / total, 0)
+                dpc_x = np.where(total != 0, dpc_x / total, 0)
+        return CenterOfMassResult(intensity, com_y, com_x, segments, dpc_y, dpc_x)
@@ -0,0 +1,314 @@
+"""Contrast stretching and histograms of frames on the client.
+
+Live viewers can request raw frames (without a server side histogram or stretch)
+and render them locally with the :class:`deapi.ContrastStretchType` modes. The
+stretch limits are computed from a regular subsample of the frame, so the cost of
+each frame is bounded, and integer frames are mapped to 8 bit display values with
+a lookup table.
+
+.. code-block::
+
+    stretch = ContrastStretch(ContrastStretchType.DIFFRACTION, time_budget=0.002)
+    image = client.get_result("singleframe_integrated")[0]
+    display, limits = stretch(image)
+"""
+
+from collections import namedtuple
+import time
+
+import numpy as np
+
+from deapi.data_types import ContrastStretchType, Histogram
+
+StretchLimits = namedtuple("StretchLimits", ["min", "max", "gamma"])
+StretchLimits.__doc__ = """\
+The values mapped to black and white and the gamma of a contrast stretch, like the
+``autoStretchMin``, ``autoStretchMax`` and ``autoStretchGamma`` attributes returned
+by the server.
+"""
+
+# type -> (low percentile, high percentile, gamma, logarithmic). The LINEAR limits
+# are set by the outlier percentage instead.
+STRETCH_MODES = {
+    ContrastStretchType.LINEAR: (None, None, 1.0, False),
+    ContrastStretchType.DIFFRACTION: (0.5, 100.0, 1.0, True),
+    ContrastStretchType.THONRINGS: (50.0, 99.5, 0.5, False),
+    ContrastStretchType.NATURAL: (0.1, 99.9, 1 / 2.2, False),
+    ContrastStretchType.HIGHCONTRAST: (5.0, 95.0, 1.0, False),
+    ContrastStretchType.WIDERANGE: (0.01, 99.99, 1.0, False),
+}
+
+DEFAULT_SAMPLES = 2**16
+
+
+def subsample(image, max_samples=DEFAULT_SAMPLES):
+    """
+    A regular grid of at most ``max_samples`` pixels of an image.
+
+    The rows and columns are sampled with about the same step, so every part of the
+    image is represented (a stride through the flattened image would only sample a
+    few columns).
+
+    Parameters
+    ----------
+    image : np.ndarray
+        The image.
+    max_samples : int, optional
+        The largest number of pixels to return, by default 65536. None returns
+        every pixel.
+
+    Returns
+    -------
+    np.ndarray
+        The sampled pixels, a view of the image if possible.
+    """
+    image = np.asarray(image)
+    if max_samples is None or image.size <= max_samples:
+        return image
+    max_samples = max(int(max_samples), 1)
+    if image.ndim < 2:
+        return image[:: -(-image.size // max_samples)]
+    grid = image.reshape((-1, image.shape[-1]))
+    height, width = grid.shape
+    step_x = int(min(max(round(np.sqrt(grid.size / max_samples)), 1), width))
+    step_x = max(step_x, -(-width // max_samples))
+    columns = -(-width // step_x)
+    step_y = -(-height // (max_samples // columns))
+    return grid[::step_y, ::step_x]
+
+
+def histogram(image, bins=256, value_range=None, max_samples=None):
+    """
+    The histogram of an image, like the one returned by the server.
+
+    Parameters
+    ----------
+    image : np.ndarray
+        The image.
+    bins : int, optional
+        The number of bins, by default 256.
+    value_range : tuple of float, optional
+        The (min, max) of the histogram, by default the range of the (sampled)
+        image.
+    max_samples : int, optional
+        Only use a regular subsample of this many pixels, by default all of them.
+
+    Returns
+    -------
+    Histogram
+        The histogram with its ``min``, ``max``, ``bins``, the count in each bin
+        (``data``) and the bin of the uppermost local maximum.
+    """
+    sample = subsample(image, max_samples)
+    if value_range is None:
+        value_range = (
+            (float(sample.min()), float(sample.max())) if sample.size else (0, 0)
+        )
+    low, high = value_range
+    if high <= low:
+        high = low + 1
+    index = np.subtract(sample, low, dtype=np.float32)
+    index *= bins / (high - low)
+    index = np.clip(index, 0, bins - 1, out=index).astype(np.intp).ravel()
+    counts = np.bincount(index, minlength=bins)
+    # the last bin which is higher than its neighbours
+    padded = np.concatenate([[-1], counts, [-1]])
+    maxima = np.flatnonzero(
+        (counts > 0) & (counts >= padded[:-2]) & (counts > padded[2:])
+    )
+    return Histogram(
+        min=low,
+        max=high,
+        upper_most_local_maxima=int(maxima[-1]) if len(maxima) else 0,
+        bins=bins,
+        data=counts.tolist(),
+    )
+
+
+def stretch_limits(
+    image,
+    stretch_type=ContrastStretchType.LINEAR,
+    outlier_percentage=2.0,
+    manual=(0.0, 0.0, 1.0),
+    max_samples=DEFAULT_SAMPLES,
+):
+    """
+    The limits of a contrast stretch for an image.
+
+    Parameters
+    ----------
+    image : np.ndarray
+        The image.
+    stretch_type : ContrastStretchType, optional
+        The type of stretch, by default LINEAR.
+    outlier_percentage : float, optional
+        The percentage of pixels (half at each end) which are saturated by the
+        LINEAR stretch, by default 2.
+    manual : tuple of float, optional
+        The (min, max, gamma) of the MANUAL stretch.
+    max_samples : int, optional
+        The number of pixels used to find the percentiles, by default 65536.
+
+    Returns
+    -------
+    StretchLimits
+        The min, max and gamma of the stretch.
+    """
+    stretch_type = ContrastStretchType(stretch_type)
+    if stretch_type == ContrastStretchType.MANUAL:
+        return StretchLimits(*(float(m) for m in manual))
+    if stretch_type == ContrastStretchType.NONE:
+        if np.issubdtype(image.dtype, np.integer):
+            info = np.iinfo(image.dtype)
+            return StretchLimits(float(info.min), float(info.max), 1.0)
+        sample = subsample(image, max_samples)
+        return StretchLimits(float(sample.min()), float(sample.max()), 1.0)
+    low, high, gamma, _ = STRETCH_MODES[stretch_type]
+    if stretch_type == ContrastStretchType.LINEAR:
+        low, high = outlier_percentage / 2, 100 - outlier_percentage / 2
+    sample = subsample(image, max_samples)
+    minimum, maximum = np.percentile(sample, [low, high])
+    return StretchLimits(float(minimum), float(maximum), gamma)
+
+
+def _transform(values, limits, logarithmic):
+    # map values to 0 - 1 for some limits
+    span = max(limits.max - limits.min, np.finfo(np.float32).tiny)
+    scaled = np.subtract(values, limits.min, dtype=np.float32)
+    np.clip(scaled, 0, span, out=scaled)
+    if logarithmic:
+        np.log1p(scaled, out=scaled)
+        scaled /= np.log1p(np.float32(span))
+    else:
+        scaled /= np.float32(span)
+    if limits.gamma != 1:
+        np.power(scaled, np.float32(limits.gamma), out=scaled)
+    return scaled
+
+
+def apply_stretch(image, limits, stretch_type=ContrastStretchType.LINEAR, out=None):
+    """
+    Map an image to 8 bit display values.
+
+    Parameters
+    ----------
+    image : np.ndarray
+        The image.
+    limits : StretchLimits
+        The limits of the stretch, see :func:`stretch_limits`.
+    stretch_type : ContrastStretchType, optional
+        The type of stretch (only DIFFRACTION is logarithmic), by default LINEAR.
+    out : np.ndarray, optional
+        A uint8 array to write the display image to.
+
+    Returns
+    -------
+    np.ndarray
+        The uint8 display image.
+    """
+    logarithmic = ContrastStretchType(stretch_type) == ContrastStretchType.DIFFRACTION
+    if out is None:
+        out = np.empty(np.shape(image), dtype=np.uint8)
+    integer = np.issubdtype(image.dtype, np.integer) and image.dtype.itemsize <= 2
+    codes = 2 ** (8 * image.dtype.itemsize)
+    if integer and image.size >= codes // 4:
+        # transforming every possible value once is cheaper than every pixel
+        unsigned = np.dtype(f"u{image.dtype.itemsize}")
+        codes = np.arange(codes, dtype=unsigned)
+        lut = _transform(codes.view(image.dtype), limits, logarithmic)
+        lut = np.rint(lut * 255).astype(np.uint8)
+        np.take(lut, image.view(unsigned), out=out)
+    else:
+        scaled = _transform(image, limits, logarithmic)
+        scaled *= 255
+        np.rint(scaled, out=scaled)
+        out[...] = scaled
+    return out
+
+
+class ContrastStretch:
+    """
+    Render frames with a contrast stretch within a time budget.
+
+    The number of pixels sampled to find the stretch limits is adapted after each
+    frame so that finding the limits takes about ``time_budget`` seconds.
+
+    Parameters
+    ----------
+    stretch_type : ContrastStretchType, optional
+        The type of stretch, by default LINEAR.
+    outlier_percentage : float, optional
+        The percentage of saturated pixels of the LINEAR stretch, by default 2.
+    manual : tuple of float, optional
+        The (min, max, gamma) of the MANUAL stretch.
+    time_budget : float, optional
+        The time (in seconds) to spend finding the limits of each frame, by default
+        0.001. None always uses ``max_samples`` pixels.
+    max_samples : int, optional
+        The initial (and, without a time budget, fixed) number of sampled pixels,
+        by default 65536.
+    min_samples : int, optional
+        The fewest pixels to sample, by default 4096.
+    """
+
+    def __init__(
+        self,
+        stretch_type=ContrastStretchType.LINEAR,
+        outlier_percentage=2.0,
+        manual=(0.0, 0.0, 1.0),
+        time_budget=0.001,
+        max_samples=DEFAULT_SAMPLES,
+        min_samples=4096,
+    ):
+        self.stretch_type = ContrastStretchType(stretch_type)
+        self.outlier_percentage = outlier_percentage
+        self.manual = manual
+        self.time_budget = time_budget
+        self.max_samples = max_samples
+        self.min_samples = min_samples
+        self.limits = None
+        self._out = None
+
+    @classmethod
+    def from_attributes(cls, attributes, **kwargs):
+        """A stretch using the settings of :class:`deapi.Attributes`."""
+        return cls(
+            attributes.stretchType,
+            outlier_percentage=attributes.outlierPercentage,
+            manual=(
+                attributes.manualStretchMin,
+                attributes.manualStretchMax,
+                attributes.manualStretchGamma,
+            ),
+            **kwargs,
+        )
+
+    def __call__(self, image):
+        """
+        Render an image.
+
+        Returns
+        -------
+        display : np.ndarray
+            The uint8 display image. The array is reused for the next image of the
+            same shape.
+        limits : StretchLimits
+            The limits used.
+        """
+        start = time.perf_counter()
+        self.limits = stretch_limits(
+            image,
+            self.stretch_type,
+            self.outlier_percentage,
+            self.manual,
+            self.max_samples,
+        )
+        elapsed = time.perf_counter() - start
+        if self.time_budget is not None and elapsed > 0:
+            # move towards the number of samples that fits the budget
+            scale = min(max(self.time_budget / elapsed, 0.5), 2.0)
+            self.max_samples = max(int(self.max_samples * scale), self.min_samples)
+        if self._out is None or self._out.shape != np.shape(image):
+            self._out = np.empty(np.shape(image), dtype=np.uint8)
+        display = apply_stretch(image, self.limits, self.stretch_type, out=self._out)
+        return display, self.limits
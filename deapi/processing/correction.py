@@ -0,0 +1,222 @@
+import weakref
+
+import numpy as np
+
+from deapi.data_types import FrameType
+from deapi.processing.frames import FrameBatch, Stage, parallel
+
+# client -> {(frame type, camera, shape): reference}
+_reference_cache = weakref.WeakKeyDictionary()
+
+
+def get_reference(client, frame_type, refresh=False):
+    """
+    Get a reference image (e.g. ``"reference_darklevel0"``) from the server.
+
+    References are cached for each client, camera and image size, so they are only
+    downloaded once.
+
+    Parameters
+    ----------
+    client : deapi.Client
+        The connected client.
+    frame_type : str or FrameType
+        The reference to get, one of the ``REFERENCE_*`` frame types.
+    refresh : bool, optional
+        Download the reference again, e.g. after taking new references.
+
+    Returns
+    -------
+    np.ndarray
+        The float32 (height, width) reference.
+    """
+    if isinstance(frame_type, str):
+        frame_type = getattr(FrameType, frame_type.upper())
+    client.update_image_size()
+    key = (frame_type, client.currCamera, client.image_sizey, client.image_sizex)
+    cache = _reference_cache.setdefault(client, {})
+    if refresh or key not in cache:
+        image = client.get_result(frame_type, "FLOAT32")[0]
+        image.flags.writeable = False
+        cache[key] = image
+    return cache[key]
+
+
+class ReferenceCorrection(Stage):
+    """
+    Apply dark, gain and bad pixel references to raw frames.
+
+    Each frame is corrected as ``(raw - dark) * gain`` and every bad pixel is
+    replaced by the mean of its good neighbours. The correction is done with ufuncs
+    writing into the output (the frames themselves if they are writable float
+    frames, otherwise a buffer which is reused for every batch), and large batches
+    are split between threads.
+
+    The corrected frames are passed to the next stage of a pipeline, so e.g. virtual
+    images can be computed from raw frames. They are only valid until the next
+    batch is processed.
+
+    Parameters
+    ----------
+    dark : np.ndarray, optional
+        The dark level of each pixel.
+    gain : np.ndarray, optional
+        The gain correction of each pixel.
+    bad_pixels : np.ndarray, optional
+        A map which is non-zero for bad pixels.
+    threads : int, optional
+        The number of threads, by default 1. Use -1 for the number of CPUs.
+    dtype : np.dtype, optional
+        The type of the corrected frames, by default float32.
+
+    Examples
+    --------
+    >>> correction = ReferenceCorrection.from_client(client)
+    >>> frames = result_frames(client, 100, "singleframe_rawlevel0")
+    >>> images = run_pipeline(frames, [correction, detectors])[1]
+    """
+
+    def __init__(self, dark=None, gain=None, bad_pixels=None, threads=None, dtype=None):
+        self.dtype = np.dtype(np.float32 if dtype is None else dtype)
+        shapes = {np.shape(r) for r in (dark, gain, bad_pixels) if r is not None}
+        if len(shapes) > 1:
+            raise ValueError(f"The references have different shapes: {shapes}")
+        self.shape = shapes.pop() if shapes else None
+        self.dark = None if dark is None else np.asarray(dark, dtype=self.dtype)
+        self.gain = None if gain is None else np.asarray(gain, dtype=self.dtype)
+        self.threads = threads
+        self._buffer = None
+        self._bad_buffers = None
+        self.bad_pixels = np.zeros(0, dtype=np.intp)
+        if bad_pixels is not None:
+            self.bad_pixels = np.flatnonzero(bad_pixels)
+            self._neighbours, self._neighbour_weights = self._bad_pixel_neighbours(
+                np.asarray(bad_pixels) != 0
+            )
+
+    @classmethod
+    def from_client(
+        cls,
+        client,
+        dark="reference_darklevel0",
+        gain="reference_gainintegratinglevel0",
+        bad_pixels="reference_badpixelmap",
+        refresh=False,
+        **kwargs,
+    ):
+        """
+        The correction using the references of the current camera.
+
+        Parameters
+        ----------
+        client : deapi.Client
+            The connected client.
+        dark, gain, bad_pixels : str or FrameType, optional
+            The reference to use for each correction, or None to skip it. By default
+            the references for the integrating level 0 frames.
+        refresh : bool, optional
+            Download the references again instead of using the cached references.
+        **kwargs
+            Passed to :class:`ReferenceCorrection`.
+        """
+        references = {}
+        for name, frame_type in [("dark", dark), ("gain", gain), ("bad", bad_pixels)]:
+            if frame_type is not None:
+                references[name] = get_reference(client, frame_type, refresh=refresh)
+        return cls(
+            references.get("dark"),
+            references.get("gain"),
+            references.get("bad"),
+            **kwargs,
+        )
+
+    @staticmethod
+    def _bad_pixel_neighbours(bad):
+        # the flat index of the 4 neighbours of each bad pixel and their weights
+        rows, cols = np.nonzero(bad)
+        indices = []
+        valid = []
+        for dy, dx in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+            y = np.clip(rows + dy, 0, bad.shape[0] - 1)
+            x = np.clip(cols + dx, 0, bad.shape[1] - 1)
+            inside = (y == rows + dy) & (x == cols + dx)
+            valid.append(inside & ~bad[y, x])
+            indices.append(y * bad.shape[1] + x)
+        valid = np.stack(valid, axis=1)
+        counts = valid.sum(axis=1, keepdims=True)
+        weights = np.where(valid, 1 / np.maximum(counts, 1), 0)
+        return np.stack(indices, axis=1), weights.astype(np.float32)
+
+    def _output(self, frames):
+        if frames.dtype == self.dtype and frames.flags.writeable:
+            return frames
+        if (
+            self._buffer is None
+            or len(self._buffer) < len(frames)
+            or self._buffer.shape[1:] != frames.shape[1:]
+        ):
+            self._buffer = np.empty(frames.shape, dtype=self.dtype)
+        return self._buffer[: len(frames)]
+
+    def _bad_pixel_buffers(self, frames, dtype):
+        # the neighbours and the replacement value of each bad pixel in each frame
+        shape = (len(frames), len(self.bad_pixels))
+        buffers = self._bad_buffers
+        if buffers is None or len(buffers[1]) < shape[0] or buffers[1].dtype != dtype:
+            buffers = (
+                np.empty(shape + self._neighbours.shape[1:], dtype=dtype),
+                np.empty(shape, dtype=dtype),
+            )
+            self._bad_buffers = buffers
+        return buffers[0][: shape[0]], buffers[1][: shape[0]]
+
+    def apply(self, frames, out=None):
+        """
+        Correct frames.
+
+        Parameters
+        ----------
+        frames : np.ndarray
+            The (n, height, width) raw frames.
+        out : np.ndarray, optional
+            Where to write the corrected frames. By default the frames are corrected
+            in place if possible.
+
+        Returns
+        -------
+        np.ndarray
+            The corrected frames.
+        """
+        if self.shape is not None and frames.shape[1:] != self.shape:
+            raise ValueError(
+                f"The frames {frames.shape[1:]} and the references {self.shape} have "
+                "different shapes"
+            )
+        if out is None:
+            out = self._output(frames)
+        # the chunks are new views, so whether to copy is decided for the whole batch
+        in_place = out is frames or np.shares_memory(out, frames)
+        if len(self.bad_pixels):
+            neighbours, values = self._bad_pixel_buffers(frames, out.dtype)
+
+        def correct(start, stop):
+            raw, corrected = frames[start:stop], out[start:stop]
+            if self.dark is not None:
+                np.subtract(raw, self.dark, out=corrected, dtype=self.dtype)
+            elif not in_place:
+                np.copyto(corrected, raw, casting="unsafe")
+            if self.gain is not None:
+                np.multiply(corrected, self.gain, out=corrected)
+            if len(self.bad_pixels):
+                flat = corrected.reshape(len(corrected), -1)
+                chunk = neighbours[start:stop]
+                np.take(flat, self._neighbours, axis=1, out=chunk)
+                np.multiply(chunk, self._neighbour_weights, out=chunk)
+                np.sum(chunk, axis=-1, out=values[start:stop])
+                flat[:, self.bad_pixels] = values[start:stop]
+
+        parallel(correct, len(frames), self.threads)
+        return out
+
+    def process(self, batch):
+        return FrameBatch(self.apply(batch.frames), batch.positions)
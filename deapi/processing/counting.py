@@ -0,0 +1,181 @@
+import numpy as np
+from scipy import ndimage
+
+from deapi.processing.frames import Stage, parallel
+
+EVENT_DTYPE = np.dtype(
+    [
+        ("frame", np.uint32),
+        ("y", np.float32),
+        ("x", np.float32),
+        ("intensity", np.float32),
+    ]
+)
+
+# the offsets of the 8 neighbours of a pixel
+_NEIGHBOURS = [(dy, dx) for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dy or dx]
+
+
+def _local_maxima(frames, threshold):
+    # candidates are the (few) pixels above the threshold, so only their
+    # neighbourhoods are read
+    f, y, x = np.nonzero(frames > threshold)
+    values = frames[f, y, x].astype(np.float32)
+    height, width = frames.shape[1:]
+    is_max = np.ones(len(f), dtype=bool)
+    sums = values.copy()
+    moment_y = np.zeros(len(f), dtype=np.float32)
+    moment_x = np.zeros(len(f), dtype=np.float32)
+    for dy, dx in _NEIGHBOURS:
+        ny, nx = y + dy, x + dx
+        inside = (ny >= 0) & (ny < height) & (nx >= 0) & (nx < width)
+        neighbour = np.zeros(len(f), dtype=np.float32)
+        neighbour[inside] = frames[f[inside], ny[inside], nx[inside]]
+        # a plateau is counted once, at its first pixel in raster order
+        if (dy, dx) < (0, 0):
+            is_max &= values > neighbour
+        else:
+            is_max &= values >= neighbour
+        np.maximum(neighbour, 0, out=neighbour)
+        sums += neighbour
+        moment_y += dy * neighbour
+        moment_x += dx * neighbour
+    events = np.empty(np.count_nonzero(is_max), dtype=EVENT_DTYPE)
+    sums = sums[is_max]
+    events["frame"] = f[is_max]
+    events["y"] = y[is_max] + moment_y[is_max] / sums
+    events["x"] = x[is_max] + moment_x[is_max] / sums
+    events["intensity"] = sums
+    return events
+
+
+def _connected_components(frames, threshold):
+    # label 8-connected pixels above the threshold within each frame
+    structure = np.zeros((3, 3, 3), dtype=bool)
+    structure[1] = True
+    labels, count = ndimage.label(frames > threshold, structure=structure)
+    f, y, x = np.nonzero(labels)
+    index = labels[f, y, x] - 1
+    values = frames[f, y, x].astype(np.float64)
+    sums = np.bincount(index, weights=values, minlength=count)
+    events = np.empty(count, dtype=EVENT_DTYPE)
+    events["frame"][index] = f
+    events["y"] = np.bincount(index, weights=values * y, minlength=count) / sums
+    events["x"] = np.bincount(index, weights=values * x, minlength=count) / sums
+    events["intensity"] = sums
+    return events
+
+
+class ElectronCounting(Stage):
+    """
+    Reduce frames to a list of electron events.
+
+    Pixels above a threshold are grouped into events and each event is centroided
+    (weighted by the pixel values). Events are found either as local maxima, using
+    the 3x3 neighbourhood of the maximum for the centroid and the intensity, or as
+    8-connected components above the threshold. Only the pixels above the threshold
+    are visited, so the cost mostly depends on the dose. Batches are split between
+    threads by frame.
+
+    The events are stored as a structured array with the ``frame`` (the number of the
+    frame in the order they were processed), the ``y`` and ``x`` centroid (in
+    pixels) and the ``intensity`` of each event. The scan position of each frame is
+    kept in :attr:`positions`.
+
+    Parameters
+    ----------
+    threshold : float
+        Pixels above this value (e.g. after dark subtraction with
+        :class:`ReferenceCorrection`) are part of an event.
+    method : {"local_max", "connected"}, optional
+        How pixels are grouped into events, by default "local_max".
+    threads : int, optional
+        The number of threads, by default 1. Use -1 for the number of CPUs.
+
+    Examples
+    --------
+    >>> counting = ElectronCounting(threshold=50)
+    >>> events = run_pipeline(movie_buffer_frames(client), [counting])[0]
+    >>> counting.compression_ratio
+    """
+
+    METHODS = {"local_max": _local_maxima, "connected": _connected_components}
+
+    def __init__(self, threshold, method="local_max", threads=None):
+        if method not in self.METHODS:
+            raise ValueError(
+                f"Method {method} not recognized, use 'local_max' or 'connected'"
+            )
+        self.threshold = threshold
+        self.method = method
+        self.threads = threads
+        self.reset()
+
+    def reset(self):
+        """Clear the events (e.g. before the next acquisition)."""
+        self.frame_count = 0
+        self.frame_shape = None
+        self.dense_bytes = 0
+        self._events = []
+        self._positions = []
+
+    def count(self, frames):
+        """
+        Find the events in some frames.
+
+        Parameters
+        ----------
+        frames : np.ndarray
+            The (n, height, width) frames.
+
+        Returns
+        -------
+        np.ndarray
+            The events, with the index of the frame in ``frames``.
+        """
+        find = self.METHODS[self.method]
+        chunks = {}
+
+        def count_chunk(start, stop):
+            events = find(frames[start:stop], self.threshold)
+            events["frame"] += start
+            chunks[start] = events
+
+        parallel(count_chunk, len(frames), self.threads)
+        if not chunks:
+            return np.empty(0, dtype=EVENT_DTYPE)
+        return np.concatenate([chunks[start] for start in sorted(chunks)])
+
+    def process(self, batch):
+        frames = batch.frames
+        events = self.count(frames)
+        events["frame"] += self.frame_count
+        self._events.append(events)
+        self._positions.append(np.asarray(batch.positions))
+        self.frame_count += len(frames)
+        self.frame_shape = frames.shape[1:]
+        self.dense_bytes += frames.nbytes
+        return batch
+
+    @property
+    def events(self):
+        """The events found so far."""
+        if len(self._events) != 1:
+            self._events = [np.concatenate([np.empty(0, EVENT_DTYPE)] + self._events)]
+        return self._events[0]
+
+    @property
+    def positions(self):
+        """The scan position of each frame."""
+        if len(self._positions) != 1:
+            self._positions = [np.concatenate([np.zeros(0, int)] + self._positions)]
+        return self._positions[0]
+
+    @property
+    def compression_ratio(self):
+        """The size of the frames divided by the size of the events."""
+        return self.dense_bytes / max(self.events.nbytes, 1)
+
+    def result(self):
+        """The structured array of events."""
+        return self.events
@@ -0,0 +1,286 @@
+import numpy as np
+
+from deapi.processing.frames import FrameBatch
+
+
+def _index_dtype(pixels):
+    return np.uint16 if pixels <= 2**16 else np.uint32
+
+
+def _count_dtype(maximum):
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if maximum <= np.iinfo(dtype).max:
+            return dtype
+    return np.uint64
+
+
+class ElectronEvents:
+    """
+    A compact (CSR-like) container for electron counted frames.
+
+    The events of frame ``i`` are the flat pixel ``indices[offsets[i]:offsets[i + 1]]``
+    (uint16 for detectors with up to 65536 pixels, otherwise uint32). If a pixel can
+    have more than one electron in a frame the number of electrons is kept in
+    ``counts``, otherwise ``counts`` is None and every event is one electron. For
+    typical low dose counted data this takes 20-100 times less memory than the dense
+    frames.
+
+    Parameters
+    ----------
+    offsets : array-like of int
+        The (frames + 1) offsets of the events of each frame.
+    indices : array-like of int
+        The flat pixel index of each event.
+    frame_shape : tuple of int
+        The (height, width) of the frames.
+    counts : array-like of int, optional
+        The number of electrons in each event, by default 1.
+    positions : array-like of int, optional
+        The scan position of each frame, by default the frame numbers.
+
+    Examples
+    --------
+    >>> events = ElectronEvents.from_dense(client.get_result("singleframe_counted")[0])
+    >>> events.nbytes
+    >>> pattern = events.sum()
+    """
+
+    def __init__(self, offsets, indices, frame_shape, counts=None, positions=None):
+        self.frame_shape = tuple(int(i) for i in frame_shape)
+        pixels = int(np.prod(self.frame_shape))
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=_index_dtype(pixels))
+        self.counts = None if counts is None else np.asarray(counts)
+        if positions is None:
+            positions = np.arange(len(self))
+        self.positions = np.asarray(positions)
+        if self.offsets[-1] != len(self.indices):
+            raise ValueError("The last offset must be the number of events")
+        if len(self.positions) != len(self):
+            raise ValueError("There must be one scan position for each frame")
+
+    @classmethod
+    def from_dense(cls, frames, positions=None):
+        """
+        The events of dense counted frames.
+
+        Parameters
+        ----------
+        frames : np.ndarray
+            The (n, height, width) or (height, width) counted frames.
+        positions : array-like of int, optional
+            The scan position of each frame.
+        """
+        frames = np.asarray(frames)
+        if frames.ndim == 2:
+            frames = frames[np.newaxis]
+        flat = frames.reshape(len(frames), -1)
+        rows, indices = np.nonzero(flat)
+        offsets = np.zeros(len(frames) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(frames)), out=offsets[1:])
+        counts = flat[rows, indices]
+        if len(counts) and (counts.min() < 0 or not np.all(counts == np.rint(counts))):
+            raise ValueError("Counted frames must be positive integers")
+        maximum = counts.max() if len(counts) else 0
+        counts = None if maximum <= 1 else counts.astype(_count_dtype(maximum))
+        return cls(offsets, indices, frames.shape[1:], counts, positions)
+
+    @classmethod
+    def from_counting(cls, counting):
+        """
+        The events found by an :class:`ElectronCounting` stage, at the nearest pixel
+        to each centroid.
+        """
+        events = counting.events
+        height, width = counting.frame_shape
+        y = np.clip(np.rint(events["y"]).astype(np.int64), 0, height - 1)
+        x = np.clip(np.rint(events["x"]).astype(np.int64), 0, width - 1)
+        # the events are sorted by frame
+        offsets = np.searchsorted(events["frame"], np.arange(counting.frame_count + 1))
+        return cls(
+            offsets, y * width + x, counting.frame_shape, positions=counting.positions
+        )
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, frame):
+        """The dense frame ``frame``."""
+        frame = range(len(self))[frame]
+        return self.to_dense(frame, frame + 1)[0]
+
+    @property
+    def event_count(self):
+        """The total number of electrons."""
+        if self.counts is None:
+            return len(self.indices)
+        return int(self.counts.sum(dtype=np.int64))
+
+    @property
+    def nbytes(self):
+        """The memory used by the events."""
+        nbytes = self.offsets.nbytes + self.indices.nbytes + self.positions.nbytes
+        return nbytes + (0 if self.counts is None else self.counts.nbytes)
+
+    def _frame_of_events(self, start=0, stop=None):
+        stop = len(self) if stop is None else stop
+        lengths = np.diff(self.offsets[start : stop + 1])
+        return np.repeat(np.arange(stop - start), lengths)
+
+    def _binned_indices(self, binning, start=None, stop=None):
+        # the flat index of each event in the binned frames
+        indices = self.indices[start:stop].astype(np.intp)
+        height, width = self.frame_shape
+        if binning == 1:
+            return indices, self.frame_shape
+        shape = (height // binning, width // binning)
+        y, x = np.divmod(indices, width)
+        y //= binning
+        x //= binning
+        # events in the pixels that don't fill a bin are dropped
+        inside = (y < shape[0]) & (x < shape[1])
+        return np.where(inside, y * shape[1] + x, -1), shape
+
+    def _weights(self, start=None, stop=None):
+        return None if self.counts is None else self.counts[start:stop]
+
+    def to_dense(self, start=0, stop=None, binning=1, dtype=np.uint16):
+        """
+        Dense frames.
+
+        Parameters
+        ----------
+        start, stop : int, optional
+            The range of frames, by default all of them.
+        binning : int, optional
+            Sum the events in ``binning x binning`` pixels, by default 1.
+        dtype : np.dtype, optional
+            The type of the frames, by default uint16.
+
+        Returns
+        -------
+        np.ndarray
+            The (frames, height, width) frames.
+        """
+        stop = len(self) if stop is None else stop
+        first, last = self.offsets[start], self.offsets[stop]
+        indices, shape = self._binned_indices(binning, first, last)
+        pixels = int(np.prod(shape))
+        linear = self._frame_of_events(start, stop) * pixels + indices
+        weights = self._weights(first, last)
+        valid = indices >= 0
+        counts = np.bincount(
+            linear[valid],
+            weights=None if weights is None else weights[valid],
+            minlength=(stop - start) * pixels,
+        )
+        return counts.astype(dtype).reshape((stop - start,) + shape)
+
+    def sum(self, binning=1):
+        """
+        The sum of all of the frames.
+
+        Parameters
+        ----------
+        binning : int, optional
+            Sum the events in ``binning x binning`` pixels, by default 1.
+
+        Returns
+        -------
+        np.ndarray
+            The (height, width) sum as int64.
+        """
+        indices, shape = self._binned_indices(binning)
+        valid = indices >= 0
+        weights = self._weights()
+        total = np.bincount(
+            indices[valid],
+            weights=None if weights is None else weights[valid],
+            minlength=int(np.prod(shape)),
+        )
+        return total.astype(np.int64).reshape(shape)
+
+    def virtual_images(self, weights, scan_shape=None):
+        """
+        Virtual images computed directly from the events.
+
+        Parameters
+        ----------
+        weights : array-like
+            The (detectors, height, width) weight of each pixel for each detector,
+            see :func:`deapi.masks.weights`.
+        scan_shape : tuple of int, optional
+            The (rows, columns) of the scan, by default one image of all the frames.
+
+        Returns
+        -------
+        np.ndarray
+            The (detectors, rows, columns) virtual images. The frames at the same
+            scan position are summed.
+        """
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.ndim == 2:
+            weights = weights[np.newaxis]
+        if weights.shape[1:] != self.frame_shape:
+            raise ValueError(
+                f"The weights {weights.shape[1:]} and the frames {self.frame_shape} "
+                "have different shapes"
+            )
+        if scan_shape is None:
+            scan_shape = (len(self),)
+        scan_shape = tuple(int(i) for i in np.atleast_1d(scan_shape))
+        frames = self._frame_of_events()
+        flat = weights.reshape(len(weights), -1)
+        images = np.zeros((len(weights), int(np.prod(scan_shape))))
+        for image, detector in zip(images, flat):
+            values = detector[self.indices]
+            if self.counts is not None:
+                values *= self.counts
+            per_frame = np.bincount(frames, weights=values, minlength=len(self))
+            # frames at the same scan position (e.g. repeated scans) are summed
+            np.add.at(image, self.positions, per_frame)
+        return images.reshape((len(weights),) + scan_shape)
+
+    def batches(self, batch_size=64):
+        """
+        Stream the dense frames through a processing pipeline.
+
+        Yields
+        ------
+        FrameBatch
+            ``batch_size`` dense frames and their scan positions.
+        """
+        for start in range(0, len(self), batch_size):
+            stop = min(start + batch_size, len(self))
+            yield FrameBatch(self.to_dense(start, stop), self.positions[start:stop])
+
+    def save(self, file):
+        """
+        Save the events to a ``.npz`` file.
+
+        Parameters
+        ----------
+        file : str or file-like
+            The file to write to.
+        """
+        arrays = {
+            "offsets": self.offsets,
+            "indices": self.indices,
+            "frame_shape": np.array(self.frame_shape),
+            "positions": self.positions,
+        }
+        if self.counts is not None:
+            arrays["counts"] = self.counts
+        np.savez(file, **arrays)
+
+    @classmethod
+    def load(cls, file):
+        """Load events saved with :meth:`save`."""
+        with np.load(file) as data:
+            return cls(
+                data["offsets"],
+                data["indices"],
+                data["frame_shape"],
+                counts=data["counts"] if "counts" in data else None,
+                positions=data["positions"],
+            )
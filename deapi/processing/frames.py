@@ -0,0 +1,240 @@
+"""Streams of frames and the stages which process them.
+
+Frames are processed in batches. A :class:`FrameBatch` holds a (n, height, width)
+stack of frames and the flat (C order) scan position of each frame. Frame sources
+(:func:`movie_buffer_frames`, :func:`result_frames` and :func:`array_frames`) yield
+batches, and each :class:`Stage` updates its result from every batch without
+keeping the frames, so whole scans can be processed with memory proportional to the
+scan size rather than the size of the dataset.
+
+.. code-block::
+
+    from deapi.processing import movie_buffer_frames, run_pipeline
+
+    client.start_acquisition(1, requestMovieBuffer=True)
+    images, com = run_pipeline(movie_buffer_frames(client), [detectors, com])
+"""
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+import numpy as np
+
+from deapi.data_types import DataType, MovieBufferStatus
+
+FrameBatch = namedtuple("FrameBatch", ["frames", "positions"])
+FrameBatch.__doc__ = """\
+A batch of frames.
+
+Parameters
+----------
+frames : np.ndarray
+    The (n, height, width) frames.
+positions : np.ndarray
+    The flat scan position of each frame.
+"""
+
+_DATA_TYPES = {
+    DataType.DE8u: np.uint8,
+    DataType.DE16u: np.uint16,
+    DataType.DE16s: np.int16,
+    DataType.DE32f: np.float32,
+}
+
+
+def parallel(func, n, threads=None, min_items=1):
+    """
+    Split ``range(n)`` into contiguous chunks and call ``func(start, stop)`` for
+    each chunk in a pool of threads.
+
+    The numpy operations used by the stages release the GIL, so the chunks are
+    processed at the same time.
+
+    Parameters
+    ----------
+    func : callable
+        Called as ``func(start, stop)`` for each chunk.
+    n : int
+        The number of items.
+    threads : int, optional
+        The number of threads, by default 1. Use -1 for the number of CPUs.
+    min_items : int, optional
+        The smallest number of items to give to a thread, by default 1.
+    """
+    if threads is None:
+        threads = 1
+    elif threads == -1:
+        threads = os.cpu_count() or 1
+    threads = max(1, min(threads, n // max(min_items, 1)))
+    if threads == 1:
+        func(0, n)
+        return
+    bounds = np.linspace(0, n, threads + 1).astype(int).tolist()
+    with ThreadPoolExecutor(threads) as pool:
+        futures = [pool.submit(func, a, b) for a, b in zip(bounds[:-1], bounds[1:])]
+        for future in futures:
+            future.result()
+
+
+class Stage:
+    """
+    A step of a frame processing pipeline.
+
+    Subclasses implement :meth:`process`, which is called with each
+    :class:`FrameBatch` and returns the batch passed to the next stage (so stages
+    can either accumulate a result or transform the frames), and :meth:`result`.
+
+    A stage can also be applied directly to a stream of batches:
+
+    >>> for batch in stage(movie_buffer_frames(client)):
+    ...     pass
+    >>> stage.result()
+    """
+
+    def process(self, batch):
+        """Update the stage from a batch and return the batch for the next stage."""
+        raise NotImplementedError
+
+    def result(self):
+        """The result of the stage for the frames processed so far."""
+        return None
+
+    def __call__(self, stream):
+        for batch in stream:
+            yield self.process(batch)
+
+
+def run_pipeline(stream, stages):
+    """
+    Pass every batch in a stream through the stages in turn.
+
+    Parameters
+    ----------
+    stream : iterable of FrameBatch
+        The frames, e.g. from :func:`movie_buffer_frames`.
+    stages : list of Stage
+        The stages, applied in order.
+
+    Returns
+    -------
+    list
+        The result of each stage.
+    """
+    for batch in stream:
+        for stage in stages:
+            batch = stage.process(batch)
+    return [stage.result() for stage in stages]
+
+
+def scan_size(client):
+    """The number of positions in the current scan of a client (1 if not scanning)."""
+    if client["Scan - Enable"] != "On":
+        return 1
+    return int(client["Scan - Size X"]) * int(client["Scan - Size Y"])
+
+
+def movie_buffer_frames(client, scan_positions=None, timeout_ms=5000):
+    """
+    Stream the frames of an acquisition from the movie buffer.
+
+    The acquisition must have been started with ``requestMovieBuffer=True``. The
+    frames are views of each received buffer, so nothing is copied.
+
+    Parameters
+    ----------
+    client : deapi.Client
+        The connected client.
+    scan_positions : array-like of int, optional
+        The flat scan position visited by each frame (e.g. the ``positions`` of a
+        :class:`deapi.simulated_server.scan_patterns.ScanPattern`). By default the
+        scan is assumed to be a raster scan of the current scan size.
+    timeout_ms : int, optional
+        The time to wait for each buffer, by default 5000 ms.
+
+    Yields
+    ------
+    FrameBatch
+        The frames in each movie buffer.
+    """
+    if scan_positions is None:
+        scan_positions = np.arange(scan_size(client))
+    scan_positions = np.asarray(scan_positions)
+    info = client.get_movie_buffer_info()
+    dtype = _DATA_TYPES[info.imageDataType]
+    while True:
+        status, total_bytes, num_frames, buffer = client.get_movie_buffer(
+            info.to_buffer(), info.total_bytes, info.framesInBuffer, timeout_ms
+        )
+        if status == MovieBufferStatus.FINISHED:
+            return
+        elif status == MovieBufferStatus.TIMEOUT:
+            continue
+        elif status != MovieBufferStatus.OK:
+            raise RuntimeError(f"Getting the movie buffer failed: {status}")
+        indices = np.frombuffer(
+            buffer, dtype=np.uint32, count=num_frames, offset=info.frameIndexStartPos
+        )
+        frames = np.frombuffer(
+            buffer,
+            dtype=dtype,
+            count=num_frames * info.imageW * info.imageH,
+            offset=info.imageStartPos,
+        ).reshape((num_frames, info.imageH, info.imageW))
+        yield FrameBatch(frames, scan_positions[indices % len(scan_positions)])
+
+
+def result_frames(
+    client, count, frame_type="singleframe_integrated", pixel_format="UINT16"
+):
+    """
+    Stream live frames with ``get_result``.
+
+    Each frame is placed at the scan position reported by the server, so frames may
+    be missed or repeated if they arrive faster or slower than they are requested.
+
+    Parameters
+    ----------
+    client : deapi.Client
+        The connected client.
+    count : int
+        The number of frames to get.
+    frame_type : str or FrameType, optional
+        The type of frame, by default "singleframe_integrated".
+    pixel_format : str or PixelFormat, optional
+        The pixel format, by default "UINT16".
+
+    Yields
+    ------
+    FrameBatch
+        A batch with a single frame.
+    """
+    for _ in range(count):
+        image, _, attributes, _ = client.get_result(frame_type, pixel_format)
+        yield FrameBatch(image[np.newaxis], np.array([attributes.imageIndex]))
+
+
+def array_frames(data, batch_size=64, start=0):
+    """
+    Stream the frames of an array, e.g. a (memory-mapped) dataset on disk.
+
+    Parameters
+    ----------
+    data : array-like
+        The (x, y, height, width) or (n, height, width) frames.
+    batch_size : int, optional
+        The number of frames in each batch, by default 64.
+    start : int, optional
+        The scan position of the first frame, by default 0.
+
+    Yields
+    ------
+    FrameBatch
+        The frames in batches of ``batch_size``.
+    """
+    shape = tuple(data.shape)
+    n = int(np.prod(shape[:-2]))
+    flat = data.reshape((n,) + shape[-2:]) if hasattr(data, "reshape") else data
+    for i in range(0, n, batch_size):
+        stop = min(i + batch_size, n)
+        yield FrameBatch(np.asarray(flat[i:stop]), np.arange(start + i, start + stop))
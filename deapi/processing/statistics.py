@@ -0,0 +1,205 @@
+from collections import namedtuple
+
+import numpy as np
+
+from deapi.processing.frames import Stage, parallel
+
+Statistics = namedtuple(
+    "Statistics",
+    [
+        "count",
+        "sum",
+        "mean",
+        "variance",
+        "minimum",
+        "maximum",
+        "histogram",
+        "bin_edges",
+        "frame_sums",
+    ],
+)
+Statistics.__doc__ = """\
+Per-pixel statistics of a stream of frames.
+
+Parameters
+----------
+count : int
+    The number of frames.
+sum : np.ndarray
+    The sum of the frames (int64 in the exact mode, otherwise float64).
+mean, variance : np.ndarray
+    The mean and (population) variance of each pixel.
+minimum, maximum : np.ndarray
+    The smallest and largest value of each pixel.
+histogram : np.ndarray or None
+    The (bins, height, width) histogram of each pixel, if requested.
+bin_edges : np.ndarray or None
+    The edges of the histogram bins.
+frame_sums : np.ndarray
+    The sum of each frame in the order they were processed, e.g. to check the dose
+    over time.
+"""
+
+
+class RunningStatistics(Stage):
+    """
+    Accumulate per-pixel statistics of streamed frames without keeping the frames.
+
+    The mean and variance are updated with Welford's algorithm, combining the
+    statistics of each batch with the running statistics, so they are stable even
+    for long acquisitions. In the ``"exact"`` mode the sum and the sum of squares
+    are kept as integers instead, so the sum is exact (like the SUMTOTAL frame of
+    the server) and the variance is computed from exact integers.
+
+    Parameters
+    ----------
+    shape : tuple of int
+        The (height, width) of the frames.
+    mode : {"float", "exact"}, optional
+        Accumulate in float64 (by default) or in exact integers (for integer frames).
+    bins : int, optional
+        The number of bins of the per-pixel histograms, by default no histograms.
+    value_range : tuple of float, optional
+        The (min, max) of the histograms, by default (0, 65536). Values outside of
+        the range are counted in the first and last bin.
+    threads : int, optional
+        The number of threads, each updating some of the pixels, by default 1.
+
+    Examples
+    --------
+    >>> stats = RunningStatistics((1024, 1024), bins=16, value_range=(0, 16))
+    >>> for batch in stats(movie_buffer_frames(client)):
+    ...     pass
+    >>> stats.result().variance
+    """
+
+    MODES = ("float", "exact")
+
+    def __init__(self, shape, mode="float", bins=None, value_range=None, threads=None):
+        if mode not in self.MODES:
+            raise ValueError(f"Mode {mode} not recognized, use 'float' or 'exact'")
+        self.shape = tuple(int(i) for i in shape)
+        self.mode = mode
+        self.bins = bins
+        self.value_range = (0, 65536) if value_range is None else value_range
+        self.threads = threads
+        self.reset()
+
+    def reset(self):
+        """Clear the statistics (e.g. before the next acquisition)."""
+        pixels = int(np.prod(self.shape))
+        self.count = 0
+        if self.mode == "exact":
+            self._sum = np.zeros(pixels, dtype=np.int64)
+            self._sum_squares = np.zeros(pixels, dtype=np.int64)
+        else:
+            self._mean = np.zeros(pixels, dtype=np.float64)
+            self._m2 = np.zeros(pixels, dtype=np.float64)
+        self._min = None
+        self._max = None
+        self._histogram = None
+        if self.bins:
+            self._histogram = np.zeros((pixels, self.bins), dtype=np.int64)
+        self._frame_sums = []
+
+    def _update(self, flat, start, stop):
+        # update the pixels start:stop from the (n, pixels) batch
+        chunk = flat[:, start:stop]
+        n = len(chunk)
+        if self.mode == "exact":
+            values = chunk.astype(np.int64)
+            self._sum[start:stop] += values.sum(axis=0)
+            np.square(values, out=values)
+            self._sum_squares[start:stop] += values.sum(axis=0)
+        else:
+            # combine the batch with the running statistics (Chan et al.)
+            mean = chunk.mean(axis=0, dtype=np.float64)
+            m2 = np.square(chunk - mean).sum(axis=0)
+            total = self.count + n
+            delta = mean - self._mean[start:stop]
+            self._mean[start:stop] += delta * (n / total)
+            self._m2[start:stop] += m2 + np.square(delta) * (self.count * n / total)
+        np.minimum(self._min[start:stop], chunk.min(axis=0), out=self._min[start:stop])
+        np.maximum(self._max[start:stop], chunk.max(axis=0), out=self._max[start:stop])
+        if self._histogram is not None:
+            low, high = self.value_range
+            scale = self.bins / (high - low)
+            index = np.subtract(chunk, low, dtype=np.float64) * scale
+            index = np.clip(index, 0, self.bins - 1).astype(np.intp)
+            # offset the bins of each pixel to count all of them with one bincount
+            index += np.arange(stop - start) * self.bins
+            counts = np.bincount(index.ravel(), minlength=(stop - start) * self.bins)
+            self._histogram[start:stop] += counts.reshape(stop - start, self.bins)
+
+    def process(self, batch):
+        frames = batch.frames
+        if frames.shape[1:] != self.shape:
+            raise ValueError(
+                f"The frames {frames.shape[1:]} and the statistics {self.shape} have "
+                "different shapes"
+            )
+        if self.mode == "exact" and not np.issubdtype(frames.dtype, np.integer):
+            raise ValueError("The exact mode needs integer frames")
+        if len(frames) == 0:
+            return batch
+        flat = frames.reshape(len(frames), -1)
+        if self._min is None:
+            self._min = flat[0].copy()
+            self._max = flat[0].copy()
+        parallel(
+            lambda start, stop: self._update(flat, start, stop),
+            flat.shape[1],
+            self.threads,
+            min_items=4096,
+        )
+        self.count += len(frames)
+        self._frame_sums.append(flat.sum(axis=1, dtype=np.float64))
+        return batch
+
+    @property
+    def sum(self):
+        if self.mode == "exact":
+            return self._sum.reshape(self.shape)
+        return (self._mean * self.count).reshape(self.shape)
+
+    @property
+    def mean(self):
+        if self.mode == "exact":
+            return (self._sum / max(self.count, 1)).reshape(self.shape)
+        return self._mean.reshape(self.shape)
+
+    @property
+    def variance(self):
+        if self.count == 0:
+            return np.zeros(self.shape)
+        if self.mode == "exact":
+            # n * sum(x^2) - sum(x)^2 is exact in integers (sum(x)^2 is smaller)
+            s, s2 = self._sum, self._sum_squares
+            if self.count * int(s2.max(initial=0)) >= 2**63:
+                s, s2 = s.astype(object), s2.astype(object)
+            m2 = self.count * s2 - s * s
+            variance = (m2 / self.count**2).astype(np.float64)
+        else:
+            variance = self._m2 / self.count
+        return variance.reshape(self.shape)
+
+    def result(self):
+        """The :class:`Statistics` of the frames processed so far."""
+        histogram = bin_edges = None
+        if self._histogram is not None:
+            histogram = np.moveaxis(self._histogram, 1, 0).reshape(
+                (self.bins,) + self.shape
+            )
+            bin_edges = np.linspace(*self.value_range, self.bins + 1)
+        empty = np.zeros(self.shape)
+        return Statistics(
+            count=self.count,
+            sum=self.sum,
+            mean=self.mean,
+            variance=self.variance,
+            minimum=empty if self._min is None else self._min.reshape(self.shape),
+            maximum=empty if self._max is None else self._max.reshape(self.shape),
+            histogram=histogram,
+            bin_edges=bin_edges,
+            frame_sums=np.concatenate([np.zeros(0)] + self._frame_sums),
+        )
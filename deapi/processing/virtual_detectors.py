@@ -0,0 +1,143 @@
+import numpy as np
+from scipy import sparse
+
+from deapi import masks as _masks
+from deapi.processing.frames import Stage, parallel
+
+
+class VirtualDetectors(Stage):
+    """
+    Compute any number of virtual images from streamed frames.
+
+    Every batch of frames is flattened and multiplied with the stacked (detectors,
+    pixels) weight matrix, so all of the virtual images are computed with one matrix
+    multiplication per batch. Only the pixels which are used by at least one
+    detector (the support of the masks) are read from the frames. The weight
+    matrix is either dense (using BLAS) or, for sparse detectors, a CSR matrix.
+
+    Parameters
+    ----------
+    weights : array-like
+        The (detectors, height, width) weight of each pixel for each detector. Use
+        :meth:`from_masks` to build the weights from virtual masks.
+    scan_shape : tuple of int or int
+        The (rows, columns) of the scan. The flat scan positions of the frames are
+        in C order.
+    mode : {"auto", "dense", "sparse"}, optional
+        How to store the weights, by default "auto" which uses a sparse matrix when
+        most support pixels are only used by a few of the detectors.
+    threads : int, optional
+        The number of threads used for each batch, by default 1. Use -1 for the
+        number of CPUs.
+    dtype : np.dtype, optional
+        The type of the computation and of the virtual images, by default float32.
+
+    Examples
+    --------
+    >>> vbf = masks.disk(client, 50)
+    >>> adf = masks.annulus(client, 80, 200)
+    >>> detectors = VirtualDetectors.from_masks([vbf, adf], (128, 128))
+    >>> bright_field, dark_field = run_pipeline(frames, [detectors])[0]
+    """
+
+    def __init__(self, weights, scan_shape, mode="auto", threads=None, dtype=None):
+        if mode not in ("auto", "dense", "sparse"):
+            raise ValueError(f"Mode {mode} not recognized, use auto, dense or sparse")
+        self.dtype = np.dtype(np.float32 if dtype is None else dtype)
+        weights = np.asarray(weights, dtype=self.dtype)
+        if weights.ndim == 2:
+            weights = weights[np.newaxis]
+        self.frame_shape = weights.shape[1:]
+        self.scan_shape = tuple(int(i) for i in np.atleast_1d(scan_shape))
+        self.threads = threads
+
+        flat = weights.reshape(weights.shape[0], -1)
+        support = np.flatnonzero(np.any(flat != 0, axis=0))
+        if support.size == flat.shape[1]:
+            support = None  # every pixel is used so read the frames as they are
+        else:
+            flat = flat[:, support]
+        if mode == "auto":
+            # each pixel of a dense matrix is used by every detector
+            used = np.count_nonzero(flat)
+            mode = "sparse" if 4 * used < flat.size else "dense"
+        self.mode = mode
+        self.support = support
+        if mode == "sparse":
+            self._weights = sparse.csr_matrix(flat)
+        else:
+            self._weights = np.ascontiguousarray(flat.T)
+        self.images = np.zeros(
+            (len(weights), int(np.prod(self.scan_shape))), self.dtype
+        )
+
+    @classmethod
+    def from_masks(cls, masks, scan_shape, calculations=None, **kwargs):
+        """
+        Virtual detectors from int8 virtual masks.
+
+        Parameters
+        ----------
+        masks : list of np.ndarray
+            The virtual masks (see :mod:`deapi.masks`).
+        scan_shape : tuple of int or int
+            The (rows, columns) of the scan.
+        calculations : list of str, optional
+            The calculation of each mask, "Sum" (by default) or "Difference".
+        **kwargs
+            Passed to :class:`VirtualDetectors`.
+        """
+        if calculations is None:
+            calculations = ["Sum"] * len(masks)
+        weights = [_masks.weights(m, c) for m, c in zip(masks, calculations)]
+        return cls(np.stack(weights), scan_shape, **kwargs)
+
+    def __len__(self):
+        return len(self.images)
+
+    def reset(self):
+        """Clear the virtual images (e.g. before the next scan)."""
+        self.images[:] = 0
+
+    def compute(self, frames):
+        """
+        The response of each detector to some frames.
+
+        Parameters
+        ----------
+        frames : np.ndarray
+            The (n, height, width) frames.
+
+        Returns
+        -------
+        np.ndarray
+            The (n, detectors) response of each frame.
+        """
+        if frames.shape[1:] != self.frame_shape:
+            raise ValueError(
+                f"The frames {frames.shape[1:]} and the detectors {self.frame_shape} "
+                "have different shapes"
+            )
+        flat = frames.reshape(len(frames), -1)
+        values = np.empty((len(frames), len(self)), dtype=self.dtype)
+
+        def compute_chunk(start, stop):
+            if self.support is None:
+                chunk = flat[start:stop].astype(self.dtype, copy=False)
+            else:
+                chunk = flat[start:stop, self.support].astype(self.dtype, copy=False)
+            if self.mode == "sparse":
+                values[start:stop] = (self._weights @ chunk.T).T
+            else:
+                np.matmul(chunk, self._weights, out=values[start:stop])
+
+        parallel(compute_chunk, len(frames), self.threads)
+        return values
+
+    def process(self, batch):
+        self.images[:, batch.positions] = self.compute(batch.frames).T
+        return batch
+
+    def result(self):
+        """The (detectors, rows, columns) virtual images."""
+        return self.images.reshape((len(self),) + self.scan_shape)
@@ -0,0 +1,132 @@
+"""Recording of the traffic between a :class:`deapi.client.Client` and DE Server.
+
+A session log is a compact binary file which starts with ``MAGIC`` and is followed by
+one record for every framed ``DEPacket`` or data payload sent or received by the
+client. Each record has a fixed size header (direction, kind, timestamp in seconds
+since the recording started and length in bytes) followed by the raw bytes.
+
+Session logs can be served back with
+:class:`deapi.simulated_server.replay_server.ReplayServer` to reproduce a session
+offline.
+"""
+
+import struct
+import time
+from collections import namedtuple
+
+MAGIC = b"DESESS01"
+
+# Directions, relative to the client
+SENT = 0
+RECEIVED = 1
+
+# Kinds of record
+PACKET = 0  # A DEPacket including the 4 byte size prefix
+PAYLOAD = 1  # Raw data following a packet (images, movie buffers, virtual masks)
+
+_RECORD_HEADER = struct.Struct("<BBdI")
+
+Record = namedtuple("Record", ["direction", "kind", "timestamp", "data"])
+
+
+class SessionRecorder:
+    """Write the traffic of a client session to a session log.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        The file to write the session log to. Existing files are overwritten.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "wb")
+        self._file.write(MAGIC)
+        self._start = time.perf_counter()
+        self.records = 0
+
+    def record(self, direction, kind, data):
+        """Add one packet or payload to the session log.
+
+        Parameters
+        ----------
+        direction : int
+            ``SENT`` or ``RECEIVED``
+        kind : int
+            ``PACKET`` or ``PAYLOAD``
+        data : bytes-like
+            The bytes sent or received.
+        """
+        data = memoryview(data).cast("B")
+        timestamp = time.perf_counter() - self._start
+        self._file.write(_RECORD_HEADER.pack(direction, kind, timestamp, len(data)))
+        self._file.write(data)
+        self.records += 1
+
+    def close(self):
+        """Flush and close the session log."""
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_session(path):
+    """Read all of the records in a session log.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        The session log to read.
+
+    Returns
+    -------
+    list of Record
+        The records in the order they were recorded.
+    """
+    with open(path, "rb") as f:
+        contents = f.read()
+    if contents[: len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a DE session log")
+    records = []
+    offset = len(MAGIC)
+    while offset < len(contents):
+        if offset + _RECORD_HEADER.size > len(contents):
+            raise ValueError(f"The session log {path} is truncated")
+        direction, kind, timestamp, length = _RECORD_HEADER.unpack_from(
+            contents, offset
+        )
+        offset += _RECORD_HEADER.size
+        if offset + length > len(contents):
+            raise ValueError(f"The session log {path} is truncated")
+        records.append(
+            Record(direction, kind, timestamp, contents[offset : offset + length])
+        )
+        offset += length
+    return records
+
+
+def split_exchanges(records):
+    """Group the records of a session into request/response exchanges.
+
+    Each exchange starts with the records sent by the client for one command and is
+    followed by all of the records received before the next command.
+
+    Returns
+    -------
+    list of tuple
+        The ``(sent, received)`` lists of records for each exchange.
+    """
+    exchanges = []
+    for record in records:
+        if record.direction == SENT:
+            if not exchanges or exchanges[-1][1]:
+                exchanges.append(([], []))
+            exchanges[-1][0].append(record)
+        elif exchanges:
+            exchanges[-1][1].append(record)
+    return exchanges
@@ -0,0 +1,82 @@
+"""Clocks used by the FakeServer to time simulated acquisitions.
+
+The :class:`deapi.simulated_server.fake_server.FakeServer` asks its clock for the
+current time instead of calling ``time.time()`` directly, so that acquisitions can
+run in real time, faster than real time or be stepped manually in tests.
+"""
+
+import time
+
+
+class RealClock:
+    """A clock which follows the system time."""
+
+    def time(self):
+        """The current time in seconds"""
+        return time.time()
+
+    def sleep(self, seconds):
+        """Block for some number of (simulated) seconds"""
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class ScaledClock(RealClock):
+    """A clock which runs ``scale`` times faster than the system time.
+
+    Parameters
+    ----------
+    scale : float, optional
+        How much faster than real time the clock runs, by default 1.0. A scale of
+        1000 runs a 1 minute acquisition in 60 ms.
+    """
+
+    def __init__(self, scale=1.0):
+        if scale <= 0:
+            raise ValueError(f"The clock scale must be positive, not {scale}")
+        self.scale = scale
+        self._real_start = time.time()
+
+    def time(self):
+        return self._real_start + (time.time() - self._real_start) * self.scale
+
+    def sleep(self, seconds):
+        super().sleep(seconds / self.scale)
+
+
+class ManualClock:
+    """A clock which only moves when it is stepped.
+
+    Sleeping on a manual clock advances it immediately, so simulated acquisitions
+    are fully deterministic.
+
+    Parameters
+    ----------
+    start : float, optional
+        The starting time in seconds, by default 0.0
+
+    Examples
+    --------
+    >>> clock = ManualClock()
+    >>> clock.step(1.5)
+    >>> clock.time()
+    1.5
+    """
+
+    def __init__(self, start=0.0):
+        self._time = float(start)
+
+    def time(self):
+        """The current time in seconds"""
+        return self._time
+
+    def step(self, seconds):
+        """Advance the clock by some number of seconds"""
+        if seconds < 0:
+            raise ValueError("A ManualClock can't go backwards in time")
+        self._time += seconds
+
+    def sleep(self, seconds):
+        """Advance the clock instead of blocking"""
+        if seconds > 0:
+            self.step(seconds)
@@ -1,5 +1,5 @@
 import logging
-import time
+import os
 import warnings
 
 from deapi.buffer_protocols import pb
@@ -9,11 +9,26 @@ import deapi
 import numpy as np
 from deapi.version import commandVersion
 from deapi.fake_data.grains import TiltGrains
-from skimage.transform import resize
+from deapi.fake_data.cache import DatasetCache
+from deapi.fake_data.file_data import FileData
+from deapi.fake_data.noise import NoiseModel
+from deapi.fake_data.references import DetectorReferences
+from deapi.fake_data.virtual_images import VirtualImageEngine
+from deapi.simulated_server.clock import RealClock
+from deapi.simulated_server.scan_patterns import ScanPattern, SCAN_TYPES
+from deapi.simulated_server.virtual_masks import VirtualMaskStore
 from sympy import parse_expr
 
 inp_file = resources.files(deapi) / "prop_dump.json"
 
+# Movie buffer status values (see deapi.data_types.MovieBufferStatus)
+MOVIE_BUFFER_FAILED = 1
+MOVIE_BUFFER_TIMEOUT = 3
+MOVIE_BUFFER_FINISHED = 4
+MOVIE_BUFFER_OK = 5
+MOVIE_BUFFER_DESCRIPTOR_BYTES = 16
+MOVIE_BUFFER_ALIGNMENT = 512
+
 
 def add_parameter(ack, value):
     """
@@ -140,16 +155,66 @@ class Property:
                 ans = epr.evalf(subs=replace_dict)
                 self.server[parameter] = ans
 
+        if self.server is not None:
+            self.server._property_changed(self.name)
+
 
 class FakeServer:
-    def __init__(self, dataset="grains", socket=None):
-        self.start_time = time.time()
-        self.end_time = time.time()
+    # Generated datasets are shared between all server instances (one per connection)
+    # so that repeated acquisitions with the same geometry start instantly. Each
+    # server serves its own view of the shared arrays (see ``_attach_data``).
+    dataset_cache = DatasetCache()
+
+    def __init__(
+        self,
+        dataset="grains",
+        socket=None,
+        seed=0,
+        clock=None,
+        dataset_options=None,
+        integrated_noise=False,
+    ):
+        """
+        Parameters
+        ----------
+        dataset : str or pathlib.Path, optional
+            Either "grains" for a synthetic dataset or the path to a 4D STEM dataset
+            on disk (see :class:`deapi.fake_data.file_data.FileData`).
+        socket : socket.socket, optional
+            The connection to the client.
+        seed : int, optional
+            The seed for synthetic datasets, by default 0.
+        clock : RealClock, optional
+            The clock used to time acquisitions, by default the system time.
+        dataset_options : dict, optional
+            Extra keyword arguments for on-disk datasets, e.g. the ``dtype`` and
+            ``shape`` of a raw binary file.
+        integrated_noise : bool, optional
+            Serve the integrated and raw frames with shot noise, a dark level and
+            read noise from the :class:`deapi.fake_data.noise.NoiseModel` instead of
+            the noiseless frames, by default False.
+        """
+        if clock is None:
+            clock = RealClock()
+        self.clock = clock
+        self.start_time = self.clock.time()
+        self.end_time = self.start_time
         self.has_movie_buffer = False
         self.movie_buffer_index = 0
+        self.total_frames = 0
         self.dataset = dataset
+        self.dataset_options = {} if dataset_options is None else dataset_options
+        self.seed = seed
         self.fake_data = None
+        self._shared_data = None
+        self.noise = NoiseModel(seed=seed)
+        self.integrated_noise = integrated_noise
+        self.references = DetectorReferences(seed=seed)
+        self.custom_scan_positions = None
+        self._scan_pattern = None
         self.socket = socket
+        self._property_callbacks = {}
+        self._progressive_images = {}
 
         with open(inp_file) as f:
             values = json.load(f)
@@ -192,17 +257,13 @@ class FakeServer:
             server=self,
         )
 
-        self.virtual_masks = []
-        for i in range(4):
-            self.virtual_masks.append(
-                np.zeros(
-                    shape=(
-                        int(self["Image Size X (pixels)"]),
-                        int(self["Image Size Y (pixels)"]),
-                    ),
-                    dtype=np.int8,
-                )
-            )
+        if self.dataset != "grains":
+            self._initialize_file_data()
+
+        # masks are (height, width) like the frames sent to the client
+        self.virtual_masks = VirtualMaskStore(
+            (int(self["Image Size Y (pixels)"]), int(self["Image Size X (pixels)"]))
+        )
 
     def __getitem__(self, item):
         if not isinstance(item, str):
@@ -214,9 +275,31 @@ class FakeServer:
         key = key.replace(" ", "_").lower().replace("(", "").replace(")", "")
         self._values[key].value = value
 
+    def add_property_callback(self, name, callback):
+        """
+        Register a function to be called as ``callback(name)`` whenever the property
+        ``name`` is set.
+        """
+        key = name.replace(" ", "_").lower().replace("(", "").replace(")", "")
+        self._property_callbacks.setdefault(key, []).append(callback)
+
+    def remove_property_callback(self, name, callback):
+        """
+        Remove a function previously registered with ``add_property_callback``.
+        """
+        key = name.replace(" ", "_").lower().replace("(", "").replace(")", "")
+        callbacks = self._property_callbacks.get(key, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+    def _property_changed(self, name):
+        key = name.replace(" ", "_").lower().replace("(", "").replace(")", "")
+        for callback in list(self._property_callbacks.get(key, [])):
+            callback(name)
+
     @property
     def acquisition_status(self):
-        if time.time() < self.end_time:
+        if self.clock.time() < self.end_time:
             return "Acquiring"
         else:
             return "Idle"
@@ -232,20 +315,51 @@ class FakeServer:
     def number_of_frames_requested(self, value):
         self._number_of_frames_requested = value
 
+    @property
+    def scan_pattern(self):
+        """
+        The position lookup table of the current scan. Defaults to a raster scan.
+        """
+        shape = self.fake_data.navigator.shape
+        if self._scan_pattern is None or self._scan_pattern.shape != shape:
+            self._scan_pattern = ScanPattern.raster(shape)
+        return self._scan_pattern
+
+    def _make_scan_pattern(self):
+        """
+        Build the position lookup table for the "Scan - Type" property.
+
+        "XY File" scans use the ``custom_scan_positions`` ((n, 2) array of (x, y)
+        coordinates) and "Random" scans only visit the "Scan - Subsampling Fraction"
+        of the positions.
+        """
+        shape = self.fake_data.navigator.shape
+        scan_type = self["Scan - Type"]
+        if scan_type == "XY File" and self.custom_scan_positions is not None:
+            return ScanPattern.from_coordinates(self.custom_scan_positions, shape)
+        elif scan_type == "Random":
+            fraction = float(self["Scan - Subsampling Fraction"])
+            return ScanPattern.random(shape, fraction=fraction, seed=self.seed)
+        elif scan_type in SCAN_TYPES:
+            return SCAN_TYPES[scan_type](shape)
+        warnings.warn(f"Scan type {scan_type} not supported, using a raster scan")
+        return ScanPattern.raster(shape)
+
     @property
     def current_navigation_index(self):
         if self.fake_data is None:
             return ValueError("No fake data initialized")
         if self.acquisition_status == "Idle":
-            return tuple(np.array(self.fake_data.navigator.shape) - 1)
+            return self.scan_pattern.index(len(self.scan_pattern) - 1)
         else:
-            index = np.unravel_index(
-                int(
-                    (time.time() - self.start_time) * float(self["Frames Per Second"]),
-                ),
-                self.fake_data.navigator.shape,
-            )  # only works for raster scans
-            return index
+            return self.scan_pattern.index(self.frames_acquired)
+
+    @property
+    def frames_acquired(self):
+        """The number of frames acquired so far in the current acquisition"""
+        elapsed = self.clock.time() - self.start_time
+        frames = int(elapsed * float(self["Frames Per Second"]))
+        return max(0, min(frames, self.total_frames))
 
     def _respond_to_command(self, command=None):
         if command is None:
@@ -304,18 +418,15 @@ class FakeServer:
         w = command.command[0].parameter[1].p_int
         h = command.command[0].parameter[2].p_int
 
-        total_bytes = w * h
-        buffer = self.socket.recv(total_bytes)
-        total_len = len(buffer)
-        if total_len < total_bytes:
-            while total_len < total_bytes:
-                try:
-                    buffer += self.socket.recv(total_bytes)
-                    total_len = len(buffer)
-                except self.socket.timeout:
-                    raise ValueError("Socket timed out")
-        buffer = buffer
-        mask = np.frombuffer(buffer, dtype=np.int8).reshape((w, h))
+        # read the (height, width) mask straight into its array
+        mask = np.empty((h, w), dtype=np.int8)
+        view = memoryview(mask).cast("B")
+        received = 0
+        while received < w * h:
+            count = self.socket.recv_into(view[received:])
+            if count == 0:
+                raise ConnectionError("The client closed the connection")
+            received += count
         self.virtual_masks[mask_id] = mask
         return (acknowledge_return,)
 
@@ -329,18 +440,90 @@ class FakeServer:
 
     def _initialize_data(self, scan_size_x, scan_size_y, kx_pixels, ky_pixels):
         if self.dataset == "grains":
-            self.fake_data = TiltGrains(
-                x_pixels=scan_size_x,
-                y_pixels=scan_size_y,
-                kx_pixels=kx_pixels,
-                ky_pixels=ky_pixels,
-                server=self,
+            key = (
+                self.dataset,
+                scan_size_x,
+                scan_size_y,
+                kx_pixels,
+                ky_pixels,
+                self.seed,
+            )
+            self._attach_data(
+                key,
+                lambda: TiltGrains(
+                    seed=self.seed,
+                    x_pixels=scan_size_x,
+                    y_pixels=scan_size_y,
+                    kx_pixels=kx_pixels,
+                    ky_pixels=ky_pixels,
+                ),
             )
+        elif isinstance(self.fake_data, FileData):
+            pass  # on-disk datasets are opened with the server and have a fixed size
         else:
             raise ValueError(
                 f"Dataset {self.dataset} not recognized. Please use 'grains'"
             )
 
+    def _initialize_file_data(self):
+        """
+        Open an on-disk dataset and match the sensor and scan size to it.
+        """
+        if not os.path.exists(self.dataset):
+            raise ValueError(
+                f"Dataset {self.dataset} not recognized. Please use 'grains' or the "
+                f"path to a dataset"
+            )
+        key = ("file", os.path.abspath(self.dataset)) + tuple(
+            sorted((k, str(v)) for k, v in self.dataset_options.items())
+        )
+        self._attach_data(key, lambda: FileData(self.dataset, **self.dataset_options))
+        kx, ky = self.fake_data.frame_shape
+        sx, sy = self.fake_data.navigator.shape
+        # the sizes are fixed by the dataset, so they are always allowed
+        self._extend_range("hardware_roi_offset_x", kx - 1)
+        self._extend_range("hardware_roi_offset_y", ky - 1)
+        for name, value in [
+            ("sensor_size_x_pixels", kx),
+            ("sensor_size_y_pixels", ky),
+            ("hardware_roi_offset_x", 0),
+            ("hardware_roi_offset_y", 0),
+            ("hardware_roi_size_x", kx),
+            ("hardware_roi_size_y", ky),
+            ("scan_-_size_x", sx),
+            ("scan_-_size_y", sy),
+        ]:
+            self._extend_range(name, value)
+            self[name] = value
+
+    def _extend_range(self, name, value):
+        """
+        Widen the allowed range of a property to include a value.
+        """
+        prop = self._values[name]
+        if prop.value_type != "Range" or not prop.options:
+            return
+        low, high = (float(i) for i in prop.options.split(",")[:2])
+        if not low <= value <= high:
+            low, high = min(low, value), max(high, value)
+            prop.options = f"{low}, {high}, '{int(low)} - {int(high)}'"
+
+    def _attach_data(self, key, factory):
+        """
+        Serve a dataset from the shared cache.
+
+        The cached dataset is never attached to a server. This server gets its own
+        view of the arrays, so its hardware ROI and binning don't change the frames
+        served by other servers.
+        """
+        shared = self.dataset_cache.get_or_create(key, factory)
+        if self.fake_data is not None and shared is self._shared_data:
+            return
+        if self.fake_data is not None:
+            self.fake_data.server = None
+        self._shared_data = shared
+        self.fake_data = shared.view(server=self)
+
     def _fake_start_acquisition(self, command):
         acknowledge_return = pb.DEPacket()
         num_acq = command.command[0].parameter[0].p_int
@@ -361,9 +544,18 @@ class FakeServer:
             )
             frames = num_acq
             self.number_of_frames_requested = frames
+        if self["Scan - Enable"] == "On":
+            self._scan_pattern = self._make_scan_pattern()
+            frames = len(self._scan_pattern)
+        else:
+            self._scan_pattern = None
         fps = float(self["Frames Per Second"])
         total_time = frames * num_acq / fps
-        self.start_time = time.time()
+        self.total_frames = int(round(frames * num_acq))
+        self.has_movie_buffer = command.command[0].parameter[1].p_bool
+        self.movie_buffer_index = 0
+        self._progressive_images = {}
+        self.start_time = self.clock.time()
         print(f"Acquisition started for {total_time} seconds")
         print(f"Acquisition started at {self.start_time}")
         print(f"Acquisition will end at {self.start_time + total_time}")
@@ -476,48 +668,54 @@ class FakeServer:
             string_param.p_string = val
         return (acknowledge_return,)
 
+    def _movie_buffer_layout(self):
+        """
+        The layout of a movie buffer.
+
+        Each movie buffer starts with a header of ``header_bytes``.  The header holds
+        the number of frames in the buffer, the frame width, height and data type as
+        four uint32 values, followed by a table with the uint32 index of each frame
+        starting at ``frame_index_start``.  The (height, width) frames (uint16)
+        follow the header.
+        """
+        frames = int(self["Grab Buffer Size"])
+        if self.fake_data is None:
+            width = int(self["Image Size X (pixels)"])
+            height = int(self["Image Size Y (pixels)"])
+        else:
+            width, height = self.fake_data.signal.shape[1:]
+        frame_index_start = MOVIE_BUFFER_DESCRIPTOR_BYTES
+        header_bytes = frame_index_start + 4 * frames
+        header_bytes = (
+            -(-header_bytes // MOVIE_BUFFER_ALIGNMENT) * MOVIE_BUFFER_ALIGNMENT
+        )
+        return {
+            "frames": frames,
+            "width": width,
+            "height": height,
+            "frame_bytes": width * height * 2,
+            "frame_index_start": frame_index_start,
+            "header_bytes": header_bytes,
+        }
+
     def _fake_get_movie_buffer_info(self, command):
         acknowledge_return = pb.DEPacket()
         acknowledge_return.type = pb.DEPacket.P_ACKNOWLEDGE
         ack1 = acknowledge_return.acknowledge.add()
         ack1.command_id = command.command[0].command_id
-        int_param = ack1.parameter.add()
-        int_param.type = pb.AnyParameter.P_INT
-        int_param.p_int = 512  # header size
-        # Image total bytes
-        int_param = ack1.parameter.add()
-        int_param.type = pb.AnyParameter.P_INT
-
-        # TODO: Figure out the right way to calculate this
-        int_param.p_int = (
-            int(self["Crop Size X"])
-            * int(self["Crop Size Y"])
-            * int(self["Grab Buffer Size"])
-            * 2
-        )  # 16 bit
-        # frame index start
-        int_param = ack1.parameter.add()
-        int_param.type = pb.AnyParameter.P_INT
-        # Header Size
-        int_param = ack1.parameter.add()
-        int_param.type = pb.AnyParameter.P_INT
-        int_param.p_int = 512
-        # image H
-        int_param = ack1.parameter.add()
-        int_param.type = pb.AnyParameter.P_INT
-        int_param.p_int = int(self["Crop Size X"])
-        # image W
-        int_param = ack1.parameter.add()
-        int_param.type = pb.AnyParameter.P_INT
-        int_param.p_int = int(self["Crop Size Y"])
-        # number of frames
-        int_param = ack1.parameter.add()
-        int_param.type = pb.AnyParameter.P_INT
-        int_param.p_int = int(self["Grab Buffer Size"])
-        # image data type
-        int_param = ack1.parameter.add()
-        int_param.type = pb.AnyParameter.P_INT
-        int_param.p_int = 5  # uint16
+        layout = self._movie_buffer_layout()
+        response_mapping = [
+            layout["header_bytes"],  # header size
+            layout["frames"] * layout["frame_bytes"],  # image total bytes
+            layout["frame_index_start"],  # frame index start
+            layout["header_bytes"],  # image start
+            layout["width"],  # image W
+            layout["height"],  # image H
+            layout["frames"],  # number of frames
+            5,  # image data type (uint16)
+        ]
+        for val in response_mapping:
+            ack1 = add_parameter(ack1, val)
         return (acknowledge_return,)
 
     def _fake_get_result(self, command):
@@ -580,7 +778,7 @@ class FakeServer:
             0,
             0,
             1,
-            time.time(),
+            self.clock.time(),
             0,
             0,
             0,
@@ -592,31 +790,50 @@ class FakeServer:
         pack = pb.DEPacket()
         pack.type = pb.DEPacket.P_DATA_HEADER
 
+        # the signal is indexed (x, y) and frames are sent as (height, width)
         if 2 < frame_type < 8:
-            image = self.fake_data[self.current_navigation_index].astype(
-                pixel_format_dict[pixel_format]
-            )
-            result = image.tobytes()
+            if self.integrated_noise:
+                label = self.fake_data.navigator[self.current_navigation_index]
+                image = self.noise.integrated(
+                    self.fake_data.signal, [label], dtype=np.float32
+                )[0].T
+            else:
+                image = self.fake_data[self.current_navigation_index].T
+            if frame_type < 7:  # raw frames before the references are applied
+                image = self.references.raw(image)
+            result = image.astype(pixel_format_dict[pixel_format]).tobytes()
+        elif frame_type == 8:  # electron counted
+            label = self.fake_data.navigator[self.current_navigation_index]
+            image = self.noise.counted(self.fake_data.signal, [label])[0].T
+            result = image.astype(pixel_format_dict[pixel_format]).tobytes()
+        elif frame_type == 50:  # positions visited so far
+            image = self.scan_pattern.subsampling_mask(self._positions_visited())
+            result = image.astype(pixel_format_dict[pixel_format]).tobytes()
         elif frame_type == 10:
             image = np.sum(self.fake_data.signal, axis=1).astype(
                 pixel_format_dict[pixel_format]
             )
             result = image.tobytes()
         elif 11 < frame_type < 17:  # virtual image
-            mask = self.virtual_masks[frame_type - 12]
-            if mask.shape != (windowWidth, windowHeight):
-                mask = resize(
-                    mask, (windowWidth, windowHeight), preserve_range=True
-                ).astype(np.int8)
+            mask = self.virtual_masks.resized(
+                frame_type - 12, (windowHeight, windowWidth)
+            )
             result = mask.tobytes()
         elif 17 <= frame_type < 22:
-            mask = self.virtual_masks[frame_type - 17]
-            calculation_type = self[
-                f"Scan - Virtual Detector {frame_type-17} Calculation"
-            ]
-            result = self.fake_data.get_virtual_image(mask, method=calculation_type)
+            result = self._virtual_images()[frame_type - 17]
+            if result is None:
+                calculation_type = self[
+                    f"Scan - Virtual Detector {frame_type-17} Calculation"
+                ]
+                raise ValueError(
+                    f"Calculation {calculation_type} not Supported in PythonDEServer"
+                )
             result = result.astype(pixel_format_dict[pixel_format]).tobytes()
 
+        elif 37 <= frame_type <= 48:  # dark, gain and bad pixel references
+            dark, gain, bad = self.references.get(self.fake_data.signal.shape[:0:-1])
+            image = dark if frame_type <= 40 else gain if frame_type <= 46 else bad
+            result = image.astype(pixel_format_dict[pixel_format]).tobytes()
         else:
             raise ValueError(f"Frame type {frame_type} not Supported in PythonDEServer")
         pack.data_header.bytesize = len(result)
@@ -625,30 +842,140 @@ class FakeServer:
 
         return ans
 
+    def _virtual_images(self):
+        """
+        Compute all of the virtual images in one pass. Detectors with a calculation
+        type that the fake data can't handle are returned as None.
+
+        During an acquisition the images are filled progressively: scan positions
+        which have not been visited yet are zero.
+        """
+        masks, methods, detectors = [], [], []
+        for i in range(len(self.virtual_masks)):
+            mask = self.virtual_masks.get(i).T  # to the (x, y) of the signal
+            method = self[f"Scan - Virtual Detector {i} Calculation"]
+            if method in VirtualImageEngine.METHODS:
+                masks.append(mask)
+                methods.append(method)
+                detectors.append(i)
+        images = [None] * len(self.virtual_masks)
+        responses = self.fake_data.get_virtual_responses(masks, methods)
+        for i, response in zip(detectors, responses):
+            images[i] = self._progressive_virtual_image(i, response)
+        return images
+
+    def _positions_visited(self):
+        """
+        The number of entries of the scan pattern visited so far (including the
+        position currently being acquired).
+        """
+        if self.acquisition_status == "Acquiring":
+            return self.frames_acquired % len(self.scan_pattern) + 1
+        return len(self.scan_pattern)
+
+    def _progressive_virtual_image(self, detector, response):
+        """
+        Fill the virtual image for some detector at the positions visited so far, in
+        the order of the scan pattern.
+
+        Only the positions visited since the image was last served are computed. If the
+        response changes (e.g. a new mask was set) or the next repeat of the scan has
+        started the image is filled again from the start of the scan.
+        """
+        navigator = self.fake_data.navigator.ravel()
+        pattern = self.scan_pattern
+        visited = self._positions_visited()
+        repeat = self.frames_acquired // len(pattern)
+
+        state = self._progressive_images.get(detector)
+        if (
+            state is None
+            or state["response"] is not response
+            or state["image"].shape != self.fake_data.navigator.shape
+            or state["repeat"] != repeat
+        ):
+            state = {
+                "response": response,
+                "image": np.zeros(self.fake_data.navigator.shape, dtype=response.dtype),
+                "index": 0,
+                "repeat": repeat,
+            }
+            self._progressive_images[detector] = state
+        start = state["index"]
+        if visited > start:
+            positions = pattern.positions[start:visited]
+            state["image"].ravel()[positions] = response[navigator[positions]]
+            state["index"] = visited
+        return state["image"]
+
     def _fake_get_movie_buffer(self, command):
         acknowledge_return = pb.DEPacket()
         acknowledge_return.type = pb.DEPacket.P_ACKNOWLEDGE
         ack1 = acknowledge_return.acknowledge.add()
         ack1.command_id = command.command[0].command_id
-        int_param = ack1.parameter.add()
-        int_param.type = pb.AnyParameter.P_INT
-        if self.is_acquisition_running:
-            int_param.p_int = 5
-        else:
-            int_param.p_int = 4
-        # Frame size
-        int_param = ack1.parameter.add()
-        int_param.type = pb.AnyParameter.P_INT
-        int_param.p_int = (
-            self["Grab Buffer Size"] * self["Crop Size X"] * self["Crop Size X"] * 2
-        )  # 16 bit
-        # number of frames
-        int_param = ack1.parameter.add()
-        int_param.type = pb.AnyParameter.P_INT
-        int_param.p_int = self["Grab Buffer Size"]
-
-        self.current_stream_id = 0
-        return (acknowledge_return,)
+        timeout = command.command[0].parameter[0].p_int / 1000
+
+        if not self.has_movie_buffer or self.fake_data is None:
+            for val in [MOVIE_BUFFER_FAILED, 0, 0]:
+                ack1 = add_parameter(ack1, val)
+            return (acknowledge_return,)
+
+        layout = self._movie_buffer_layout()
+        fps = float(self["Frames Per Second"])
+        deadline = self.clock.time() + timeout
+        while True:
+            # Wait (in simulated time) until a full buffer is available
+            available = self.frames_acquired - self.movie_buffer_index
+            finished = self.acquisition_status == "Idle"
+            if available >= layout["frames"] or (finished and available > 0):
+                status = MOVIE_BUFFER_OK
+                break
+            elif finished:
+                status = MOVIE_BUFFER_FINISHED
+                break
+            elif self.clock.time() >= deadline:
+                status = MOVIE_BUFFER_TIMEOUT
+                break
+            ready_time = (
+                self.start_time + (self.movie_buffer_index + layout["frames"]) / fps
+            )
+            wait = min(ready_time, self.end_time, deadline) - self.clock.time()
+            self.clock.sleep(max(wait, 1e-6))
+
+        if status != MOVIE_BUFFER_OK:
+            for val in [status, 0, 0]:
+                ack1 = add_parameter(ack1, val)
+            return (acknowledge_return,)
+
+        num_frames = min(available, layout["frames"])
+        frame_indexes = np.arange(
+            self.movie_buffer_index, self.movie_buffer_index + num_frames
+        )
+        self.movie_buffer_index += num_frames
+
+        total_bytes = layout["header_bytes"] + num_frames * layout["frame_bytes"]
+        buffer = bytearray(total_bytes)
+        header = np.frombuffer(buffer, dtype=np.uint32, count=4)
+        header[:] = [num_frames, layout["width"], layout["height"], 5]
+        index_table = np.frombuffer(
+            buffer,
+            dtype=np.uint32,
+            count=num_frames,
+            offset=layout["frame_index_start"],
+        )
+        index_table[:] = frame_indexes
+        images = np.frombuffer(
+            buffer, dtype=np.uint16, offset=layout["header_bytes"]
+        ).reshape((num_frames, layout["height"], layout["width"]))
+        # gather all of the frames at once from the labels in the navigator, the
+        # signal is indexed (x, y) and the frames are written row (y) by row
+        positions = self.scan_pattern.positions[frame_indexes % len(self.scan_pattern)]
+        labels = self.fake_data.navigator.ravel()[positions]
+        images[:] = self.fake_data.signal[labels].transpose(0, 2, 1)
+
+        for val in [status, total_bytes, int(num_frames)]:
+            ack1 = add_parameter(ack1, val)
+        return (acknowledge_return, buffer)
 
     # command lists
     LIST_CAMERAS = 0
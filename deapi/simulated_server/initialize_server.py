@@ -1,6 +1,9 @@
 import sys
 
 from deapi.simulated_server.fake_server import FakeServer
+from deapi.simulated_server.clock import RealClock, ScaledClock
+from deapi.simulated_server.network import NetworkConditions, PROFILES
+from deapi.simulated_server.multi_camera import MultiCameraServer
 import socket
 import struct
 from deapi.buffer_protocols import pb
@@ -12,12 +15,70 @@ import argparse
 def main(port=13241):
     parser = argparse.ArgumentParser()
     parser.add_argument("--port", type=int, help="Port to listen on")
-    try:
-        args = parser.parse_args()
-        if args.port:
-            port = args.port
-    except:
-        pass
+    parser.add_argument(
+        "--time-scale",
+        type=float,
+        default=1.0,
+        help="Run simulated acquisitions this many times faster than real time",
+    )
+    parser.add_argument(
+        "--dataset",
+        default="grains",
+        help="'grains' or the path to a 4D STEM dataset (.npy, .raw, .zarr or .h5)",
+    )
+    parser.add_argument("--dtype", help="The data type of a raw binary dataset")
+    parser.add_argument(
+        "--shape", help="The shape of a raw binary dataset, e.g. 256,256,128,128"
+    )
+    parser.add_argument(
+        "--cameras",
+        help="Comma separated names of several simulated cameras, e.g. 'Camera A,Camera B'",
+    )
+    parser.add_argument(
+        "--network-profile",
+        choices=list(PROFILES),
+        default="loopback",
+        help="Emulate a typical network link. The options below override the profile",
+    )
+    parser.add_argument(
+        "--latency", type=float, help="Delay added to each response (ms)"
+    )
+    parser.add_argument(
+        "--jitter", type=float, help="Maximum random delay added to the latency (ms)"
+    )
+    parser.add_argument(
+        "--bandwidth", type=float, help="Maximum throughput of responses (Mbit/s)"
+    )
+    parser.add_argument(
+        "--fragment-size", type=int, help="Maximum bytes written per send call"
+    )
+    parser.add_argument(
+        "--noise",
+        action="store_true",
+        help="Add shot noise and read noise to the integrated and raw frames",
+    )
+    args, _ = parser.parse_known_args()  # the port can also be passed positionally
+    if args.port:
+        port = args.port
+    if args.time_scale == 1:
+        clock = RealClock()
+    else:
+        clock = ScaledClock(args.time_scale)
+    overrides = {}
+    if args.latency is not None:
+        overrides["latency"] = args.latency / 1000
+    if args.jitter is not None:
+        overrides["jitter"] = args.jitter / 1000
+    if args.bandwidth is not None:
+        overrides["bandwidth"] = args.bandwidth * 1e6 / 8
+    if args.fragment_size is not None:
+        overrides["fragment_size"] = args.fragment_size
+    network = NetworkConditions.from_profile(args.network_profile, **overrides)
+    dataset_options = {}
+    if args.dtype is not None:
+        dataset_options["dtype"] = args.dtype
+    if args.shape is not None:
+        dataset_options["shape"] = tuple(int(i) for i in args.shape.split(","))
 
     HOST = "127.0.0.1"  # Standard loopback interface address (localhost)
     PORT = port  # Port to listen on (non-privileged ports are > 1023)
@@ -34,33 +95,53 @@ def main(port=13241):
         sys.stderr.flush()
         while True:
             conn, addr = server_socket.accept()  # What waits for a connection
-            server = FakeServer(socket=conn)
+            # responses are written in several parts, don't wait for an ACK in between
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            server_options = dict(
+                dataset=args.dataset,
+                socket=conn,
+                clock=clock,
+                dataset_options=dataset_options,
+                integrated_noise=args.noise,
+            )
+            if args.cameras:
+                server = MultiCameraServer(
+                    cameras=args.cameras.split(","), **server_options
+                )
+            else:
+                server = FakeServer(**server_options)
             connected = True
             while connected:
                 try:
-                    totallen = conn.recv(4)
+                    # wait for whole packets, the client may pipeline commands
+                    totallen = conn.recv(4, socket.MSG_WAITALL)
+                    if len(totallen) < 4:
+                        raise ConnectionError("The client closed the connection")
                     totallenRecv = struct.unpack("I", totallen)[0]
-                    message = conn.recv(totallenRecv)
+                    message = conn.recv(totallenRecv, socket.MSG_WAITALL)
+                    if len(message) < totallenRecv:
+                        raise ConnectionError("The client closed the connection")
                     message_packet = pb.DEPacket()
                     message_packet.ParseFromString(message)
                     response = server._respond_to_command(message_packet)
 
+                    parts = []
                     for r in response:
                         if isinstance(r, pb.DEPacket):
-                            packet = (
+                            parts.append(
                                 struct.pack("I", r.ByteSize()) + r.SerializeToString()
                             )
-                            conn.send(packet)
                         else:
-                            conn.sendall(r)
-                except:
+                            parts.append(r)
+                    network.send_response(conn, parts)
+                except OSError:  # the connection was reset or closed
                     connected = False
 
 
 # Using the special variable
 # __name__
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
+    if len(sys.argv) > 1 and sys.argv[1].isdigit():
         main(int(sys.argv[1]))
     else:
         main()
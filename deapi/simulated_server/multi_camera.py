@@ -0,0 +1,91 @@
+from deapi.buffer_protocols import pb
+from deapi.version import commandVersion
+from deapi.simulated_server.clock import RealClock
+from deapi.simulated_server.fake_server import FakeServer, add_parameter
+
+
+class MultiCameraServer:
+    """
+    Several independent simulated cameras behind a single connection.
+
+    Each camera is a :class:`FakeServer` with its own properties, dataset, virtual
+    masks and acquisition timeline. Commands are routed to a camera by the
+    ``camera_name`` of the command packet (commands without a camera name go to the
+    first camera) and ``LIST_CAMERAS`` returns the names of all of the cameras. All
+    of the cameras share one clock so that their acquisitions can be synchronized.
+
+    Parameters
+    ----------
+    cameras : list of str or dict, optional
+        The names of the cameras, or a dictionary of camera names to the keyword
+        arguments for each :class:`FakeServer` (e.g. the ``dataset``). By default
+        two cameras.
+    socket : socket.socket, optional
+        The connection to the client.
+    clock : RealClock, optional
+        The clock shared by all of the cameras, by default the system time.
+    **kwargs
+        Keyword arguments passed to every :class:`FakeServer`. The ``seed`` (by
+        default 0) is offset by the index of each camera.
+
+    Examples
+    --------
+    >>> server = MultiCameraServer(["Camera A", "Camera B"])
+    >>> server["Camera B"]["Frames Per Second"] = 100
+    """
+
+    def __init__(
+        self, cameras=("Camera 1", "Camera 2"), socket=None, clock=None, **kwargs
+    ):
+        if clock is None:
+            clock = RealClock()
+        if not isinstance(cameras, dict):
+            cameras = {name: {} for name in cameras}
+        if len(cameras) == 0:
+            raise ValueError("The server needs at least one camera")
+        self.clock = clock
+        self.socket = socket
+        self.cameras = {}
+        for i, (name, options) in enumerate(cameras.items()):
+            # different seeds so that each camera gets its own synthetic dataset
+            options = {**kwargs, "seed": kwargs.get("seed", 0) + i, **options}
+            camera = FakeServer(socket=socket, clock=clock, **options)
+            camera["Camera Name"] = name
+            self.cameras[name] = camera
+
+    def __getitem__(self, name):
+        return self.cameras[name]
+
+    @property
+    def camera_names(self):
+        """The names of all of the cameras"""
+        return list(self.cameras)
+
+    def _respond_to_command(self, command=None):
+        if command is None:
+            return False
+        command_id = command.command[0].command_id
+        if command_id == FakeServer.LIST_CAMERAS + commandVersion * 100:
+            return self._list_cameras(command)
+        name = command.camera_name or self.camera_names[0]
+        if name not in self.cameras:
+            return self._error(command, f"Camera {name} not found")
+        return self.cameras[name]._respond_to_command(command)
+
+    def _list_cameras(self, command):
+        acknowledge_return = pb.DEPacket()
+        acknowledge_return.type = pb.DEPacket.P_ACKNOWLEDGE
+        ack1 = acknowledge_return.acknowledge.add()
+        ack1.command_id = command.command[0].command_id
+        for name in self.cameras:
+            add_parameter(ack1, name)
+        return (acknowledge_return,)
+
+    def _error(self, command, message):
+        acknowledge_return = pb.DEPacket()
+        acknowledge_return.type = pb.DEPacket.P_ACKNOWLEDGE
+        ack1 = acknowledge_return.acknowledge.add()
+        ack1.command_id = command.command[0].command_id
+        ack1.error = True
+        ack1.error_message = message
+        return (acknowledge_return,)
@@ -0,0 +1,140 @@
+"""Emulation of network conditions for the pydeserver.
+
+On a local machine every request to the pydeserver goes over the loopback interface
+which is much faster than the link to a real DE Server.  The :class:`NetworkConditions`
+class delays and throttles the responses from the pydeserver so that client code can be
+tested against realistic network profiles.
+"""
+
+import time
+
+import numpy as np
+
+
+class NetworkConditions:
+    """Emulated network conditions used when sending responses.
+
+    Parameters
+    ----------
+    latency : float, optional
+        Delay in seconds added before each response, by default 0.
+    jitter : float, optional
+        Maximum random delay in seconds added on top of the latency, by default 0.
+    bandwidth : float, optional
+        Maximum throughput in bytes per second, by default None (unlimited).
+    fragment_size : int, optional
+        Maximum number of bytes written to the socket per send call, by default None.
+        Small fragments emulate partial sends and force the client to reassemble
+        the data.
+    congestion_probability : float, optional
+        Probability that a response is delayed by ``congestion_delay``, by default 0.
+    congestion_delay : float, optional
+        Extra delay in seconds for a congested response, by default 0.01.
+    seed : int, optional
+        Seed for the random jitter and congestion, by default None.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        bandwidth: float = None,
+        fragment_size: int = None,
+        congestion_probability: float = 0.0,
+        congestion_delay: float = 0.01,
+        seed: int = None,
+    ):
+        if bandwidth is not None and bandwidth <= 0:
+            raise ValueError(f"The bandwidth must be positive, not {bandwidth}")
+        if fragment_size is not None and fragment_size <= 0:
+            raise ValueError(f"The fragment size must be positive, not {fragment_size}")
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.fragment_size = fragment_size
+        self.congestion_probability = congestion_probability
+        self.congestion_delay = congestion_delay
+        self.rng = np.random.default_rng(seed)
+
+    @classmethod
+    def from_profile(cls, name, **kwargs):
+        """Create the network conditions for one of the ``PROFILES``.
+
+        Keyword arguments override the values of the profile.
+        """
+        if name not in PROFILES:
+            raise ValueError(
+                f"Network profile {name} not recognized. Please use one of "
+                f"{list(PROFILES)}"
+            )
+        return cls(**{**PROFILES[name], **kwargs})
+
+    @property
+    def is_ideal(self):
+        """True if the conditions don't change how responses are sent"""
+        return (
+            self.latency == 0
+            and self.jitter == 0
+            and self.bandwidth is None
+            and self.fragment_size is None
+            and self.congestion_probability == 0
+        )
+
+    def response_delay(self):
+        """The delay in seconds before sending the next response"""
+        delay = self.latency
+        if self.jitter > 0:
+            delay += self.rng.uniform(0, self.jitter)
+        if (
+            self.congestion_probability > 0
+            and self.rng.random() < self.congestion_probability
+        ):
+            delay += self.congestion_delay
+        return delay
+
+    def send_response(self, conn, parts):
+        """Send all of the parts of one response to a socket.
+
+        Parameters
+        ----------
+        conn : socket.socket
+            The socket to send the response to.
+        parts : list of bytes-like
+            The serialized packets and data for the response.
+        """
+        if self.is_ideal:
+            for part in parts:
+                conn.sendall(part)
+            return
+        delay = self.response_delay()
+        if delay > 0:
+            time.sleep(delay)
+        start = time.perf_counter()
+        sent = 0
+        for part in parts:
+            data = memoryview(part).cast("B")
+            step = self.fragment_size or max(len(data), 1)
+            for i in range(0, len(data), step):
+                chunk = data[i : i + step]
+                conn.sendall(chunk)
+                sent += len(chunk)
+                if self.bandwidth is not None:
+                    wait = start + sent / self.bandwidth - time.perf_counter()
+                    if wait > 0:
+                        time.sleep(wait)
+
+
+# Some typical network set ups. Latencies are the added delay per response
+PROFILES = {
+    "loopback": {},
+    "1gbe": {"latency": 0.5e-3, "jitter": 0.1e-3, "bandwidth": 1e9 / 8},
+    "10gbe": {"latency": 0.3e-3, "jitter": 0.05e-3, "bandwidth": 10e9 / 8},
+    "10gbe-congested": {
+        "latency": 0.3e-3,
+        "jitter": 0.2e-3,
+        "bandwidth": 10e9 / 8,
+        "fragment_size": 64 * 1024,
+        "congestion_probability": 0.05,
+        "congestion_delay": 0.01,
+    },
+}
@@ -0,0 +1,146 @@
+"""Serve a recorded client session back to a client.
+
+A session recorded with :meth:`deapi.client.Client.start_recording` can be replayed
+either at its original speed (the delay between each request and its response is
+kept) or as fast as possible. This makes it possible to reproduce the traffic of a
+real DE Server offline and benchmark changes to the client against it.
+
+The replay server can be started with:
+
+.. code-block::
+
+    pydereplay session.delog --port 13241 --max-speed
+"""
+
+import argparse
+import socket
+import struct
+import sys
+import time
+
+from deapi.buffer_protocols import pb
+from deapi.recording import PACKET, read_session, split_exchanges
+
+
+def _command_ids(packet):
+    message = pb.DEPacket()
+    message.ParseFromString(bytes(packet[4:]))
+    return [c.command_id for c in message.command]
+
+
+def _recv_exactly(conn, n):
+    buffer = bytearray(n)
+    view = memoryview(buffer)
+    received = 0
+    while received < n:
+        count = conn.recv_into(view[received:])
+        if count == 0:
+            raise ConnectionError("The client closed the connection")
+        received += count
+    return bytes(buffer)
+
+
+class ReplayServer:
+    """Replay the responses from a session log.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        The session log to replay.
+    max_speed : bool, optional
+        If True the responses are sent as soon as each request arrives, otherwise the
+        recorded delay between a request and each part of its response is kept. By
+        default False.
+    """
+
+    def __init__(self, path, max_speed=False):
+        self.exchanges = split_exchanges(read_session(path))
+        self.max_speed = max_speed
+        self.index = 0
+
+    @property
+    def finished(self):
+        """True once every recorded exchange has been replayed"""
+        return self.index >= len(self.exchanges)
+
+    def respond(self, conn, packet):
+        """Replay the response for one request.
+
+        Parameters
+        ----------
+        conn : socket.socket
+            The connection to the client.
+        packet : bytes
+            The request packet (including the 4 byte size prefix) from the client.
+        """
+        arrival = time.perf_counter()
+        if self.finished:
+            raise ValueError("The client sent more requests than were recorded")
+        sent, received = self.exchanges[self.index]
+        expected = sent[0]
+        if expected.kind != PACKET or _command_ids(packet) != _command_ids(
+            expected.data
+        ):
+            raise ValueError(
+                f"Request {self.index} does not match the recorded session. Expected "
+                f"commands {_command_ids(expected.data)}, got {_command_ids(packet)}"
+            )
+        for record in sent[1:]:
+            # e.g. the virtual mask sent after a SET_VIRTUAL_MASK command
+            _recv_exactly(conn, len(record.data))
+        self.index += 1
+
+        for record in received:
+            if not self.max_speed:
+                wait = arrival + (record.timestamp - sent[-1].timestamp)
+                wait -= time.perf_counter()
+                if wait > 0:
+                    time.sleep(wait)
+            conn.sendall(record.data)
+
+    def serve(self, conn):
+        """Replay the session to a connected client until it disconnects."""
+        while True:
+            try:
+                size = _recv_exactly(conn, 4)
+            except ConnectionError:
+                return
+            message = _recv_exactly(conn, struct.unpack("I", size)[0])
+            self.respond(conn, size + message)
+
+
+def main(port=13241):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("session", help="The session log to replay")
+    parser.add_argument("--port", type=int, default=port, help="Port to listen on")
+    parser.add_argument(
+        "--max-speed",
+        action="store_true",
+        help="Send responses immediately instead of at the recorded speed",
+    )
+    args = parser.parse_args()
+
+    HOST = "127.0.0.1"
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server_socket:
+        server_socket.bind((HOST, args.port))
+        server_socket.listen()
+        sys.stderr.write("started .... \n\n")
+        sys.stderr.write(
+            f"Replaying {args.session} to: \n"
+            f"    Host: {HOST}\n"
+            f"    Port: {args.port} \n"
+        )
+        sys.stderr.flush()
+        while True:
+            conn, addr = server_socket.accept()
+            server = ReplayServer(args.session, max_speed=args.max_speed)
+            with conn:
+                try:
+                    server.serve(conn)
+                except (ConnectionError, ValueError) as e:
+                    sys.stderr.write(f"Replay stopped: {e}\n")
+                    sys.stderr.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Scan patterns for simulated acquisitions.
+
+A scan pattern is a precomputed lookup table with the flat navigation index of the
+scan position visited by each frame, so finding the position of a frame is a single
+array lookup whatever the order of the scan.
+"""
+
+import numpy as np
+
+
+class ScanPattern:
+    """
+    The order in which the positions of a scan are visited.
+
+    Parameters
+    ----------
+    positions : array-like of int
+        The flat (C order) navigation index of the position visited by each frame.
+    shape : tuple of int
+        The (x, y) shape of the scan.
+    """
+
+    def __init__(self, positions, shape):
+        positions = np.asarray(positions, dtype=np.int64).ravel()
+        self.shape = tuple(int(i) for i in shape)
+        size = int(np.prod(self.shape))
+        if positions.size == 0:
+            raise ValueError("A scan pattern needs at least one position")
+        if positions.min() < 0 or positions.max() >= size:
+            raise ValueError(f"Scan positions must be in the range 0 - {size - 1}")
+        self.positions = positions
+
+    def __len__(self):
+        return self.positions.size
+
+    @classmethod
+    def raster(cls, shape):
+        """Visit each row in turn, always in the same direction."""
+        return cls(np.arange(int(np.prod(shape))), shape)
+
+    @classmethod
+    def serpentine(cls, shape):
+        """Visit each row in turn, alternating the direction of the rows."""
+        order = np.arange(int(np.prod(shape))).reshape(shape)
+        order[1::2] = order[1::2, ::-1]
+        return cls(order, shape)
+
+    @classmethod
+    def raster_interlaced(cls, shape):
+        """A raster scan of the even rows followed by the odd rows."""
+        order = np.arange(int(np.prod(shape))).reshape(shape)
+        return cls(np.concatenate([order[::2].ravel(), order[1::2].ravel()]), shape)
+
+    @classmethod
+    def serpentine_interlaced(cls, shape):
+        """A serpentine scan of the even rows followed by the odd rows."""
+        order = cls.serpentine(shape).positions.reshape(shape)
+        return cls(np.concatenate([order[::2].ravel(), order[1::2].ravel()]), shape)
+
+    @classmethod
+    def random(cls, shape, fraction=1.0, seed=None):
+        """
+        Visit the positions in a random order.
+
+        Parameters
+        ----------
+        shape : tuple of int
+            The (x, y) shape of the scan.
+        fraction : float, optional
+            The fraction of the positions to visit, by default 1.0. Scans with a
+            fraction less than 1 are sparse (subsampled) scans.
+        seed : int, optional
+            The seed for the random order, by default None.
+        """
+        if not 0 < fraction <= 1:
+            raise ValueError(
+                f"The fraction must be in the range (0, 1], not {fraction}"
+            )
+        size = int(np.prod(shape))
+        count = max(1, int(round(size * fraction)))
+        rng = np.random.default_rng(seed)
+        return cls(rng.permutation(size)[:count], shape)
+
+    @classmethod
+    def from_coordinates(cls, coordinates, shape):
+        """
+        A custom scan from a list of (x, y) coordinates.
+
+        Parameters
+        ----------
+        coordinates : array-like
+            The (n, 2) array of (x, y) coordinates.
+        shape : tuple of int
+            The (x, y) shape of the scan.
+        """
+        coordinates = np.asarray(coordinates, dtype=np.int64)
+        if coordinates.ndim != 2 or coordinates.shape[1] != 2:
+            raise ValueError("The coordinates should be an (n, 2) array of (x, y)")
+        if np.any(coordinates < 0) or np.any(coordinates >= shape):
+            raise ValueError(f"The coordinates must lie inside the scan {shape}")
+        return cls(np.ravel_multi_index(tuple(coordinates.T), shape), shape)
+
+    def position(self, frame):
+        """The flat navigation index of the position visited by some frame."""
+        return int(self.positions[frame % self.positions.size])
+
+    def index(self, frame):
+        """The (x, y) navigation index of the position visited by some frame."""
+        return np.unravel_index(self.position(frame), self.shape)
+
+    def subsampling_mask(self, frames=None):
+        """
+        The positions visited by the first ``frames`` frames of the scan.
+
+        Parameters
+        ----------
+        frames : int, optional
+            The number of frames acquired, by default the whole scan.
+
+        Returns
+        -------
+        np.ndarray
+            A uint8 array of the scan shape which is 1 at visited positions.
+        """
+        if frames is None:
+            frames = self.positions.size
+        mask = np.zeros(self.shape, dtype=np.uint8)
+        mask.ravel()[self.positions[: max(0, frames)]] = 1
+        return mask
+
+
+# The pattern for each value of the "Scan - Type" property
+SCAN_TYPES = {
+    "Raster": ScanPattern.raster,
+    "Serpentine": ScanPattern.serpentine,
+    "Raster Interlaced": ScanPattern.raster_interlaced,
+    "Serpentine Interlaced": ScanPattern.serpentine_interlaced,
+    "Random": ScanPattern.random,
+}
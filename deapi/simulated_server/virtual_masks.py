@@ -0,0 +1,109 @@
+"""Storage for the virtual masks of a simulated camera.
+
+Masks which have never been set are not allocated, and the resized copies of each
+mask sent back to clients (e.g. for a mask preview in a GUI) are cached until the
+mask changes.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+from skimage.transform import resize
+
+
+class VirtualMaskStore:
+    """
+    The virtual masks of a :class:`deapi.simulated_server.fake_server.FakeServer`.
+
+    The store behaves like a list of int8 arrays. Indexing returns a writable mask
+    (allocating it if it was never set) and assigning replaces a mask. Both count as
+    a change to the mask, so any cached resized copies of it are dropped.
+
+    Parameters
+    ----------
+    shape : tuple of int
+        The shape of masks which have not been set.
+    count : int, optional
+        The number of masks, by default 5.
+    max_resized : int, optional
+        The number of resized masks to keep, by default 16.
+    """
+
+    def __init__(self, shape, count=5, max_resized=16):
+        self.shape = tuple(int(i) for i in shape)
+        self.max_resized = max_resized
+        self._masks = [None] * count
+        self._versions = [0] * count
+        self._resized = OrderedDict()
+
+    def __len__(self):
+        return len(self._masks)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __getitem__(self, index):
+        # the caller can modify the mask in place so treat it as changed
+        if self._masks[index] is None:
+            self._masks[index] = np.zeros(self.shape, dtype=np.int8)
+        self._invalidate(index)
+        return self._masks[index]
+
+    def __setitem__(self, index, mask):
+        self._masks[index] = np.asarray(mask, dtype=np.int8)
+        self._invalidate(index)
+
+    def _invalidate(self, index):
+        index = range(len(self))[index]
+        self._versions[index] += 1
+        for key in [k for k in self._resized if k[0] == index]:
+            del self._resized[key]
+
+    def version(self, index):
+        """A counter which is incremented whenever a mask (might have) changed."""
+        return self._versions[index]
+
+    def get(self, index):
+        """
+        A read-only view of a mask. Unset masks are zero and are not allocated.
+        """
+        mask = self._masks[index]
+        if mask is None:
+            return np.broadcast_to(np.int8(0), self.shape)
+        mask = mask.view()
+        mask.flags.writeable = False
+        return mask
+
+    def resized(self, index, shape):
+        """
+        A mask resized to some shape, cached until the mask changes.
+
+        Parameters
+        ----------
+        index : int
+            The index of the mask.
+        shape : tuple of int
+            The shape to resize the mask to.
+
+        Returns
+        -------
+        np.ndarray
+            The (read-only) int8 mask.
+        """
+        index = range(len(self))[index]
+        shape = tuple(int(i) for i in shape)
+        mask = self.get(index)
+        if mask.shape == shape:
+            return mask
+        if self._masks[index] is None:
+            return np.broadcast_to(np.int8(0), shape)
+        key = (index, shape, self._versions[index])
+        if key not in self._resized:
+            resized = resize(mask, shape, preserve_range=True).astype(np.int8)
+            resized.flags.writeable = False
+            self._resized[key] = resized
+            while len(self._resized) > self.max_resized:
+                self._resized.popitem(last=False)
+        self._resized.move_to_end(key)
+        return self._resized[key]
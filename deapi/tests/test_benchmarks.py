@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+from deapi.benchmarks import (
+    check_thresholds,
+    load_thresholds,
+    measure,
+    run_benchmarks,
+)
+from deapi.benchmarks.__main__ import main
+from deapi.benchmarks.suite import FRAME_TYPES
+
+
+class TestMeasure:
+    def test_measure(self):
+        result = measure("test", lambda: 100, repeat=5, items=2, frames=3)
+        assert result["name"] == "test"
+        assert result["repeat"] == 5
+        assert result["min"] <= result["median"] <= result["max"]
+        assert result["ops_per_second"] > 0
+        assert result["bytes_per_second"] > 0
+        assert result["frames"] == 3
+
+    def test_measure_no_bytes(self):
+        assert "bytes_per_second" not in measure("test", lambda: True, repeat=2)
+        assert "bytes_per_second" not in measure("test", lambda: None, repeat=2)
+
+
+class TestThresholds:
+    results = [
+        {"name": "get_property", "median": 0.01},
+        {"name": "get_result[a-UINT8]", "median": 0.1, "ops_per_second": 10},
+        {"name": "get_result[b-UINT8]", "median": 0.01, "ops_per_second": 100},
+    ]
+
+    def test_pass(self):
+        thresholds = {"get_property": {"max_median": 0.1}, "missing": {"max_min": 1}}
+        assert check_thresholds(self.results, thresholds) == []
+
+    def test_fail(self):
+        failures = check_thresholds(
+            {"results": self.results},
+            {
+                "get_property": {"max_median": 0.001},
+                "get_result[*": {"min_ops_per_second": 50},
+            },
+        )
+        assert len(failures) == 2
+        assert failures[0].startswith("get_property")
+        assert failures[1].startswith("get_result[a-UINT8]")
+
+    def test_default_thresholds(self):
+        names = ["connect", "get_property", "set_property", "movie_buffer"]
+        names += ["virtual_images[all]", "virtual_images[mask_update]"]
+        names += ["set_virtual_mask[1024x1024]", "set_virtual_mask[4096x4096]"]
+        names += [f"virtual_detectors[{m}]" for m in ["dense", "sparse"]]
+        names += [f"electron_counting[{m}]" for m in ["local_max", "connected"]]
+        names += ["contrast_stretch[linear]", "contrast_stretch[diffraction]"]
+        for frame_type, pixel_formats in FRAME_TYPES.items():
+            names += [f"get_result[{frame_type}-{p}]" for p in pixel_formats]
+        for pattern, limits in load_thresholds().items():
+            assert any(
+                n == pattern or (pattern.endswith("*") and n.startswith(pattern[:-1]))
+                for n in names
+            )
+            assert all(limit.split("_")[0] in ("min", "max") for limit in limits)
+
+
+class TestRun:
+    # the timings depend on the machine, so only the structure of the results is
+    # checked here and the thresholds are tested with a file which always fails
+    def test_run_benchmarks(self):
+        results = run_benchmarks(names=["property", "connect"], repeat=2)
+        names = [r["name"] for r in results["results"]]
+        assert names == ["connect", "get_property", "set_property"]
+        assert results["metadata"]["server"] == "pydeserver"
+        for result in results["results"]:
+            assert 0 < result["min"] <= result["median"] <= result["max"]
+            assert result["ops_per_second"] > 0
+
+    def test_main(self, tmp_path):
+        output = tmp_path / "results.json"
+        argv = ["--only", "property", "--repeat", "2", "--output", str(output)]
+        assert main(argv + ["--no-check"]) == 0
+        with open(output) as f:
+            results = json.load(f)
+        assert "regressions" not in results
+        names = [r["name"] for r in results["results"]]
+        assert names == ["get_property", "set_property"]
+
+    def test_main_regression(self, tmp_path):
+        output = tmp_path / "results.json"
+        thresholds = tmp_path / "thresholds.json"
+        with open(thresholds, "w") as f:
+            json.dump({"get_property": {"max_median": 0}}, f)
+        argv = ["--only", "property", "--repeat", "2", "--output", str(output)]
+        assert main(argv + ["--thresholds", str(thresholds)]) == 1
+        with open(output) as f:
+            results = json.load(f)
+        assert len(results["regressions"]) == 1
+        assert results["regressions"][0].startswith("get_property")
@@ -4,7 +4,8 @@ import numpy as np
 
 from deapi import Client
 import pytest
-from deapi.data_types import PropertySpec, VirtualMask
+from deapi.data_types import PropertySpec, VirtualMask, MovieBufferStatus
+from deapi.processing import movie_buffer_frames
 
 
 class TestClient:
@@ -78,6 +79,28 @@ class TestClient:
         while client.acquiring:
             time.sleep(1)
 
+    def test_get_result_counted(self, client):
+        client.scan(size_x=10, size_y=10, enable="On")
+        client.start_acquisition(1)
+        while client.acquiring:
+            time.sleep(1)
+        result = client.get_result("singleframe_counted")
+        assert result[0].shape == (1024, 1024)
+        assert 0 < result[0].sum() < 1024 * 1024
+
+    def test_get_subsampling_mask(self, client):
+        client["Frames Per Second"] = 1000
+        client.scan(size_x=8, size_y=8, enable="On")
+        client["Scan - Type"] = "Random"
+        client["Scan - Subsampling Fraction"] = 0.25
+        client.start_acquisition(1)
+        while client.acquiring:
+            time.sleep(1)
+        result = client.get_result("scan_subsamplingmask")
+        assert result[0].shape == (8, 8)
+        assert result[0].sum() == 16
+        client["Scan - Type"] = "Raster"
+
     def test_binning_linked_parameters(self, client):
 
         client["Hardware Binning X"] = 2
@@ -109,6 +132,73 @@ class TestClient:
         client.virtual_masks[2][:] = 2
         np.testing.assert_allclose(client.virtual_masks[2][:], 2)
 
+    def test_set_virtual_mask_dtype(self, client):
+        shape = client.virtual_masks[0][:].shape
+        mask = np.full(shape, 2.0)
+        assert client.set_virtual_mask(0, w=shape[1], h=shape[0], mask=mask)
+        np.testing.assert_allclose(client.virtual_masks[0][:], 2)
+        assert not client.set_virtual_mask(5, w=shape[1], h=shape[0], mask=mask)
+
+    def test_virtual_mask_edit(self, client, monkeypatch):
+        calls = []
+        for name in ["get_virtual_mask", "set_virtual_mask"]:
+            method = getattr(client, name)
+
+            def counted(*args, _name=name, _method=method, **kwargs):
+                calls.append(_name)
+                return _method(*args, **kwargs)
+
+            monkeypatch.setattr(client, name, counted)
+        with client.virtual_masks[3].edit() as mask:
+            mask[:] = 1
+            mask[:10] = 2
+        assert calls == ["set_virtual_mask"]
+        np.testing.assert_allclose(client.virtual_masks[3][:10], 2)
+        width = client.virtual_masks[3][:].shape[1]
+        assert calls == ["set_virtual_mask"]
+
+        # setting a property might change the mask on the server
+        client["Frames Per Second"] = 100
+        assert np.sum(client.virtual_masks[3][:] == 2) == 10 * width
+        assert calls == ["set_virtual_mask", "get_virtual_mask"]
+
+    def test_virtual_mask_edit_error(self, client):
+        client.virtual_masks[3][:] = 1
+        with pytest.raises(RuntimeError):
+            with client.virtual_masks[3].edit() as mask:
+                mask[:] = 2
+                raise RuntimeError
+        np.testing.assert_allclose(client.virtual_masks[3][:], 1)
+
+    def test_set_virtual_masks(self, client):
+        from deapi import masks
+
+        shape = masks.detector_shape(client)
+        vbf = masks.disk(client, 20)
+        adf = masks.annulus(client, 30, 60)
+        # the server is shared with the other tests, so put the detectors back
+        names = [f"Scan - Virtual Detector {i} Shape" for i in (0, 1)]
+        names += [f"Scan - Virtual Detector {i} Calculation" for i in (0, 1)]
+        original = {name: client[name] for name in names}
+        original_masks = {i: client.virtual_masks[i][:] for i in (0, 1)}
+        try:
+            assert client.set_virtual_masks(
+                {0: vbf, 1: adf}, calculations={0: "Sum", 1: "Difference"}
+            )
+            assert client.virtual_masks[1].calculation == "Difference"
+            assert client["Scan - Virtual Detector 0 Shape"] == "Arbitrary"
+            np.testing.assert_array_equal(client.virtual_masks[0][:], vbf)
+            np.testing.assert_array_equal(client.virtual_masks[1][:], adf)
+            assert client.virtual_masks[1][:].shape == shape
+            with pytest.raises(ValueError):
+                client.set_virtual_masks({4: vbf})
+        finally:
+            client.set_virtual_masks(original_masks)
+            for name, value in original.items():
+                client[name] = value
+        assert client["Scan - Virtual Detector 0 Shape"] == original[names[0]]
+        np.testing.assert_array_equal(client.virtual_masks[0][:], original_masks[0])
+
     def test_resize_virtual_mask(self, client):
         client.virtual_masks[2][:] = 2
         client["Hardware ROI Offset X"] = 512
@@ -141,3 +231,50 @@ class TestClient:
         assert isinstance(sp, PropertySpec)
         assert sp.currentValue == "2"
         assert sp.options == ["1", "2", "4", "8"]
+
+    def test_get_movie_buffer(self, client):
+        client["Frames Per Second"] = 1000
+        client.scan(size_x=4, size_y=4, enable="On")
+        client.start_acquisition(1, requestMovieBuffer=True)
+        info = client.get_movie_buffer_info()
+        assert info.framesInBuffer > 0
+        assert info.frameIndexStartPos > 0
+        frames = 0
+        status = MovieBufferStatus.OK
+        while status == MovieBufferStatus.OK:
+            status, total_bytes, num_frames, buffer = client.get_movie_buffer(
+                info.to_buffer(), info.total_bytes, info.framesInBuffer
+            )
+            if status == MovieBufferStatus.OK:
+                assert len(buffer) == total_bytes
+                frames += num_frames
+        assert status == MovieBufferStatus.FINISHED
+        assert frames == 16
+
+    def test_get_movie_buffer_non_square(self, client):
+        client["Frames Per Second"] = 1000
+        client.scan(size_x=4, size_y=4, enable="On")
+        roi = ["Hardware ROI Offset X", "Hardware ROI Offset Y"]
+        roi += ["Hardware ROI Size X", "Hardware ROI Size Y"]
+        original = {name: client[name] for name in roi}
+        try:
+            for name, value in zip(roi, [0, 0, 1024, 512]):
+                client[name] = value
+            client.update_image_size()
+            assert (client.image_sizey, client.image_sizex) == (512, 1024)
+            client.start_acquisition(1, requestMovieBuffer=True)
+            info = client.get_movie_buffer_info()
+            assert (info.imageH, info.imageW) == (512, 1024)
+            status, total_bytes, num_frames, buffer = client.get_movie_buffer(
+                info.to_buffer(), info.total_bytes, info.framesInBuffer
+            )
+            assert status == MovieBufferStatus.OK
+            assert total_bytes == info.imageStartPos + num_frames * 512 * 1024 * 2
+            shapes = [b.frames.shape for b in movie_buffer_frames(client)]
+            assert all(shape[1:] == (512, 1024) for shape in shapes)
+            assert num_frames + sum(shape[0] for shape in shapes) == 16
+        finally:
+            while client.acquiring:
+                time.sleep(0.01)
+            for name, value in original.items():
+                client[name] = value
@@ -0,0 +1,43 @@
+from deapi.fake_data import DatasetCache, TiltGrains
+
+
+class FakeDataset:
+    def __init__(self, nbytes):
+        self.nbytes = nbytes
+
+
+class TestDatasetCache:
+    def test_get_or_create(self):
+        cache = DatasetCache()
+        calls = []
+
+        def factory():
+            calls.append(1)
+            return TiltGrains(x_pixels=8, y_pixels=8, kx_pixels=32, ky_pixels=32)
+
+        first = cache.get_or_create("key", factory)
+        second = cache.get_or_create("key", factory)
+        assert first is second
+        assert len(calls) == 1
+        assert cache.nbytes == first.nbytes
+
+    def test_lru_eviction(self):
+        cache = DatasetCache(max_items=2)
+        cache.put("a", FakeDataset(1))
+        cache.put("b", FakeDataset(1))
+        cache.get("a")  # "b" is now the least recently used
+        cache.put("c", FakeDataset(1))
+        assert "a" in cache
+        assert "b" not in cache
+        assert "c" in cache
+
+    def test_memory_cap(self):
+        cache = DatasetCache(max_bytes=10)
+        cache.put("a", FakeDataset(6))
+        cache.put("b", FakeDataset(6))
+        assert "a" not in cache
+        assert cache.nbytes == 6
+        too_big = cache.put("c", FakeDataset(11))
+        assert isinstance(too_big, FakeDataset)
+        assert "c" not in cache
+        assert len(cache) == 1
@@ -0,0 +1,84 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from deapi.fake_data import FileData
+from deapi.simulated_server.fake_server import FakeServer
+
+
+@pytest.fixture
+def dataset():
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 100, size=(6, 5, 16, 16)).astype(np.uint16)
+
+
+@pytest.fixture
+def npy_file(tmp_path, dataset):
+    path = tmp_path / "data.npy"
+    np.save(path, dataset)
+    return path
+
+
+class TestFileData:
+    def test_npy(self, npy_file, dataset):
+        data = FileData(npy_file)
+        assert isinstance(data.data, np.memmap)
+        assert data.navigator.shape == (6, 5)
+        np.testing.assert_array_equal(data[2, 3], dataset[2, 3])
+        np.testing.assert_array_equal(data.signal[[7, 8, 9]], dataset[1, 2:5])
+
+    def test_raw(self, tmp_path, dataset):
+        path = tmp_path / "data.raw"
+        header = b"\0" * 128
+        path.write_bytes(header + dataset.tobytes())
+        data = FileData(
+            path, scan_shape=(6, 5), dtype=np.uint16, shape=(30, 16, 16), offset=128
+        )
+        np.testing.assert_array_equal(data[5, 4], dataset[5, 4])
+        with pytest.raises(ValueError):
+            FileData(path, dtype=np.uint16, shape=(30, 16, 16), scan_shape=(4, 4))
+        with pytest.raises(ValueError):
+            FileData(path)
+
+    @pytest.mark.parametrize("chunk_frames", [1, 7, 256])
+    def test_streamed_virtual_image(self, npy_file, dataset, chunk_frames):
+        data = FileData(npy_file, chunk_frames=chunk_frames)
+        mask = np.ones((16, 16), dtype=np.int8)
+        mask[4:12, 4:12] = 2
+        mask[:2] = 0
+        image = data.get_virtual_image(mask, method="Difference")
+        expected = dataset[..., 4:12, 4:12].sum(axis=(2, 3)).astype(float)
+        expected -= dataset[..., :2, :].sum(axis=(2, 3))
+        np.testing.assert_allclose(image, expected)
+
+    def test_fake_server(self, npy_file, dataset):
+        server = FakeServer(dataset=npy_file)
+        assert server["Sensor Size X (pixels)"] == "16"
+        assert server["Scan - Size X"] == "6"
+        server["Hardware Binning X"] = 2
+        assert server.fake_data.signal.shape == (30, 8, 16)
+        mask = np.full((8, 16), 2, dtype=np.int8)
+        image = server.fake_data.get_virtual_image(mask)
+        np.testing.assert_allclose(image, dataset.sum(axis=(2, 3)))
+
+    def test_fake_server_properties(self, tmp_path):
+        # a small scan and a large sensor which are outside of the default ranges
+        path = tmp_path / "data.npy"
+        np.save(path, np.zeros((2, 3, 2048, 8), dtype=np.uint16))
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            server = FakeServer(dataset=path)
+        assert server["Scan - Size X"] == "2"
+        assert server["Scan - Size Y"] == "3"
+        assert server["Image Size X (pixels)"] == "2048"
+        assert server["Image Size Y (pixels)"] == "8"
+        assert server.fake_data.signal.shape == (6, 2048, 8)
+        # the properties are set with the setter, so the dependent values follow
+        server["Hardware ROI Offset X"] = 1024
+        assert server["Hardware ROI Size X"] == "1024"
+        assert server.fake_data.signal.shape == (6, 1024, 8)
+
+    def test_missing_dataset(self, tmp_path):
+        with pytest.raises(ValueError):
+            FakeServer(dataset=tmp_path / "missing.npy")
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from deapi.fake_data import TiltGrains
+from deapi.fake_data.grains import KDTREE_SEEDS, voronoi_labels
+
+
+def nearest_distance(shape, seeds, labels):
+    xx, yy = np.indices(shape)
+    distances = (xx[..., None] - seeds[:, 0]) ** 2 + (yy[..., None] - seeds[:, 1]) ** 2
+    chosen = np.take_along_axis(distances, labels[..., None].astype(int), -1)
+    return chosen[..., 0], distances.min(-1)
+
+
+class TestVoronoiLabels:
+    @pytest.mark.parametrize("num_seeds", [1, 4, KDTREE_SEEDS + 1])
+    def test_nearest_seed(self, num_seeds):
+        seeds = np.random.default_rng(0).integers(0, 40, (num_seeds, 2))
+        labels = voronoi_labels((40, 33), seeds, block_size=100)
+        assert labels.shape == (40, 33)
+        assert labels.dtype == np.uint8
+        chosen, nearest = nearest_distance((40, 33), seeds, labels)
+        np.testing.assert_array_equal(chosen, nearest)
+
+    def test_dtype(self):
+        seeds = np.random.default_rng(0).integers(0, 40, (300, 2))
+        assert voronoi_labels((40, 40), seeds).dtype == np.uint16
+
+    def test_no_seeds(self):
+        with pytest.raises(ValueError):
+            voronoi_labels((4, 4), np.empty((0, 2)))
+
+
+class TestTiltGrains:
+    def test_navigator(self):
+        grains = TiltGrains(x_pixels=64, y_pixels=48, kx_pixels=32, ky_pixels=32)
+        assert grains.navigator.shape == (64, 48)
+        assert grains.navigator.dtype == np.uint8
+        # every grain (including grain 0) is present
+        np.testing.assert_array_equal(np.unique(grains.navigator), np.arange(4))
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from deapi.fake_data import NoiseModel
+
+
+class TestNoiseModel:
+    @pytest.fixture
+    def signal(self):
+        signal = np.ones((2, 32, 32), dtype=np.int16)
+        signal[1, :16] = 3  # 3/4 of the electrons land in the top half
+        return signal
+
+    def test_events(self, signal):
+        noise = NoiseModel(dose=0.5, seed=0)
+        frames, pixels = noise.events(signal, [1] * 200)
+        assert np.all(np.diff(frames) >= 0)
+        assert frames.size == pytest.approx(200 * 0.5 * 32 * 32, rel=0.02)
+        top = np.count_nonzero(pixels < 16 * 32) / pixels.size
+        assert top == pytest.approx(0.75, abs=0.01)
+
+    def test_sampling_matches_searchsorted(self, signal):
+        noise = NoiseModel(seed=0)
+        noise._set_signal(signal)
+        uniform = np.sort(np.random.default_rng(1).random(10000))
+        cdf = np.cumsum(signal[1].ravel(), dtype=float)
+        expected = np.searchsorted(cdf / cdf[-1], uniform, side="right")
+        np.testing.assert_array_equal(noise._sample(1, uniform), expected)
+
+    def test_counted(self, signal):
+        noise = NoiseModel(dose=0.2, seed=0)
+        labels = np.zeros((10, 10), dtype=int)
+        labels[5:] = 1
+        counted = noise.counted(signal, labels)
+        assert counted.shape == (10, 10, 32, 32)
+        assert counted.dtype == np.uint8
+        assert counted[:5].mean() == pytest.approx(0.2, rel=0.05)
+        frames, pixels = NoiseModel(dose=0.2, seed=0).events(signal, labels)
+        assert counted.sum() == frames.size
+
+    def test_counted_clipped(self, signal):
+        counted = NoiseModel(dose=1000, seed=0).counted(signal, [0], dtype=np.uint8)
+        assert counted.max() == 255
+
+    def test_integrated(self, signal):
+        noise = NoiseModel(dose=0.1, gain=10, read_noise=2, dark_level=100, seed=0)
+        frames = noise.integrated(signal, [0] * 50)
+        assert frames.dtype == np.uint16
+        assert frames.mean() == pytest.approx(100 + 10 * 0.1, rel=0.01)
+        assert frames.std() > 2
+
+    def test_seed(self, signal):
+        a = NoiseModel(seed=3).integrated(signal, [0, 1])
+        b = NoiseModel(seed=3).integrated(signal, [0, 1])
+        np.testing.assert_array_equal(a, b)
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from deapi.fake_data import TiltGrains, VirtualImageEngine
+
+
+class TestVirtualImageEngine:
+    @pytest.fixture
+    def data(self):
+        return TiltGrains(x_pixels=8, y_pixels=8, kx_pixels=32, ky_pixels=32)
+
+    @pytest.fixture
+    def masks(self):
+        rng = np.random.default_rng(0)
+        return [rng.integers(0, 3, size=(32, 32)).astype(np.int8) for _ in range(3)]
+
+    @pytest.mark.parametrize("method", ["Sum", "Difference"])
+    def test_matches_direct_sum(self, data, masks, method):
+        mask = masks[0]
+        s = data.signal.astype(float)
+        expected = np.sum(s * (mask == 2), axis=(1, 2))
+        if method == "Difference":
+            expected -= np.sum(s * (mask == 0), axis=(1, 2))
+        image = data.get_virtual_image(mask, method=method)
+        np.testing.assert_allclose(image, expected[data.navigator])
+
+    def test_single_pass_and_cached(self, data, masks, monkeypatch):
+        engine = data.virtual_image_engine
+        images = data.get_virtual_images(masks, ["Sum", "Difference", "Sum"])
+        assert len(images) == 3
+        assert len(engine) == 3
+
+        def fail(*args, **kwargs):
+            raise AssertionError("masks should not be recomputed")
+
+        monkeypatch.setattr(VirtualImageEngine, "weights", fail)
+        again = data.get_virtual_images(
+            [m.copy() for m in masks], ["Sum", "Difference", "Sum"]
+        )
+        for a, b in zip(images, again):
+            np.testing.assert_array_equal(a, b)
+
+    def test_resized_mask(self, data):
+        mask = np.full((64, 64), 2, dtype=np.int8)
+        image = data.get_virtual_image(mask)
+        expected = data.signal.sum(axis=(1, 2))[data.navigator]
+        np.testing.assert_allclose(image, expected)
+
+    def test_bad_method(self, data, masks):
+        with pytest.raises(ValueError):
+            data.get_virtual_image(masks[0], method="Centroid X")
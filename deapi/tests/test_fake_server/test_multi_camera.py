@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from deapi import Client
+from deapi.simulated_server.clock import ManualClock
+from deapi.simulated_server.multi_camera import MultiCameraServer
+
+
+def command(command_id, camera="", params=None):
+    packet = Client()._addSingleCommand(command_id, None, params)
+    packet.camera_name = camera
+    return packet
+
+
+class TestMultiCameraServer:
+    @pytest.fixture
+    def server(self):
+        return MultiCameraServer(["Camera A", "Camera B"], clock=ManualClock())
+
+    def test_list_cameras(self, server):
+        response = server._respond_to_command(command(Client.LIST_CAMERAS))
+        names = [p.p_string for p in response[0].acknowledge[0].parameter]
+        assert names == ["Camera A", "Camera B"]
+        assert server["Camera B"]["Camera Name"] == "Camera B"
+
+    def test_independent_properties(self, server):
+        server._respond_to_command(
+            command(Client.SET_PROPERTY, "Camera B", ["Frames Per Second", 10])
+        )
+        assert float(server["Camera B"]["Frames Per Second"]) == 10
+        assert float(server["Camera A"]["Frames Per Second"]) != 10
+        # commands without a camera name go to the first camera
+        server._respond_to_command(
+            command(Client.SET_PROPERTY, "", ["Frames Per Second", 20])
+        )
+        assert float(server["Camera A"]["Frames Per Second"]) == 20
+        assert float(server["Camera B"]["Frames Per Second"]) == 10
+
+    def test_independent_acquisitions(self, server):
+        for name, fps in [("Camera A", 10), ("Camera B", 1)]:
+            server[name]["Frames Per Second"] = fps
+            server[name]["Scan - Enable"] = "On"
+            server[name]["Scan - Size X"] = 4
+            server[name]["Scan - Size Y"] = 4
+        server._respond_to_command(
+            command(Client.START_ACQUISITION, "Camera A", [1, False])
+        )
+        assert server["Camera A"].acquisition_status == "Acquiring"
+        assert server["Camera B"].acquisition_status == "Idle"
+        server._respond_to_command(
+            command(Client.START_ACQUISITION, "Camera B", [1, False])
+        )
+        server.clock.step(2)
+        assert server["Camera A"].acquisition_status == "Idle"
+        assert server["Camera B"].acquisition_status == "Acquiring"
+        assert server["Camera A"].fake_data is not server["Camera B"].fake_data
+
+    def test_seeds(self):
+        server = MultiCameraServer(["Camera A", "Camera B"], seed=5)
+        assert [server[name].seed for name in server.camera_names] == [5, 6]
+
+    def test_same_file_different_roi(self, tmp_path):
+        path = tmp_path / "data.npy"
+        np.save(path, np.arange(2 * 3 * 16 * 16, dtype=np.uint16).reshape(2, 3, 16, 16))
+        server = MultiCameraServer(["Camera A", "Camera B"], dataset=str(path))
+        server["Camera A"]["Hardware ROI Size X"] = 8
+        server["Camera A"]["Hardware ROI Size Y"] = 16
+        server["Camera B"]["Hardware Binning X"] = 2
+        server["Camera B"]["Hardware Binning Y"] = 2
+        assert server["Camera A"].fake_data[0, 0].shape == (8, 16)
+        assert server["Camera B"].fake_data[0, 0].shape == (8, 8)
+
+    def test_unknown_camera(self, server):
+        response = server._respond_to_command(command(Client.GET_PROPERTY, "Nope"))
+        assert response[0].acknowledge[0].error
@@ -0,0 +1,64 @@
+import time
+
+import numpy as np
+import pytest
+
+from deapi.simulated_server.network import NetworkConditions, PROFILES
+
+
+class RecordingSocket:
+    def __init__(self):
+        self.chunks = []
+
+    def sendall(self, data):
+        self.chunks.append(bytes(data))
+
+
+class TestNetworkConditions:
+    def test_ideal(self):
+        network = NetworkConditions()
+        assert network.is_ideal
+        conn = RecordingSocket()
+        network.send_response(conn, [b"abc", b"defg"])
+        assert conn.chunks == [b"abc", b"defg"]
+
+    def test_fragments(self):
+        network = NetworkConditions(fragment_size=3)
+        conn = RecordingSocket()
+        data = np.arange(4, dtype=np.uint16)
+        network.send_response(conn, [b"header", data])
+        assert all(len(c) <= 3 for c in conn.chunks)
+        assert b"".join(conn.chunks) == b"header" + data.tobytes()
+
+    def test_bandwidth(self):
+        network = NetworkConditions(bandwidth=100_000)
+        conn = RecordingSocket()
+        tick = time.perf_counter()
+        network.send_response(conn, [bytes(5000)])
+        assert time.perf_counter() - tick >= 0.045
+
+    def test_latency(self):
+        network = NetworkConditions(latency=0.02, jitter=0.01, seed=0)
+        assert 0.02 <= network.response_delay() <= 0.03
+        conn = RecordingSocket()
+        tick = time.perf_counter()
+        network.send_response(conn, [b"abc"])
+        assert time.perf_counter() - tick >= 0.02
+        assert conn.chunks == [b"abc"]
+
+    def test_congestion(self):
+        network = NetworkConditions(congestion_probability=1, congestion_delay=0.5)
+        assert network.response_delay() == 0.5
+
+    @pytest.mark.parametrize("profile", list(PROFILES))
+    def test_profiles(self, profile):
+        network = NetworkConditions.from_profile(profile, latency=0)
+        assert network.latency == 0
+
+    def test_bad_arguments(self):
+        with pytest.raises(ValueError):
+            NetworkConditions(bandwidth=0)
+        with pytest.raises(ValueError):
+            NetworkConditions(fragment_size=-1)
+        with pytest.raises(ValueError):
+            NetworkConditions.from_profile("dial-up")
@@ -0,0 +1,93 @@
+import socket
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from deapi import Client
+from deapi.recording import (
+    PACKET,
+    PAYLOAD,
+    RECEIVED,
+    SENT,
+    SessionRecorder,
+    read_session,
+    split_exchanges,
+)
+from deapi.simulated_server.replay_server import ReplayServer
+
+
+def run_session(c, port):
+    c.usingMmf = False
+    c.connect(port=port)
+    try:
+        c["Frames Per Second"] = 1000
+        c.scan(size_x=4, size_y=4, enable="On")
+        c.virtual_masks[1][:] = 2
+        c.start_acquisition(1)
+        deadline = time.perf_counter() + 10
+        while c.acquiring:
+            if time.perf_counter() > deadline:
+                raise TimeoutError("The acquisition did not finish")
+            time.sleep(0.01)
+        return c.get_result("virtual_image1")[0]
+    finally:
+        # the servers only serve one connection at a time
+        c.disconnect()
+
+
+class TestSessionLog:
+    def test_round_trip(self, tmp_path):
+        path = tmp_path / "session.delog"
+        with SessionRecorder(path) as recorder:
+            recorder.record(SENT, PACKET, b"abcd")
+            recorder.record(SENT, PAYLOAD, np.ones(3, dtype=np.int8))
+            recorder.record(RECEIVED, PACKET, b"efgh")
+            recorder.record(SENT, PACKET, b"ijkl")
+        records = read_session(path)
+        assert [r.data for r in records] == [b"abcd", b"\x01\x01\x01", b"efgh", b"ijkl"]
+        assert records[0].timestamp <= records[-1].timestamp
+        exchanges = split_exchanges(records)
+        assert len(exchanges) == 2
+        assert len(exchanges[0][0]) == 2
+        assert len(exchanges[0][1]) == 1
+
+    def test_bad_file(self, tmp_path):
+        path = tmp_path / "session.delog"
+        path.write_bytes(b"not a session")
+        with pytest.raises(ValueError):
+            read_session(path)
+
+
+class TestReplayServer:
+    def test_record_and_replay(self, client, tmp_path):
+        # the pydeserver only serves one connection at a time
+        client.disconnect()
+        try:
+            path = tmp_path / "session.delog"
+            recorded = Client()
+            recorded.start_recording(path)
+            image = run_session(recorded, client.port)
+            assert recorded.recorder is None
+
+            server = ReplayServer(path, max_speed=True)
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as listener:
+                listener.bind(("127.0.0.1", 0))
+                listener.listen()
+                port = listener.getsockname()[1]
+
+                def serve():
+                    conn, _ = listener.accept()
+                    with conn:
+                        server.serve(conn)
+
+                thread = threading.Thread(target=serve, daemon=True)
+                thread.start()
+                replayed_image = run_session(Client(), port)
+                thread.join(10)
+        finally:
+            # the fixture is shared with the other tests in the module
+            client.connect(port=client.port)
+        assert server.finished
+        np.testing.assert_array_equal(image, replayed_image)
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from deapi.simulated_server.clock import ManualClock
+from deapi.simulated_server.fake_server import FakeServer
+from deapi.simulated_server.scan_patterns import ScanPattern
+from deapi.tests.test_fake_server.test_server import start_acquisition
+
+
+class TestScanPattern:
+    def test_raster(self):
+        pattern = ScanPattern.raster((3, 4))
+        np.testing.assert_array_equal(pattern.positions, np.arange(12))
+        assert pattern.index(5) == (1, 1)
+        assert pattern.index(12) == (0, 0)
+
+    def test_serpentine(self):
+        pattern = ScanPattern.serpentine((3, 3))
+        np.testing.assert_array_equal(pattern.positions, [0, 1, 2, 5, 4, 3, 6, 7, 8])
+
+    def test_interlaced(self):
+        pattern = ScanPattern.raster_interlaced((3, 2))
+        np.testing.assert_array_equal(pattern.positions, [0, 1, 4, 5, 2, 3])
+        pattern = ScanPattern.serpentine_interlaced((3, 2))
+        np.testing.assert_array_equal(pattern.positions, [0, 1, 4, 5, 3, 2])
+
+    def test_random_subsampled(self):
+        pattern = ScanPattern.random((10, 10), fraction=0.25, seed=0)
+        assert len(pattern) == 25
+        assert len(np.unique(pattern.positions)) == 25
+        assert pattern.subsampling_mask().sum() == 25
+        assert pattern.subsampling_mask(10).sum() == 10
+        with pytest.raises(ValueError):
+            ScanPattern.random((10, 10), fraction=0)
+
+    def test_from_coordinates(self):
+        pattern = ScanPattern.from_coordinates([[0, 1], [2, 2]], (3, 3))
+        np.testing.assert_array_equal(pattern.positions, [1, 8])
+        with pytest.raises(ValueError):
+            ScanPattern.from_coordinates([[3, 0]], (3, 3))
+
+
+class TestFakeServerScanPatterns:
+    @pytest.fixture
+    def server(self):
+        server = FakeServer(clock=ManualClock())
+        server["Hardware ROI Size X"] = 32
+        server["Hardware ROI Size Y"] = 32
+        server["Scan - Enable"] = "On"
+        server["Scan - Size X"] = 4
+        server["Scan - Size Y"] = 4
+        server["Frames Per Second"] = 1
+        return server
+
+    def test_serpentine_index(self, server):
+        server["Scan - Type"] = "Serpentine"
+        start_acquisition(server)
+        server.clock.step(5.5)
+        assert server.current_navigation_index == (1, 2)
+
+    def test_subsampled_scan(self, server):
+        server["Scan - Type"] = "Random"
+        server["Scan - Subsampling Fraction"] = 0.5
+        server.virtual_masks[1][:] = 2
+        start_acquisition(server)
+        assert server.end_time == 8  # only half of the positions are visited
+        server.clock.step(3.5)
+        mask = server.scan_pattern.subsampling_mask(server._positions_visited())
+        assert mask.sum() == 4
+        image = server._virtual_images()[1]
+        np.testing.assert_array_equal(image != 0, mask == 1)
+        server.clock.step(10)
+        image = server._virtual_images()[1]
+        assert np.count_nonzero(image) == 8
+
+    def test_custom_scan(self, server):
+        server["Scan - Type"] = "XY File"
+        server.custom_scan_positions = [[3, 3], [0, 0]]
+        start_acquisition(server)
+        assert len(server.scan_pattern) == 2
+        assert server.current_navigation_index == (3, 3)
@@ -1,5 +1,10 @@
+import time
+
+import numpy as np
 import pytest
 
+from deapi import Client, MovieBufferStatus, masks
+from deapi.simulated_server.clock import ManualClock, ScaledClock
 from deapi.simulated_server.fake_server import FakeServer
 
 
@@ -33,3 +38,311 @@ class TestFakeServer:
 
     def test_server_software_version(self, fake_server):
         assert fake_server["Server Software Version"] == "3.7.8893"
+
+    def test_dataset_cache(self, fake_server):
+        FakeServer.dataset_cache.clear()
+        fake_server._initialize_data(8, 8, 64, 64)
+        data = fake_server.fake_data
+        other = FakeServer()
+        other._initialize_data(8, 8, 64, 64)
+        assert other.fake_data is not data
+        assert other.fake_data.navigator is data.navigator
+        assert data.server is fake_server
+        assert other.fake_data.server is other
+        view = other.fake_data
+        other._initialize_data(8, 8, 64, 64)
+        assert other.fake_data is view
+        other._initialize_data(8, 16, 64, 64)
+        assert other.fake_data.navigator.shape == (8, 16)
+        assert view.server is None
+
+    def test_dataset_cache_binning(self):
+        FakeServer.dataset_cache.clear()
+        servers = [FakeServer(), FakeServer()]
+        for server, binning in zip(servers, [1, 2]):
+            server["Hardware ROI Size X"] = 64
+            server["Hardware ROI Size Y"] = 64
+            server["Hardware Binning X"] = binning
+            server["Hardware Binning Y"] = binning
+            server._initialize_data(4, 4, 64, 64)
+        assert len(FakeServer.dataset_cache) == 1
+        for server, size in zip(servers, [64, 32]):
+            assert server.fake_data[0, 0].shape == (size, size)
+            assert server.fake_data.signal.shape[1:] == (size, size)
+
+    def test_signal_cached_until_roi_changes(self, fake_server):
+        fake_server._initialize_data(4, 4, 64, 64)
+        data = fake_server.fake_data
+        fake_server["Hardware ROI Size X"] = 64
+        fake_server["Hardware ROI Size Y"] = 64
+        signal = data.signal
+        assert data.signal is signal
+        fake_server["Frames Per Second"] = 100
+        assert data.signal is signal
+        fake_server["Hardware Binning X"] = 2
+        binned = data.signal
+        assert binned is not signal
+        assert binned.shape == (signal.shape[0], 32, 64)
+
+    def test_progressive_virtual_image(self):
+        clock = ManualClock()
+        fake_server = FakeServer(clock=clock)
+        fake_server["Hardware ROI Size X"] = 64
+        fake_server["Hardware ROI Size Y"] = 64
+        fake_server["Scan - Enable"] = "On"
+        fake_server["Scan - Size X"] = 4
+        fake_server["Scan - Size Y"] = 4
+        fake_server["Frames Per Second"] = 1
+        fake_server._initialize_data(4, 4, 64, 64)
+        fake_server.virtual_masks[1] = np.full((64, 64), 2, dtype=np.int8)
+        start_acquisition(fake_server)
+        clock.step(5.5)  # 6 positions visited
+        partial = fake_server._virtual_images()[1].copy()
+        assert np.count_nonzero(partial) == 6
+        assert np.all(partial.ravel()[6:] == 0)
+
+        clock.step(100)  # acquisition finished
+        full = fake_server._virtual_images()[1]
+        assert np.count_nonzero(full) == 16
+        np.testing.assert_array_equal(full.ravel()[:6], partial.ravel()[:6])
+
+    def test_progressive_virtual_image_repeats(self):
+        clock = ManualClock()
+        fake_server = FakeServer(clock=clock)
+        fake_server["Hardware ROI Size X"] = 64
+        fake_server["Hardware ROI Size Y"] = 64
+        fake_server["Scan - Enable"] = "On"
+        fake_server["Scan - Size X"] = 4
+        fake_server["Scan - Size Y"] = 4
+        fake_server["Frames Per Second"] = 1
+        fake_server._initialize_data(4, 4, 64, 64)
+        fake_server.virtual_masks[1] = np.full((64, 64), 2, dtype=np.int8)
+        start_acquisition(fake_server, 2)
+        clock.step(13.5)  # 14 positions of the first repeat
+        first = fake_server._virtual_images()[1].copy()
+        assert np.count_nonzero(first) == 14
+        clock.step(6)  # 4 positions of the second repeat
+        second = fake_server._virtual_images()[1].copy()
+        assert np.count_nonzero(second) == 4
+        np.testing.assert_array_equal(second.ravel()[:4], first.ravel()[:4])
+        clock.step(4)
+        assert np.count_nonzero(fake_server._virtual_images()[1]) == 8
+        clock.step(100)  # acquisition finished
+        assert np.count_nonzero(fake_server._virtual_images()[1]) == 16
+
+    def test_progressive_virtual_image_skipped_repeat(self):
+        clock = ManualClock()
+        fake_server = FakeServer(clock=clock)
+        fake_server["Hardware ROI Size X"] = 64
+        fake_server["Hardware ROI Size Y"] = 64
+        fake_server["Scan - Enable"] = "On"
+        fake_server["Scan - Size X"] = 4
+        fake_server["Scan - Size Y"] = 4
+        fake_server["Frames Per Second"] = 1
+        fake_server._initialize_data(4, 4, 64, 64)
+        fake_server.virtual_masks[1] = np.full((64, 64), 2, dtype=np.int8)
+        start_acquisition(fake_server, 4)
+        clock.step(5.5)  # 6 positions of the first repeat
+        assert np.count_nonzero(fake_server._virtual_images()[1]) == 6
+        clock.step(20)  # more than a whole repeat later, 10 positions of the second
+        assert fake_server._progressive_images[1]["repeat"] == 0
+        second = fake_server._virtual_images()[1]
+        assert np.count_nonzero(second) == 10
+        assert fake_server._progressive_images[1]["repeat"] == 1
+        clock.step(17)  # 11 positions of the third repeat
+        assert np.count_nonzero(fake_server._virtual_images()[1]) == 11
+        clock.step(100)  # acquisition finished
+        assert np.count_nonzero(fake_server._virtual_images()[1]) == 16
+
+    @pytest.mark.parametrize("frame_type", [3, 7])
+    def test_integrated_noise(self, frame_type):
+        frames = {}
+        for noise in [False, True]:
+            server = FakeServer(integrated_noise=noise)
+            server["Hardware ROI Size X"] = 64
+            server["Hardware ROI Size Y"] = 64
+            server._initialize_data(4, 4, 64, 64)
+            frames[noise] = get_result(server, frame_type, (64, 64))
+        noiseless = server.fake_data[server.current_navigation_index].T
+        if frame_type < 7:
+            noiseless = server.references.raw(noiseless)
+        np.testing.assert_array_equal(frames[False], noiseless)
+        assert frames[True].shape == noiseless.shape
+        if frame_type == 7:
+            noise = server.noise
+            expected = noise.dark_level + noise.gain * noise.dose
+            assert frames[True].mean() == pytest.approx(expected, abs=0.5)
+            assert frames[True].std() >= noise.read_noise * 0.9
+        else:
+            assert not np.array_equal(frames[True], noiseless)
+
+
+class TestFrameLayout:
+    def test_asymmetric_frame(self, tmp_path):
+        # (scan x, scan y, x, y) frames which are served as (height, width) = (y, x)
+        rng = np.random.default_rng(0)
+        path = tmp_path / "data.npy"
+        np.save(path, rng.integers(0, 1000, (4, 5, 8, 4), dtype=np.uint16))
+        server = FakeServer(dataset=str(path), clock=ManualClock())
+        server["Frames Per Second"] = 1
+        server["Grab Buffer Size"] = 32
+        server["Scan - Enable"] = "On"
+        assert server["Image Size X (pixels)"] == "8"
+        assert server["Image Size Y (pixels)"] == "4"
+        mask = np.zeros((4, 8), dtype=np.int8)
+        mask[1, 5:] = 2
+        mask[3, 0] = 2
+        server.virtual_masks[1] = mask
+        command = Client()._addSingleCommand(Client.START_ACQUISITION, None, [1, True])
+        server._respond_to_command(command)
+        server.clock.step(100)
+
+        last = len(server.scan_pattern) - 1
+        position = server.scan_pattern.positions[last]
+        frame = get_result(server, 7, (4, 8))
+        np.testing.assert_array_equal(
+            frame, np.load(path).reshape(20, 8, 4)[position].T
+        )
+
+        command = Client()._addSingleCommand(Client.GET_MOVIE_BUFFER, None, [1000])
+        response = server._respond_to_command(command)
+        layout = server._movie_buffer_layout()
+        frames = np.frombuffer(response[1], np.uint16, offset=layout["header_bytes"])
+        np.testing.assert_array_equal(frames.reshape(-1, 4, 8)[last], frame)
+
+        np.testing.assert_array_equal(get_result(server, 13, (4, 8), 1, np.int8), mask)
+        image = get_result(server, 18, (5, 4)).ravel()
+        assert image[position] == np.sum(frame * masks.weights(mask))
+
+
+def get_result(server, frame_type, shape, pixel_format=13, dtype=np.float32):
+    params = [frame_type, pixel_format, 0, 0, 1.0, shape[1], shape[0]]
+    command = Client()._addSingleCommand(
+        Client.GET_RESULT, None, params + [0, 0, 0.0, 0.0, 1.0, 2.0, 0, 0, 0, 256]
+    )
+    response = server._respond_to_command(command)
+    return np.frombuffer(response[-1], dtype=dtype).reshape(shape)
+
+
+def start_acquisition(server, number_of_acquisitions=1):
+    command = Client()._addSingleCommand(
+        Client.START_ACQUISITION, None, [number_of_acquisitions, False]
+    )
+    return server._respond_to_command(command)
+
+
+class TestClocks:
+    def test_manual_clock_acquisition(self):
+        clock = ManualClock()
+        server = FakeServer(clock=clock)
+        server["Frames Per Second"] = 10
+        server["Scan - Enable"] = "On"
+        server["Scan - Size X"] = 4
+        server["Scan - Size Y"] = 4
+        start_acquisition(server)
+        assert server.acquisition_status == "Acquiring"
+        clock.step(0.55)
+        assert server.current_navigation_index == (1, 1)
+        clock.step(1.1)
+        assert server.acquisition_status == "Idle"
+        assert server.current_navigation_index == (3, 3)
+
+    def test_scaled_clock(self):
+        clock = ScaledClock(1000)
+        t0 = clock.time()
+        time.sleep(0.01)
+        assert clock.time() - t0 >= 10
+        with pytest.raises(ValueError):
+            ScaledClock(0)
+
+    def test_manual_clock_sleep(self):
+        clock = ManualClock(start=10)
+        clock.sleep(2)
+        assert clock.time() == 12
+        with pytest.raises(ValueError):
+            clock.step(-1)
+
+
+class TestMovieBuffer:
+    @pytest.fixture
+    def server(self):
+        server = FakeServer(clock=ManualClock())
+        server["Hardware ROI Size X"] = 32
+        server["Hardware ROI Size Y"] = 32
+        server["Scan - Enable"] = "On"
+        server["Scan - Size X"] = 4
+        server["Scan - Size Y"] = 5
+        server["Frames Per Second"] = 100
+        server["Grab Buffer Size"] = 8
+        return server
+
+    def get_movie_buffer(self, server, timeout=5000):
+        command = Client()._addSingleCommand(Client.GET_MOVIE_BUFFER, None, [timeout])
+        response = server._respond_to_command(command)
+        values = [p.p_int for p in response[0].acknowledge[0].parameter]
+        return values, response[1:]
+
+    def test_not_requested(self, server):
+        start_acquisition(server)
+        values, data = self.get_movie_buffer(server)
+        assert values[0] == MovieBufferStatus.FAILED.value
+        assert data == ()
+
+    def test_movie_buffer_frames(self, server):
+        command = Client()._addSingleCommand(Client.START_ACQUISITION, None, [1, True])
+        server._respond_to_command(command)
+        command = Client()._addSingleCommand(Client.GET_MOVIE_BUFFER_INFO, None, None)
+        info = server._respond_to_command(command)[0].acknowledge[0].parameter
+        header_bytes, image_bytes, index_start, image_start, w, h, n, dtype = [
+            p.p_int for p in info
+        ]
+        assert index_start > 0
+        assert image_start == header_bytes
+        assert image_bytes == n * w * h * 2
+
+        frames = []
+        indexes = []
+        while True:
+            values, data = self.get_movie_buffer(server)
+            if values[0] != MovieBufferStatus.OK.value:
+                break
+            status, total_bytes, num_frames = values
+            buffer = data[0]
+            assert len(buffer) == total_bytes
+            indexes.append(
+                np.frombuffer(buffer, np.uint32, count=num_frames, offset=index_start)
+            )
+            frames.append(
+                np.frombuffer(buffer, np.uint16, offset=image_start).reshape(-1, h, w)
+            )
+        assert values[0] == MovieBufferStatus.FINISHED.value
+        assert [len(f) for f in frames] == [8, 8, 4]
+        np.testing.assert_array_equal(np.concatenate(indexes), np.arange(20))
+        frames = np.concatenate(frames)
+        # the frames are (height, width) and the signal is (x, y)
+        np.testing.assert_array_equal(frames[7], server.fake_data[(1, 2)].T)
+
+    def test_movie_buffer_non_square(self, server):
+        server["Hardware ROI Size Y"] = 16
+        assert server["Image Size X (pixels)"] == "32"
+        assert server["Image Size Y (pixels)"] == "16"
+        command = Client()._addSingleCommand(Client.START_ACQUISITION, None, [1, True])
+        server._respond_to_command(command)
+        command = Client()._addSingleCommand(Client.GET_MOVIE_BUFFER_INFO, None, None)
+        info = server._respond_to_command(command)[0].acknowledge[0].parameter
+        image_start, w, h = [p.p_int for p in info][3:6]
+        assert (w, h) == (32, 16)
+        values, data = self.get_movie_buffer(server)
+        frames = np.frombuffer(data[0], np.uint16, offset=image_start)
+        frames = frames.reshape(values[2], h, w)
+        np.testing.assert_array_equal(frames[5], server.fake_data[(1, 1)].T)
+
+    def test_timeout(self, server):
+        server["Frames Per Second"] = 1
+        command = Client()._addSingleCommand(Client.START_ACQUISITION, None, [1, True])
+        server._respond_to_command(command)
+        values, data = self.get_movie_buffer(server, timeout=1000)
+        assert values[0] == MovieBufferStatus.TIMEOUT.value
+        values, data = self.get_movie_buffer(server, timeout=10000)
+        assert values[0] == MovieBufferStatus.OK.value
+        assert values[2] == 8
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from deapi.simulated_server.virtual_masks import VirtualMaskStore
+
+
+class TestVirtualMaskStore:
+    def test_lazy(self):
+        store = VirtualMaskStore((64, 32))
+        assert len(store) == 5
+        mask = store.get(0)
+        assert mask.shape == (64, 32)
+        assert mask.strides == (0, 0)  # not allocated
+        np.testing.assert_array_equal(store.resized(0, (16, 16)), 0)
+
+    def test_get_read_only(self):
+        store = VirtualMaskStore((8, 8))
+        store[1] = np.full((8, 8), 2)
+        assert store.get(1).dtype == np.int8
+        with pytest.raises(ValueError):
+            store.get(1)[0, 0] = 1
+
+    def test_modify_in_place(self):
+        store = VirtualMaskStore((8, 8))
+        version = store.version(2)
+        store[2][:4] = 2
+        assert store.version(2) > version
+        np.testing.assert_array_equal(store.get(2)[:4], 2)
+        np.testing.assert_array_equal(store.get(2)[4:], 0)
+
+    def test_resized_cache(self):
+        store = VirtualMaskStore((64, 64))
+        store[0] = np.full((64, 64), 2)
+        first = store.resized(0, (16, 16))
+        assert first.shape == (16, 16)
+        np.testing.assert_array_equal(first, 2)
+        assert store.resized(0, (16, 16)) is first
+        assert store.resized(0, (64, 64)).shape == (64, 64)
+
+        store[0] = np.ones((64, 64))
+        second = store.resized(0, (16, 16))
+        assert second is not first
+        np.testing.assert_array_equal(second, 1)
+
+    def test_resized_eviction(self):
+        store = VirtualMaskStore((32, 32), max_resized=2)
+        store[0] = np.full((32, 32), 2)
+        first = store.resized(0, (8, 8))
+        store.resized(0, (4, 4))
+        store.resized(0, (2, 2))
+        assert len(store._resized) == 2
+        assert store.resized(0, (8, 8)) is not first
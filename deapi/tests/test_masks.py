@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from skimage.draw import disk as draw_disk
+
+from deapi import masks
+
+
+class TestMasks:
+    def test_disk(self):
+        mask = masks.disk((64, 48), 10)
+        assert mask.shape == (64, 48)
+        assert mask.dtype == np.int8
+        expected = np.ones((64, 48), dtype=np.int8)
+        expected[draw_disk((32, 24), 10)] = 2
+        np.testing.assert_array_equal(mask, expected)
+
+    def test_cached(self):
+        first = masks.disk((32, 32), 5, center=(10, 12))
+        assert masks.disk((32, 32), 5, center=(10, 12)) is first
+        with pytest.raises(ValueError):
+            first[0, 0] = 2
+
+    def test_annulus(self):
+        mask = masks.annulus((65, 65), 10, 20)
+        assert mask[32, 32] == 1
+        assert mask[32, 32 + 15] == 2
+        assert mask[32, 32 + 20] == 1
+        assert set(np.unique(mask)) == {1, 2}
+        with pytest.raises(ValueError):
+            masks.annulus((65, 65), 20, 10)
+
+    def test_sector(self):
+        mask = masks.sector((65, 65), 0, np.pi / 2)
+        assert mask[40, 40] == 2  # +x and +y
+        assert mask[20, 40] == 1
+        assert mask[40, 20] == 1
+        # wrapping around zero
+        mask = masks.sector((65, 65), 3 * np.pi / 2, np.pi / 2)
+        assert mask[40, 40] == 2
+        assert mask[20, 40] == 2
+        assert mask[40, 20] == 1
+        # a full circle
+        assert np.all(masks.sector((8, 8), 0, 2 * np.pi) == 2)
+
+    @pytest.mark.parametrize("count", [1, 2, 3, 4, 8])
+    def test_segments(self, count):
+        segments = masks.segments((64, 64), count, inner_radius=4, outer_radius=30)
+        assert len(segments) == count
+        covered = sum((s == 2).astype(int) for s in segments)
+        # the segments cover the annulus exactly once
+        np.testing.assert_array_equal(
+            covered, (masks.annulus((64, 64), 4, 30) == 2).astype(int)
+        )
+
+    def test_difference(self):
+        left, right = masks.segments((32, 32), 2, rotation=np.pi / 2)
+        dpc = masks.difference(right, left)
+        assert dpc[16, 30] == 2
+        assert dpc[16, 2] == 0
+        assert set(np.unique(dpc)) == {0, 2}
+
+    def test_client_shape(self, client):
+        shape = masks.detector_shape(client)
+        assert shape == (
+            client["Image Size Y (pixels)"],
+            client["Image Size X (pixels)"],
+        )
+        assert masks.disk(client, 10).shape == shape
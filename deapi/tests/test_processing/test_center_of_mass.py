@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from deapi import masks
+from deapi.processing import CenterOfMass, FrameBatch, array_frames, run_pipeline
+
+
+class TestCenterOfMass:
+    def test_matches_numpy(self):
+        rng = np.random.default_rng(1)
+        frames = rng.poisson(5, size=(4, 3, 20, 24)).astype(np.uint16)
+        stage = CenterOfMass((20, 24), (4, 3), threads=2)
+        (result,) = run_pipeline(array_frames(frames, batch_size=5), [stage])
+        y, x = np.mgrid[0:20, 0:24]
+        intensity = frames.sum(axis=(2, 3))
+        np.testing.assert_allclose(result.intensity, intensity)
+        com_y = (frames * (y - 10)).sum(axis=(2, 3)) / intensity
+        com_x = (frames * (x - 12)).sum(axis=(2, 3)) / intensity
+        np.testing.assert_allclose(result.com_y, com_y, rtol=1e-4, atol=1e-4)
+        np.testing.assert_allclose(result.com_x, com_x, rtol=1e-4, atol=1e-4)
+        assert result.segments is None
+
+    @pytest.mark.parametrize(
+        "pixel, expected",
+        [
+            ((16, 26), (0, 1)),
+            ((26, 16), (1, 0)),
+            ((16, 6), (0, -1)),
+            ((6, 16), (-1, 0)),
+        ],
+    )
+    def test_dpc(self, pixel, expected):
+        frames = np.zeros((1, 32, 32), dtype=np.uint16)
+        frames[(0,) + pixel] = 10
+        stage = CenterOfMass((32, 32), 1, segments=4, rotation=-np.pi / 4)
+        stage.process(FrameBatch(frames, np.array([0])))
+        result = stage.result()
+        np.testing.assert_allclose(result.com_y, [pixel[0] - 16])
+        np.testing.assert_allclose(result.com_x, [pixel[1] - 16])
+        assert result.segments.shape == (4, 1)
+        assert result.segments.sum() == 10
+        np.testing.assert_allclose(result.dpc_y, [expected[0]], atol=1e-6)
+        np.testing.assert_allclose(result.dpc_x, [expected[1]], atol=1e-6)
+
+    def test_mask(self):
+        frames = np.zeros((2, 32, 32), dtype=np.uint16)
+        frames[:, 16, 18] = 1
+        frames[1, 0, 0] = 100  # outside of the mask
+        stage = CenterOfMass((32, 32), 3, mask=masks.disk((32, 32), 8))
+        stage.process(FrameBatch(frames, np.array([0, 1])))
+        result = stage.result()
+        np.testing.assert_allclose(result.com_x, [2, 2, 0])
+        np.testing.assert_allclose(result.intensity, [1, 1, 0])
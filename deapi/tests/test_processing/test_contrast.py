@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from deapi import Attributes, ContrastStretchType, Histogram
+from deapi.processing import (
+    ContrastStretch,
+    StretchLimits,
+    apply_stretch,
+    histogram,
+    stretch_limits,
+)
+from deapi.processing.contrast import subsample
+
+
+@pytest.fixture
+def image():
+    rng = np.random.default_rng(4)
+    return rng.normal(1000, 100, size=(256, 256)).clip(0).astype(np.uint16)
+
+
+class TestContrast:
+    def test_subsample(self, image):
+        assert subsample(image, None).size == image.size
+        for max_samples in [1, 10, 1000, 4096, 30000]:
+            sample = subsample(image, max_samples)
+            assert max_samples / 4 < sample.size <= max_samples
+            assert np.shares_memory(sample, image)
+        assert subsample(np.arange(1000), 10).size == 10
+        assert subsample(np.zeros((3, 5000)), 100).size <= 100
+
+    def test_subsample_columns(self):
+        # every column has a different value, so the sampled columns are counted
+        image = np.tile(np.arange(1024, dtype=np.uint16), (1024, 1))
+        for max_samples in [64, 1024, 4096]:
+            sample = subsample(image, max_samples)
+            assert len(np.unique(sample)) >= np.sqrt(max_samples) / 2
+        limits = stretch_limits(image, max_samples=64)
+        assert limits.min < 100
+        assert limits.max > 800
+
+    def test_histogram(self, image):
+        result = histogram(image, bins=32, value_range=(500, 1500))
+        assert isinstance(result, Histogram)
+        expected, _ = np.histogram(image.clip(500, 1499), bins=32, range=(500, 1500))
+        np.testing.assert_array_equal(result.data, expected)
+        assert 14 <= result.upperMostLocalMaxima <= 18
+        # the range of the image by default
+        assert histogram(image).min == image.min()
+        sampled = histogram(image, bins=32, value_range=(500, 1500), max_samples=4096)
+        assert sum(sampled.data) <= 4096
+
+    @pytest.mark.parametrize("stretch_type", list(ContrastStretchType))
+    def test_stretch_types(self, image, stretch_type):
+        limits = stretch_limits(image, stretch_type, manual=(900, 1100, 1.0))
+        assert isinstance(limits, StretchLimits)
+        assert limits.min <= limits.max
+        display = apply_stretch(image, limits, stretch_type)
+        assert display.dtype == np.uint8
+        assert display.shape == image.shape
+        # the lookup table gives the same result as the float computation
+        floats = apply_stretch(image.astype(np.float32), limits, stretch_type)
+        assert np.abs(display.astype(int) - floats).max() <= 1
+
+    def test_linear(self, image):
+        limits = stretch_limits(image, ContrastStretchType.LINEAR, 2.0)
+        np.testing.assert_allclose(
+            [limits.min, limits.max], np.percentile(image, [1, 99]), rtol=0.01
+        )
+        display = apply_stretch(image, limits)
+        saturated = np.mean((display == 0) | (display == 255))
+        assert 0.015 < saturated < 0.03
+        manual = stretch_limits(image, ContrastStretchType.MANUAL, manual=(0, 1, 2))
+        assert manual == (0, 1, 2)
+        assert stretch_limits(image, ContrastStretchType.NONE).max == 65535
+
+    def test_contrast_stretch(self, image):
+        attributes = Attributes(stretch_type=ContrastStretchType.HIGHCONTRAST)
+        stretch = ContrastStretch.from_attributes(attributes, time_budget=1e-9)
+        display, limits = stretch(image)
+        np.testing.assert_allclose(limits[:2], np.percentile(image, [5, 95]), rtol=0.01)
+        again, _ = stretch(image)
+        assert again is display
+        # the tiny budget reduces the number of samples to the minimum
+        for _ in range(10):
+            stretch(image)
+        assert stretch.max_samples == stretch.min_samples
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from deapi.fake_data import DetectorReferences
+from deapi.processing import (
+    FrameBatch,
+    ReferenceCorrection,
+    array_frames,
+    get_reference,
+    run_pipeline,
+)
+
+
+class TestReferenceCorrection:
+    def test_correction(self):
+        references = DetectorReferences(bad_pixel_fraction=0.01, seed=1)
+        frames = np.full((10, 32, 32), 100, dtype=np.uint16)
+        raw = np.stack([references.raw(f) for f in frames])
+        stage = ReferenceCorrection(*references.get((32, 32)), threads=2)
+        corrected = stage.apply(raw)
+        assert corrected is raw  # float32 frames are corrected in place
+        np.testing.assert_allclose(corrected, 100, rtol=1e-5)
+
+    def test_bad_pixels(self):
+        bad = np.zeros((4, 4), dtype=np.uint8)
+        bad[0, 0] = bad[2, 2] = bad[2, 3] = 1
+        frame = np.arange(16, dtype=np.float32).reshape(1, 4, 4)
+        stage = ReferenceCorrection(bad_pixels=bad)
+        corrected = stage.apply(frame.copy())
+        assert corrected[0, 0, 0] == (1 + 4) / 2
+        assert corrected[0, 2, 2] == (6 + 14 + 9) / 3
+        assert corrected[0, 2, 3] == (7 + 15) / 2
+        np.testing.assert_array_equal(corrected[0][bad == 0], frame[0][bad == 0])
+
+    @pytest.mark.parametrize("dtype", [np.float32, np.uint16])
+    def test_without_dark(self, dtype):
+        rng = np.random.default_rng(0)
+        gain = rng.uniform(0.5, 2, (8, 8)).astype(np.float32)
+        bad = np.zeros((8, 8), dtype=np.uint8)
+        bad[3, 4] = 1
+        original = rng.integers(0, 100, (7, 8, 8)).astype(np.uint16)
+        frames = original.astype(dtype)
+        expected = frames * gain
+        expected[:, 3, 4] = expected[:, [2, 4, 3, 3], [4, 4, 3, 5]].mean(axis=1)
+        stage = ReferenceCorrection(gain=gain, bad_pixels=bad, threads=3)
+        corrected = stage.apply(frames)
+        assert (corrected is frames) == (dtype == np.float32)
+        np.testing.assert_allclose(corrected, expected, rtol=1e-6)
+        # the buffers are reused for the next batch
+        again = stage.apply(original[:2])
+        np.testing.assert_allclose(again, expected[:2], rtol=1e-6)
+
+    def test_buffer(self):
+        dark = np.ones((3, 3))
+        stage = ReferenceCorrection(dark=dark)
+        frames = np.full((5, 3, 3), 2, dtype=np.uint16)
+        (batch,) = [stage.process(b) for b in array_frames(frames, batch_size=5)]
+        assert batch.frames.dtype == np.float32
+        np.testing.assert_array_equal(batch.frames, 1)
+        # the buffer is reused for smaller batches
+        again = stage.apply(frames[:2])
+        assert np.shares_memory(again, batch.frames)
+        assert frames[0, 0, 0] == 2
+        with pytest.raises(ValueError):
+            stage.apply(np.zeros((1, 4, 4)))
+        with pytest.raises(ValueError):
+            ReferenceCorrection(dark=dark, gain=np.ones((4, 4)))
+
+    def test_from_client(self, client):
+        client.scan(size_x=4, size_y=4, enable="On")
+        stage = ReferenceCorrection.from_client(client)
+        assert stage.dark.shape == (client.image_sizey, client.image_sizex)
+        # the references are only downloaded once
+        dark = get_reference(client, "reference_darklevel0")
+        assert dark is get_reference(client, "reference_darklevel0")
+        assert dark is not get_reference(client, "reference_darklevel0", refresh=True)
+        raw = client.get_result("singleframe_rawlevel0", "FLOAT32")[0]
+        expected = client.get_result("singleframe_integrated", "FLOAT32")[0]
+        corrected = stage.apply(raw[np.newaxis])[0]
+        # bad pixels are interpolated so only compare the good pixels
+        good = get_reference(client, "reference_badpixelmap") == 0
+        np.testing.assert_allclose(corrected[good], expected[good], atol=1e-2)
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from deapi.fake_data import NoiseModel
+from deapi.processing import (
+    ElectronCounting,
+    FrameBatch,
+    array_frames,
+    run_pipeline,
+)
+
+
+@pytest.fixture
+def frames():
+    frames = np.zeros((3, 16, 16), dtype=np.uint16)
+    frames[0, 4, 4] = 10  # a single pixel event
+    frames[0, 4, 5] = 10  # ... spread over two pixels
+    frames[1, 10, 3:5] = [30, 10]
+    frames[1, 0, 15] = 20  # on the edge
+    frames[2, 8, 8] = 5  # below the threshold
+    return frames
+
+
+class TestElectronCounting:
+    @pytest.mark.parametrize("method", ["local_max", "connected"])
+    @pytest.mark.parametrize("threads", [1, 2])
+    def test_events(self, frames, method, threads):
+        stage = ElectronCounting(threshold=8, method=method, threads=threads)
+        (events,) = run_pipeline(array_frames(frames, batch_size=2, start=5), [stage])
+        np.testing.assert_array_equal(events["frame"], [0, 1, 1])
+        np.testing.assert_allclose(events["y"], [4, 0, 10])
+        np.testing.assert_allclose(events["x"], [4.5, 15, 3.25])
+        np.testing.assert_allclose(events["intensity"], [20, 20, 40])
+        np.testing.assert_array_equal(stage.positions, [5, 6, 7])
+        assert stage.frame_count == 3
+        assert stage.compression_ratio == frames.nbytes / events.nbytes
+
+    @pytest.mark.parametrize("method", ["local_max", "connected"])
+    def test_noisy_frames(self, method):
+        noise = NoiseModel(dose=0.002, gain=100, read_noise=2, dark_level=0, seed=0)
+        signal = np.ones((1, 64, 64))
+        frames = noise.integrated(signal, np.zeros(40, dtype=int))
+        stage = ElectronCounting(threshold=50, method=method, threads=2)
+        stage.process(FrameBatch(frames, np.arange(40)))
+        electrons = np.count_nonzero(frames > 50)
+        # some electrons land next to each other and are counted once
+        assert 0.9 * electrons <= len(stage.events) <= electrons
+        assert stage.compression_ratio > 20
+
+    def test_method(self):
+        with pytest.raises(ValueError):
+            ElectronCounting(10, method="other")
+        stage = ElectronCounting(10)
+        assert len(stage.result()) == 0
+        assert len(stage.count(np.zeros((0, 4, 4)))) == 0
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from deapi import masks
+from deapi.fake_data import NoiseModel
+from deapi.processing import (
+    ElectronCounting,
+    ElectronEvents,
+    FrameBatch,
+    VirtualDetectors,
+    run_pipeline,
+)
+
+
+@pytest.fixture
+def counted():
+    noise = NoiseModel(dose=0.01, seed=0)
+    signal = np.ones((1, 64, 64))
+    return noise.counted(signal, np.zeros(24, dtype=int))
+
+
+class TestElectronEvents:
+    def test_from_dense(self, counted):
+        events = ElectronEvents.from_dense(counted)
+        assert len(events) == 24
+        assert events.indices.dtype == np.uint16
+        assert events.event_count == counted.sum()
+        np.testing.assert_array_equal(events.to_dense(), counted)
+        np.testing.assert_array_equal(events[3], counted[3])
+        np.testing.assert_array_equal(events.to_dense(5, 9), counted[5:9])
+        assert counted.nbytes / events.nbytes > 20
+
+    def test_multiple_counts(self):
+        frames = np.zeros((2, 4, 4), dtype=np.uint16)
+        frames[0, 1, 1] = 3
+        frames[1, 2, 3] = 1
+        events = ElectronEvents.from_dense(frames)
+        assert events.counts.dtype == np.uint8
+        assert events.event_count == 4
+        np.testing.assert_array_equal(events.to_dense(), frames)
+        with pytest.raises(ValueError):
+            ElectronEvents.from_dense(-frames.astype(int))
+
+    def test_sum_and_binning(self, counted):
+        events = ElectronEvents.from_dense(counted)
+        np.testing.assert_array_equal(events.sum(), counted.sum(axis=0))
+        binned = counted.reshape(24, 16, 4, 16, 4).sum(axis=(2, 4))
+        np.testing.assert_array_equal(events.to_dense(binning=4), binned)
+        np.testing.assert_array_equal(events.sum(binning=4), binned.sum(axis=0))
+        # pixels which don't fill a bin are dropped
+        assert events.sum(binning=5).shape == (12, 12)
+        assert events.sum(binning=5).sum() == counted[:, :60, :60].sum()
+
+    def test_virtual_images(self, counted):
+        positions = np.arange(24)[::-1]
+        events = ElectronEvents.from_dense(counted, positions=positions)
+        weights = np.stack([masks.weights(masks.disk((64, 64), 10)), np.ones((64, 64))])
+        images = events.virtual_images(weights, (4, 6))
+        stage = VirtualDetectors(weights, (4, 6))
+        (expected,) = run_pipeline(events.batches(batch_size=5), [stage])
+        np.testing.assert_allclose(images, expected)
+        assert images[1].sum() == counted.sum()
+        with pytest.raises(ValueError):
+            events.virtual_images(np.ones((1, 8, 8)))
+
+    def test_virtual_images_repeated_positions(self, counted):
+        # two repeats of a 12 position scan
+        positions = np.tile(np.arange(12), 2)
+        events = ElectronEvents.from_dense(counted, positions=positions)
+        images = events.virtual_images(np.ones((64, 64)), (3, 4))
+        expected = counted.sum(axis=(1, 2)).reshape(2, 12).sum(axis=0)
+        np.testing.assert_array_equal(images[0].ravel(), expected)
+
+    def test_save_load(self, counted, tmp_path):
+        counted[0, 0, 0] = 2
+        events = ElectronEvents.from_dense(counted, positions=np.arange(24) + 10)
+        events.save(tmp_path / "events.npz")
+        loaded = ElectronEvents.load(tmp_path / "events.npz")
+        assert loaded.frame_shape == (64, 64)
+        np.testing.assert_array_equal(loaded.positions, events.positions)
+        np.testing.assert_array_equal(loaded.to_dense(), counted)
+
+    def test_from_counting(self):
+        frames = np.zeros((3, 8, 8), dtype=np.uint16)
+        frames[0, 2, 2] = frames[2, 5, 6] = frames[2, 1, 1] = 100
+        counting = ElectronCounting(threshold=50)
+        counting.process(FrameBatch(frames, np.array([4, 5, 6])))
+        events = ElectronEvents.from_counting(counting)
+        np.testing.assert_array_equal(events.offsets, [0, 1, 1, 3])
+        np.testing.assert_array_equal(events.to_dense(), frames // 100)
+        np.testing.assert_array_equal(events.positions, [4, 5, 6])
+
+    def test_large_detector(self):
+        events = ElectronEvents([0, 1], [70000], (512, 512))
+        assert events.indices.dtype == np.uint32
+        with pytest.raises(ValueError):
+            ElectronEvents([0, 2], [1], (4, 4))
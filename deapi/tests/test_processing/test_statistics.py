@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from deapi.processing import (
+    FrameBatch,
+    RunningStatistics,
+    array_frames,
+    run_pipeline,
+)
+
+
+@pytest.fixture
+def frames():
+    rng = np.random.default_rng(2)
+    return rng.integers(0, 20, size=(50, 6, 7), dtype=np.uint16)
+
+
+class TestRunningStatistics:
+    @pytest.mark.parametrize("mode", ["float", "exact"])
+    @pytest.mark.parametrize("threads", [1, 2])
+    def test_statistics(self, frames, mode, threads):
+        stage = RunningStatistics((6, 7), mode=mode, threads=threads)
+        (stats,) = run_pipeline(array_frames(frames, batch_size=9), [stage])
+        assert stats.count == 50
+        np.testing.assert_allclose(stats.sum, frames.sum(axis=0))
+        np.testing.assert_allclose(stats.mean, frames.mean(axis=0))
+        np.testing.assert_allclose(stats.variance, frames.var(axis=0))
+        np.testing.assert_array_equal(stats.minimum, frames.min(axis=0))
+        np.testing.assert_array_equal(stats.maximum, frames.max(axis=0))
+        np.testing.assert_array_equal(stats.frame_sums, frames.sum(axis=(1, 2)))
+        assert stats.histogram is None
+        if mode == "exact":
+            assert stats.sum.dtype == np.int64
+
+    def test_welford_stable(self):
+        # a large offset loses the variance with the naive sum of squares
+        rng = np.random.default_rng(3)
+        frames = 1e9 + rng.normal(size=(40, 2, 2))
+        stage = RunningStatistics((2, 2))
+        run_pipeline(array_frames(frames, batch_size=3), [stage])
+        np.testing.assert_allclose(stage.result().variance, frames.var(axis=0))
+
+    def test_histogram(self, frames):
+        stage = RunningStatistics((6, 7), bins=5, value_range=(0, 20), threads=2)
+        (stats,) = run_pipeline(array_frames(frames, batch_size=16), [stage])
+        assert stats.histogram.shape == (5, 6, 7)
+        np.testing.assert_array_equal(stats.histogram.sum(axis=0), 50)
+        expected, edges = np.histogram(frames[:, 1, 2], bins=5, range=(0, 20))
+        np.testing.assert_array_equal(stats.histogram[:, 1, 2], expected)
+        np.testing.assert_allclose(stats.bin_edges, edges)
+
+    def test_errors(self):
+        stage = RunningStatistics((2, 2), mode="exact")
+        with pytest.raises(ValueError):
+            stage.process(FrameBatch(np.zeros((1, 2, 2)), np.array([0])))
+        with pytest.raises(ValueError):
+            stage.process(FrameBatch(np.zeros((1, 3, 2), np.uint8), np.array([0])))
+        with pytest.raises(ValueError):
+            RunningStatistics((2, 2), mode="other")
+
+    def test_reset(self, frames):
+        stage = RunningStatistics((6, 7), mode="exact")
+        stage.process(FrameBatch(frames, np.arange(50)))
+        stage.reset()
+        stats = stage.result()
+        assert stats.count == 0
+        assert np.all(stats.sum == 0)
+        assert len(stats.frame_sums) == 0
@@ -0,0 +1,77 @@
+import time
+
+import numpy as np
+import pytest
+
+from deapi import masks
+from deapi.processing import (
+    FrameBatch,
+    VirtualDetectors,
+    array_frames,
+    movie_buffer_frames,
+    run_pipeline,
+)
+
+
+@pytest.fixture
+def frames():
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 1000, size=(6, 5, 16, 12), dtype=np.uint16)
+
+
+class TestVirtualDetectors:
+    @pytest.mark.parametrize("mode", ["auto", "dense", "sparse"])
+    @pytest.mark.parametrize("threads", [1, 3])
+    def test_matches_sum(self, frames, mode, threads):
+        detectors = [
+            masks.disk((16, 12), 4),
+            masks.annulus((16, 12), 4, 7),
+            masks.difference(*masks.segments((16, 12), 2)),
+        ]
+        stage = VirtualDetectors.from_masks(
+            detectors,
+            frames.shape[:2],
+            calculations=["Sum", "Sum", "Difference"],
+            mode=mode,
+            threads=threads,
+        )
+        (images,) = run_pipeline(array_frames(frames, batch_size=7), [stage])
+        assert images.shape == (3, 6, 5)
+        for image, mask, calculation in zip(
+            images, detectors, ["Sum", "Sum", "Difference"]
+        ):
+            expected = np.sum(frames * masks.weights(mask, calculation), axis=(2, 3))
+            np.testing.assert_allclose(image, expected, rtol=1e-5)
+
+    def test_mode(self):
+        dense = np.ones((2, 8, 8))
+        assert VirtualDetectors(dense, 4).mode == "dense"
+        assert VirtualDetectors(dense, 4).support is None
+        separate = np.zeros((8, 8, 8))
+        separate[np.arange(8), 0, np.arange(8)] = 1
+        stage = VirtualDetectors(separate, 4)
+        assert stage.mode == "sparse"
+        np.testing.assert_array_equal(stage.support, np.arange(8))
+        with pytest.raises(ValueError):
+            VirtualDetectors(dense, 4, mode="other")
+
+    def test_positions(self):
+        stage = VirtualDetectors(np.ones((1, 2, 2)), (2, 2))
+        frames = np.arange(8, dtype=np.uint16).reshape(2, 2, 2)
+        stage.process(FrameBatch(frames, np.array([3, 1])))
+        np.testing.assert_array_equal(stage.result()[0], [[0, 22], [0, 6]])
+        with pytest.raises(ValueError):
+            stage.process(FrameBatch(np.zeros((1, 3, 3)), np.array([0])))
+
+    def test_movie_buffer(self, client):
+        client["Frames Per Second"] = 1000
+        client.scan(size_x=8, size_y=6, enable="On")
+        mask = masks.annulus(client, 5, 40)
+        client.set_virtual_masks({2: mask}, calculations={2: "Sum"})
+        client.start_acquisition(1, requestMovieBuffer=True)
+        stage = VirtualDetectors.from_masks([mask], (6, 8), threads=2)
+        (images,) = run_pipeline(movie_buffer_frames(client), [stage])
+        while client.acquiring:
+            time.sleep(0.01)
+        expected = client.get_result("virtual_image2", "FLOAT32")[0]
+        np.testing.assert_allclose(images[0], expected, rtol=1e-5)
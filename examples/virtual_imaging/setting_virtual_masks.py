@@ -64,6 +64,25 @@ c.virtual_masks[2][:] = 1
 c.virtual_masks[2][rr, cc] = 2
 c.virtual_masks[2].plot()
 
+# %%
+# Building Common Detectors
+# -------------------------
+# The ``deapi.masks`` module builds the masks for common detectors at the
+# resolution of the camera, and ``set_virtual_masks`` sends several masks and
+# their calculation modes to the server in a single exchange.
+
+from deapi import masks
+import numpy as np
+
+left, right = masks.segments(c, 2, outer_radius=200, rotation=np.pi / 2)
+c.set_virtual_masks(
+    {
+        2: masks.disk(c, radius=100),  # VBF
+        3: masks.difference(right, left),  # DPC along x
+    },
+    calculations={2: "Sum", 3: "Difference"},
+)
+
 # %%
 
 # Plotting Multiple Virtual Images
@@ -68,17 +68,20 @@ mask = auto_find_bf(img)
 # Create the Virtual Masks
 # ------------------------
 # We will create the VDF and VBF masks by setting the pixel values in the masks.
+# Edits inside ``edit()`` are sent to the server in a single upload.
 
 client.virtual_masks[1].calculation = "Sum"
 client.virtual_masks[1].name = "VBF"
-client.virtual_masks[1][:] = 1  # Set to 1
-client.virtual_masks[1][mask] = 2  # Set mask to 2
+with client.virtual_masks[1].edit() as vbf:
+    vbf[:] = 1  # Set to 1
+    vbf[mask] = 2  # Set mask to 2
 client.virtual_masks[1].plot()
 
 client.virtual_masks[2].calculation = "Sum"
 client.virtual_masks[2].name = "VDF"
-client.virtual_masks[2][:] = 2
-client.virtual_masks[2][mask] = 1
+with client.virtual_masks[2].edit() as vdf:
+    vdf[:] = 2
+    vdf[mask] = 1
 client.virtual_masks[2].plot()
 
 # %%